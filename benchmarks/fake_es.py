@@ -0,0 +1,101 @@
+import argparse
+import json
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Elasticsearch giả (chỉ _bulk / _refresh / _count) để thử bulk_index.py mà không cần cụm ES thật.
+# --reject-rate: tỉ lệ item bị trả 429 (es_rejected_execution_exception) để kiểm tra retry / backoff.
+#
+#   python benchmarks/fake_es.py --port 9201 --reject-rate 0.1
+#   python bulk_index.py --node http://localhost:9201
+
+
+class FakeEs:
+    def __init__(self, reject_rate=0.0, seed=None):
+        self.reject_rate = reject_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.docs = {}          # (index, _id) -> document
+        self.bulk_requests = 0
+        self.rejected = 0
+
+    def bulk(self, body):
+        lines = body.decode("utf-8").splitlines()
+        items = []
+        errors = False
+        with self.lock:
+            self.bulk_requests += 1
+            for action_line, source_line in zip(lines[0::2], lines[1::2]):
+                op, meta = next(iter(json.loads(action_line).items()))
+                _id = meta.get("_id") or f"auto-{len(self.docs)}"
+                if self.random.random() < self.reject_rate:
+                    errors = True
+                    self.rejected += 1
+                    items.append({op: {"_index": meta["_index"], "_id": _id, "status": 429,
+                                       "error": {"type": "es_rejected_execution_exception"}}})
+                    continue
+                key = (meta["_index"], _id)
+                created = key not in self.docs
+                self.docs[key] = json.loads(source_line)
+                items.append({op: {"_index": meta["_index"], "_id": _id, "status": 201 if created else 200,
+                                   "result": "created" if created else "updated"}})
+        return {"took": 1, "errors": errors, "items": items}
+
+    def count(self, index):
+        with self.lock:
+            return sum(1 for i, _ in self.docs if i == index)
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keep-alive
+
+    def send_json(self, status, payload):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        path = self.path.split("?", 1)[0]
+        if path == "/_bulk":
+            self.send_json(200, self.server.es.bulk(body))
+        elif path.endswith("/_refresh"):
+            self.send_json(200, {"_shards": {"failed": 0}})
+        else:
+            self.send_json(404, {"error": f"không hỗ trợ {path}"})
+
+    def do_GET(self):
+        path = self.path.split("?", 1)[0]
+        if path.endswith("/_count"):
+            self.send_json(200, {"count": self.server.es.count(path.strip("/").split("/")[0])})
+        else:
+            self.send_json(200, {"tagline": "fake_es"})
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(port=0, reject_rate=0.0, seed=None):
+    # Chạy server trong thread nền; port=0 -> chọn cổng trống (server.server_address[1])
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    server.es = FakeEs(reject_rate, seed)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Elasticsearch giả cho bulk_index.py")
+    parser.add_argument("--port", type=int, default=9201)
+    parser.add_argument("--reject-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), Handler)
+    server.es = FakeEs(args.reject_rate)
+    print(f"✅ fake_es chạy tại http://127.0.0.1:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"➤ {len(server.es.docs)} doc, {server.es.bulk_requests} request _bulk, {server.es.rejected} item bị 429")
@@ -0,0 +1,326 @@
+import argparse
+import socketserver
+import threading
+import time
+
+# Redis giả (chỉ các lệnh mycrawler/distributed.py dùng) để thử chế độ phân tán nhiều worker / nhiều máy
+# mà không cần cài Redis. Dữ liệu chỉ nằm trong RAM, mọi lệnh chạy tuần tự dưới 1 lock (như Redis).
+#
+#   python benchmarks/fake_redis.py --port 6390
+#   cd mycrawler && python -m mycrawler.distributed --backend redis://127.0.0.1:6390 run careerlink --workers 3
+
+
+class RedisError(Exception):
+    pass
+
+
+def _score(value):
+    text = value.decode("ascii").lower()
+    if text in ("-inf", "+inf", "inf"):
+        return float(text)
+    return float(text.lstrip("("))
+
+
+def _format_score(score):
+    return repr(int(score)) if score == int(score) else repr(score)
+
+
+# Lệnh ghi: đổi phiên bản của key (args[1], DEL: mọi key) để EXEC sau WATCH biết key đã bị đổi
+WRITE_COMMANDS = {b"DEL", b"EXPIRE", b"SET", b"INCR", b"SADD", b"HSET", b"HDEL", b"ZADD", b"ZREM", b"ZPOPMIN"}
+
+
+class FakeRedis:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.data = {}      # key -> bytes | set | dict (hash) | ZSet
+        self.expires = {}   # key -> thời điểm hết hạn (time.time())
+        self.versions = {}  # key -> số lần bị ghi (WATCH)
+        self.commands = 0
+
+    def get(self, key, kind, create=False):
+        if key in self.expires and self.expires[key] <= time.time():
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+            self.touch(key)
+        value = self.data.get(key)
+        if value is None and create:
+            value = self.data[key] = kind()
+        if value is not None and not isinstance(value, kind):
+            raise RedisError("WRONGTYPE Operation against a key holding the wrong kind of value")
+        return value
+
+    def touch(self, *keys):
+        for key in keys:
+            self.versions[key] = self.versions.get(key, 0) + 1
+
+    def run(self, args):
+        self.commands += 1
+        result = self.handler(args)(*args[1:])
+        name = args[0].upper()
+        if name in WRITE_COMMANDS:
+            self.touch(*(args[1:] if name == b"DEL" else args[1:2]))
+        return result
+
+    def watch(self, keys):
+        with self.lock:
+            return {key: self.versions.get(key, 0) for key in keys}
+
+    def handler(self, args):
+        name = args[0].decode("ascii").upper()
+        handler = getattr(self, "cmd_" + name.lower(), None)
+        if handler is None:
+            raise RedisError(f"ERR unknown command '{name}'")
+        return handler
+
+    def execute(self, args):
+        self.handler(args)
+        with self.lock:
+            return self.run(args)
+
+    def execute_all(self, commands, watched=None):
+        # EXEC: chạy cả transaction dưới 1 lock, lệnh lỗi trả về lỗi trong mảng kết quả (như Redis).
+        # None nếu key đang WATCH đã bị ghi từ lúc WATCH
+        replies = []
+        with self.lock:
+            if watched and any(self.versions.get(key, 0) != version for key, version in watched.items()):
+                return None
+            for args in commands:
+                try:
+                    replies.append(self.run(args))
+                except (RedisError, ValueError, IndexError) as e:
+                    replies.append(e if isinstance(e, RedisError) else RedisError(f"ERR {e}"))
+        return replies
+
+    # --- chung ---
+    def cmd_ping(self, *args):
+        return args[0] if args else "PONG"
+
+    def cmd_select(self, db):
+        return "OK"
+
+    def cmd_auth(self, *args):
+        return "OK"
+
+    def cmd_del(self, *keys):
+        removed = 0
+        for key in keys:
+            self.expires.pop(key, None)
+            removed += self.data.pop(key, None) is not None
+        return removed
+
+    def cmd_expire(self, key, seconds):
+        if key not in self.data:
+            return 0
+        self.expires[key] = time.time() + int(seconds)
+        return 1
+
+    # --- string ---
+    def cmd_get(self, key):
+        return self.get(key, bytes)
+
+    def cmd_set(self, key, value, *options):
+        options = [option.decode("ascii").upper() for option in options]
+        ttl = None
+        if "EX" in options:
+            ttl = int(options[options.index("EX") + 1])
+        elif "PX" in options:
+            ttl = int(options[options.index("PX") + 1]) / 1000
+        exists = self.get(key, bytes) is not None
+        if ("NX" in options and exists) or ("XX" in options and not exists):
+            return None
+        self.data[key] = value
+        self.expires.pop(key, None)
+        if ttl is not None:
+            self.expires[key] = time.time() + ttl
+        return "OK"
+
+    def cmd_incr(self, key):
+        value = int(self.get(key, bytes) or 0) + 1
+        self.data[key] = str(value).encode("ascii")
+        return value
+
+    # --- set ---
+    def cmd_sadd(self, key, *members):
+        values = self.get(key, set, create=True)
+        before = len(values)
+        values.update(members)
+        return len(values) - before
+
+    def cmd_scard(self, key):
+        return len(self.get(key, set) or ())
+
+    # --- hash ---
+    def cmd_hset(self, key, *pairs):
+        values = self.get(key, dict, create=True)
+        added = 0
+        for field, value in zip(pairs[0::2], pairs[1::2]):
+            added += field not in values
+            values[field] = value
+        return added
+
+    def cmd_hget(self, key, field):
+        return (self.get(key, dict) or {}).get(field)
+
+    def cmd_hdel(self, key, *fields):
+        values = self.get(key, dict) or {}
+        return sum(values.pop(field, None) is not None for field in fields)
+
+    # --- sorted set (dict member -> score, sắp xếp khi đọc: đủ cho vài chục nghìn phần tử) ---
+    def zset(self, key, create=False):
+        return self.get(key, ZSet, create)
+
+    def cmd_zadd(self, key, *args):
+        options = set()
+        while args and args[0].upper() in (b"NX", b"XX"):
+            options.add(args[0].upper())
+            args = args[1:]
+        values = self.zset(key, create=True)
+        added = 0
+        for score, member in zip(args[0::2], args[1::2]):
+            exists = member in values
+            if (b"NX" in options and exists) or (b"XX" in options and not exists):
+                continue
+            added += not exists
+            values[member] = _score(score)
+        return added
+
+    def cmd_zrem(self, key, *members):
+        values = self.zset(key) or {}
+        return sum(values.pop(member, None) is not None for member in members)
+
+    def cmd_zscore(self, key, member):
+        score = (self.zset(key) or {}).get(member)
+        return None if score is None else _format_score(score).encode("ascii")
+
+    def cmd_zcard(self, key):
+        return len(self.zset(key) or ())
+
+    def cmd_zpopmin(self, key, count=b"1"):
+        values = self.zset(key) or {}
+        popped = sorted(values.items(), key=lambda item: (item[1], item[0]))[:int(count)]
+        reply = []
+        for member, score in popped:
+            del values[member]
+            reply += [member, _format_score(score).encode("ascii")]
+        return reply
+
+    def cmd_zrangebyscore(self, key, low, high, *options):
+        values = self.zset(key) or {}
+        low_value, high_value = _score(low), _score(high)
+        items = sorted(((member, score) for member, score in values.items()
+                        if (low_value < score if low.startswith(b"(") else low_value <= score)
+                        and (score < high_value if high.startswith(b"(") else score <= high_value)),
+                       key=lambda item: (item[1], item[0]))
+        upper = [option.upper() for option in options]
+        if b"LIMIT" in upper:
+            i = upper.index(b"LIMIT")
+            offset, count = int(options[i + 1]), int(options[i + 2])
+            items = items[offset:] if count < 0 else items[offset:offset + count]
+        if b"WITHSCORES" in upper:
+            return [value for member, score in items for value in (member, _format_score(score).encode("ascii"))]
+        return [member for member, _ in items]
+
+
+class ZSet(dict):
+    pass
+
+
+def encode(value):
+    if value is None:
+        return b"$-1\r\n"
+    if isinstance(value, bool):
+        value = int(value)
+    if isinstance(value, int):
+        return b":%d\r\n" % value
+    if isinstance(value, str):
+        return b"+" + value.encode("utf-8") + b"\r\n"
+    if isinstance(value, bytes):
+        return b"$%d\r\n%s\r\n" % (len(value), value)
+    if isinstance(value, list):
+        return b"*%d\r\n" % len(value) + b"".join(encode(item) for item in value)
+    if isinstance(value, RedisError):
+        return b"-" + str(value).encode("utf-8") + b"\r\n"
+    raise TypeError(type(value))
+
+
+class Handler(socketserver.StreamRequestHandler):
+    def read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        if not line.startswith(b"*"):
+            return line.split()  # inline command (vd "PING" gõ tay qua telnet / nc)
+        args = []
+        for _ in range(int(line[1:])):
+            size = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(size + 2)[:-2])
+        return args
+
+    def handle(self):
+        transaction = None  # MULTI: lệnh được gom lại, EXEC chạy liền một mạch
+        watched = {}        # WATCH: key -> phiên bản lúc WATCH
+        while True:
+            args = self.read_command()
+            if args is None:
+                return
+            if not args:
+                continue
+            name = args[0].upper()
+            if name == b"WATCH" and transaction is None:
+                watched.update(self.server.redis.watch(args[1:]))
+                reply = b"+OK\r\n"
+            elif name == b"UNWATCH" and transaction is None:
+                watched = {}
+                reply = b"+OK\r\n"
+            elif name == b"MULTI":
+                transaction = []
+                reply = b"+OK\r\n"
+            elif name == b"EXEC" and transaction is not None:
+                replies = self.server.redis.execute_all(transaction, watched)
+                reply = b"*-1\r\n" if replies is None else encode(replies)
+                transaction = None
+                watched = {}
+            elif name == b"DISCARD" and transaction is not None:
+                transaction = None
+                watched = {}
+                reply = b"+OK\r\n"
+            elif transaction is not None:
+                transaction.append(args)
+                reply = b"+QUEUED\r\n"
+            else:
+                reply = None
+            if reply is not None:
+                self.wfile.write(reply)
+                continue
+            try:
+                reply = encode(self.server.redis.execute(args))
+            except (RedisError, ValueError, IndexError) as e:
+                reply = b"-" + (str(e) if isinstance(e, RedisError) else f"ERR {e}").encode("utf-8") + b"\r\n"
+            self.wfile.write(reply)
+
+
+class Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def start_server(port=0):
+    # Chạy server trong thread nền; port=0 -> chọn cổng trống (server.server_address[1])
+    server = Server(("127.0.0.1", port), Handler)
+    server.redis = FakeRedis()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Redis giả cho chế độ phân tán của crawler")
+    parser.add_argument("--host", default="127.0.0.1", help="0.0.0.0 để worker ở máy khác nối vào")
+    parser.add_argument("--port", type=int, default=6390)
+    args = parser.parse_args()
+    server = Server((args.host, args.port), Handler)
+    server.redis = FakeRedis()
+    print(f"✅ fake_redis chạy tại redis://{args.host}:{args.port}/0")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"➤ {len(server.redis.data)} key, {server.redis.commands} lệnh")
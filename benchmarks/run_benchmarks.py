@@ -0,0 +1,398 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+# Benchmark offline cho các đường nóng (không cần mạng):
+#   parse/*     : phát lại fixture HTML qua callback của spider bằng HtmlResponse giả
+#   pipeline/*  : đẩy luồng item tổng hợp qua MycrawlerPipeline / CareerlinkPipeline (SQLite tạm)
+#   neardup/*   : lượt dò tin trùng gần đúng sau crawl trên bảng jobs vừa ghi
+#   data/*      : chạy filter_jobs.py, change_to_json.py, change_to_json_array.py, job_pipeline.py
+#                 trên bản nhân N lần của data/jobdata.csv
+#   index/*     : bulk_index.py đẩy NDJSON vào Elasticsearch giả (benchmarks/fake_es.py)
+# Kết quả ghi ra JSON; so với baseline (--baseline) để phát hiện chậm đi.
+#
+#   python benchmarks/run_benchmarks.py --save-baseline
+#   python benchmarks/run_benchmarks.py --check          # exit 1 nếu có mục chậm hơn baseline quá --tolerance
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES = os.path.join(ROOT, "benchmarks", "fixtures")
+DEFAULT_BASELINE = os.path.join(ROOT, "benchmarks", "baseline.json")
+JOBDATA = os.path.join(ROOT, "data", "jobdata.csv")
+
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "mycrawler"))
+
+
+def bench(results, name, fn, repeat=3, ops=1):
+    # Lấy thời gian nhỏ nhất trong `repeat` lần chạy (ít nhiễu nhất)
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    results[name] = {"seconds": best, "ops": ops, "ops_per_sec": ops / best if best else None, "repeat": repeat}
+    print(f"  {name:<40} {best * 1000:10.2f} ms  ({ops / best if best else 0:,.0f} op/s)")
+
+
+def read_fixture(name):
+    with open(os.path.join(FIXTURES, name), "rb") as f:
+        return f.read()
+
+
+# --- PARSE: callback của spider trên fixture ---
+
+def bare_hustedu():
+    # Spider tạo ngoài crawler: gắn settings + frontier trên DB trong RAM (không ghi vào data.db thật)
+    import sqlite3
+
+    from scrapy.settings import Settings
+
+    from mycrawler import storage
+    from mycrawler.dedup import UrlIndex
+    from mycrawler.frontier import Frontier
+    from mycrawler.spiders.hustedu import HusteduSpider
+
+    spider = HusteduSpider()
+    spider.url_index = UrlIndex()
+    spider.settings = Settings(HusteduSpider.custom_settings)
+    con = sqlite3.connect(":memory:")
+    storage.migrate(con, "news")
+    spider.frontier = Frontier(con, spider.name)
+    return spider
+
+
+def bench_parsing(results, iterations):
+    from scrapy.http import HtmlResponse, Request, XmlResponse
+
+    from mycrawler.dedup import UrlIndex
+    from mycrawler.spiders.careerlink import CareerlinkSpider
+
+    careerlink = CareerlinkSpider()
+    careerlink.url_index = UrlIndex()
+    hustedu = bare_hustedu()
+
+    def reset():
+        # Mỗi lần lặp coi mọi link là mới như lượt crawl đầu (frontier không bỏ qua link đã gặp ở lần trước)
+        hustedu.frontier.known.clear()
+        hustedu.frontier.lists.clear()
+        hustedu.list_keys.clear()
+
+    def make(cls, url, body, callback):
+        # Tạo response mới mỗi lần để không dùng lại selector đã cache
+        return lambda: cls(url=url, body=body, encoding="utf-8", request=Request(url, callback=callback))
+
+    vieclam24h = os.path.join(ROOT, "data", "jobs", "vieclam24h", "vietlam24h-detail.html")
+    cases = [
+        ("parse/careerlink.parse_list", careerlink.parse_list, make(HtmlResponse, "https://www.careerlink.vn/vieclam/list",
+                                                                     read_fixture("careerlink_list.html"), careerlink.parse_list)),
+        ("parse/careerlink.parse_job", careerlink.parse_job, make(HtmlResponse, "https://www.careerlink.vn/tim-viec-lam/nhan-vien/3000001",
+                                                                   read_fixture("careerlink_job.html"), careerlink.parse_job)),
+        ("parse/hustedu.parse_rss", hustedu.parse_rss, make(XmlResponse, "https://hust.edu.vn/vi/news/rss/",
+                                                             read_fixture("hustedu_rss.xml"), hustedu.parse_rss)),
+        ("parse/hustedu.parse_universal", hustedu.parse_universal, make(HtmlResponse, "https://hust.edu.vn/vi/news/tuyen-sinh/ke-hoach-650000.html",
+                                                                         read_fixture("hustedu_article.html"), hustedu.parse_universal)),
+    ]
+    if os.path.exists(vieclam24h):
+        # Trang chi tiết thật (~440KB) để đo chi phí parse_universal trên trang lớn
+        with open(vieclam24h, "rb") as f:
+            body = f.read()
+        cases.append(("parse/hustedu.parse_universal[vieclam24h-detail]", hustedu.parse_universal,
+                      make(HtmlResponse, "https://vieclam24h.vn/viec-lam/chi-tiet-200734388.html", body, hustedu.parse_universal)))
+
+    for name, callback, new_response in cases:
+        def run(callback=callback, new_response=new_response):
+            # Spider in log bằng print -> bỏ đi để không làm nhiễu số đo / output
+            with contextlib.redirect_stdout(io.StringIO()):
+                for _ in range(iterations):
+                    reset()
+                    list(callback(new_response()))
+        bench(results, name, run, ops=iterations)
+
+
+def check_selector_memory():
+    # SelectorMemory không được làm kết quả phụ thuộc thứ tự trang: bài chỉ có <title> / news-summary
+    # parse trước không được làm bài sau (cùng dạng url, có h1 + meta description) lấy nhầm cách dự phòng
+    from scrapy.http import HtmlResponse, Request
+
+    def parse(spider, fixture, url):
+        response = HtmlResponse(url=url, body=read_fixture(fixture), encoding="utf-8", request=Request(url))
+        with contextlib.redirect_stdout(io.StringIO()):
+            return [item for item in spider.parse_universal(response) if isinstance(item, dict)]
+
+    pages = [("hustedu_article_fallback.html", "https://hust.edu.vn/vi/news/thong-bao/lich-nghi-tet-650100.html"),
+             ("hustedu_article.html", "https://hust.edu.vn/vi/news/tuyen-sinh/ke-hoach-650000.html")]
+    sequence = bare_hustedu()
+    failures = []
+    for fixture, url in pages:
+        got, expected = parse(sequence, fixture, url), parse(bare_hustedu(), fixture, url)
+        if got != expected:
+            failures.append(f"{fixture}: {got} != {expected}")
+    for failure in failures:
+        print(f"❌ selector memory: {failure}")
+    return not failures
+
+
+# --- PIPELINE: luồng item tổng hợp ---
+
+class FakeSpider:
+    settings = None
+
+    def __init__(self, name):
+        self.name = name
+
+
+def synthetic_items(kind, n, version=0):
+    for i in range(n):
+        # Lượt 2: khoảng 30% item đổi nội dung (version khác) -> UPDATE, còn lại -> chỉ cập nhật last_checked
+        v = version if i % 10 < 3 else 0
+        if kind == "careerlink":
+            yield {"url": f"https://www.careerlink.vn/tim-viec-lam/job/{i}", "title": f"Nhân viên {i} v{v}",
+                   "company": f"Công ty {i % 500}", "location": "Hồ Chí Minh", "salary": "10 triệu - 15 triệu",
+                   "experience": "1 - 2 năm kinh nghiệm"}
+        else:
+            yield {"url": f"https://hust.edu.vn/vi/news/tin-{i}.html", "title": f"Tin tức {i} v{v}",
+                   "short": "Tóm tắt bài viết " * 5}
+
+
+def bench_pipelines(results, n_items, batch_size):
+    from mycrawler import storage
+    from mycrawler.pipelines import CareerlinkPipeline, MycrawlerPipeline
+
+    for kind, cls in (("careerlink", CareerlinkPipeline), ("hustedu", MycrawlerPipeline)):
+        def run(kind=kind, cls=cls):
+            workdir = tempfile.mkdtemp(prefix="bench_pipeline_")
+            cwd = os.getcwd()
+            os.chdir(workdir)
+            # DB crawl (storage.py) ghi vào thư mục tạm, không đụng data.db / data1.db thật
+            os.environ["MYCRAWLER_DB_DIR"] = workdir
+            try:
+                spider = FakeSpider(kind)
+                with contextlib.redirect_stdout(io.StringIO()):
+                    for version in (0, 1):
+                        pipeline = cls(batch_size=batch_size)
+                        pipeline.open_spider(spider)
+                        for item in synthetic_items(kind, n_items, version):
+                            pipeline.process_item(item, spider)
+                        pipeline.close_spider(spider)
+            finally:
+                storage.close_all()
+                os.environ.pop("MYCRAWLER_DB_DIR", None)
+                os.chdir(cwd)
+                shutil.rmtree(workdir, ignore_errors=True)
+        bench(results, f"pipeline/{kind}[batch={batch_size}]", run, repeat=1, ops=2 * n_items)
+
+
+def bench_neardup(results, n_items, batch_size):
+    # Lượt dò trùng gần đúng sau crawl (NearDupExtension) trên bảng jobs do CareerlinkPipeline ghi
+    from mycrawler import storage
+    from mycrawler.neardup import NearDupIndex, check_changed
+    from mycrawler.pipelines import CareerlinkPipeline
+
+    workdir = tempfile.mkdtemp(prefix="bench_neardup_")
+    os.environ["MYCRAWLER_DB_DIR"] = workdir
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            pipeline = CareerlinkPipeline(batch_size=batch_size)
+            spider = FakeSpider("careerlink")
+            pipeline.open_spider(spider)
+            for item in synthetic_items("careerlink", n_items):
+                pipeline.process_item(item, spider)
+            pipeline.close_spider(spider)
+
+        def run():
+            path = os.path.join(workdir, "neardup.db")
+            index = NearDupIndex(path)
+            try:
+                check_changed(index, storage.connect("jobs"), "jobs", "careerlink")
+            finally:
+                index.close()
+                for suffix in ("", "-wal", "-shm"):
+                    if os.path.exists(path + suffix):
+                        os.remove(path + suffix)
+        bench(results, "neardup/careerlink", run, repeat=1, ops=n_items)
+    finally:
+        storage.close_all()
+        os.environ.pop("MYCRAWLER_DB_DIR", None)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+# --- DATA: script xử lý CSV/JSON trên dữ liệu nhân bản ---
+
+def make_scaled_csv(path, scale):
+    with open(JOBDATA, "rb") as f:
+        header = f.readline()
+        body = f.read()
+    if not body.endswith(b"\n"):
+        body += b"\n"
+    with open(path, "wb") as out:
+        out.write(header)
+        for _ in range(scale):
+            out.write(body)
+
+
+def check_parallel_pipeline():
+    # job_pipeline.py --workers N phải ra đúng file như chạy tuần tự, kể cả khi CSV có dấu " lạc
+    # giữa trường không bọc ngoặc (đếm chẵn lẻ dấu " bị lệch) và trường nhiều dòng
+    from job_pipeline import NdjsonSink, run_pipeline, run_pipeline_parallel
+
+    source = os.path.join(FIXTURES, "jobdata_stray_quote.csv")
+    workdir = tempfile.mkdtemp(prefix="check_pipeline_")
+    try:
+        serial, parallel = os.path.join(workdir, "serial.json"), os.path.join(workdir, "parallel.json")
+        with contextlib.redirect_stdout(io.StringIO()):
+            expected = run_pipeline(source, [NdjsonSink(serial)])
+            got = run_pipeline_parallel(source, [NdjsonSink(parallel)], 2, chunk_bytes=4096)
+        with open(serial, "rb") as a, open(parallel, "rb") as b:
+            same = a.read() == b.read()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    if got != expected or not same:
+        print(f"❌ job_pipeline song song khác tuần tự: {got} != {expected}")
+        return False
+    return True
+
+
+def bench_data_scripts(results, scale, workers):
+    workdir = tempfile.mkdtemp(prefix="bench_data_")
+    try:
+        source = os.path.join(workdir, "jobdata.csv")
+        make_scaled_csv(source, scale)
+        os.makedirs(os.path.join(workdir, "data"), exist_ok=True)
+        with open(source, "rb") as f:
+            rows = sum(1 for _ in f) - 1
+
+        def script(name, *args):
+            return lambda: subprocess.run([sys.executable, os.path.join(ROOT, name), *args], cwd=workdir,
+                                          check=True, stdout=subprocess.DEVNULL)
+
+        # Thứ tự quan trọng: change_to_json*.py đọc data/jobs_clean.csv do filter_jobs.py tạo ra
+        bench(results, f"data/filter_jobs[x{scale}]", script("filter_jobs.py"), ops=rows)
+        bench(results, f"data/change_to_json[x{scale}]", script("change_to_json.py"), ops=rows)
+        bench(results, f"data/change_to_json_array[x{scale}]", script("change_to_json_array.py"), ops=rows)
+        bench(results, f"data/job_pipeline[x{scale}]", script("job_pipeline.py", "--source", "jobdata.csv"), ops=rows)
+        if workers > 1:
+            bench(results, f"data/job_pipeline[x{scale},workers={workers}]",
+                  script("job_pipeline.py", "--source", "jobdata.csv", "--workers", str(workers)), ops=rows)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+# --- INDEX: bulk_index.py -> fake_es ---
+
+def bench_bulk_index(results, scale, workers):
+    from benchmarks.fake_es import start_server
+    from bulk_index import BulkLoader, iter_ndjson
+    from job_pipeline import NdjsonSink, run_pipeline
+
+    workdir = tempfile.mkdtemp(prefix="bench_index_")
+    try:
+        source = os.path.join(workdir, "jobdata.csv")
+        ndjson = os.path.join(workdir, "jobs.json")
+        make_scaled_csv(source, scale)
+        with contextlib.redirect_stdout(io.StringIO()):
+            run_pipeline(source, [NdjsonSink(ndjson)])
+        with open(ndjson, "rb") as f:
+            docs = sum(1 for _ in f)
+
+        for n in sorted({1, workers}):
+            def run(n=n):
+                server = start_server(reject_rate=0.01, seed=0)
+                try:
+                    node = f"http://127.0.0.1:{server.server_address[1]}"
+                    loader = BulkLoader(node, "docs", workers=n, max_bytes=1 << 20, backoff=0.01)
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        loader.run(iter_ndjson(ndjson))
+                finally:
+                    server.shutdown()
+                    server.server_close()
+            bench(results, f"index/bulk_index[x{scale},workers={n}]", run, ops=docs)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+# --- SO SÁNH BASELINE ---
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for name, current in results.items():
+        old = baseline.get("results", {}).get(name)
+        if not old or not old.get("seconds"):
+            continue
+        ratio = current["seconds"] / old["seconds"]
+        marker = "❌" if ratio > 1 + tolerance else "  "
+        print(f"{marker} {name:<40} {ratio:6.2f}x baseline")
+        if ratio > 1 + tolerance:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark offline cho parse / pipeline / xử lý dữ liệu")
+    parser.add_argument("--only", choices=["parse", "pipeline", "data", "index"], action="append", help="Chỉ chạy nhóm này (lặp lại được)")
+    parser.add_argument("--parse-iterations", type=int, default=200)
+    parser.add_argument("--items", type=int, default=5000, help="Số item tổng hợp cho mỗi pipeline")
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--scale", type=int, default=5, help="Nhân data/jobdata.csv lên N lần")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--output", default=os.path.join(ROOT, "benchmarks", "results.json"))
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="Ghi kết quả lần này làm baseline")
+    parser.add_argument("--check", action="store_true", help="Exit 1 nếu chậm hơn baseline quá --tolerance")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    groups = args.only or ["parse", "pipeline", "data", "index"]
+    results = {}
+    if "parse" in groups:
+        print("➤ Parse")
+        if not check_selector_memory():
+            return 1
+        bench_parsing(results, args.parse_iterations)
+    if "pipeline" in groups:
+        print("➤ Pipeline")
+        bench_pipelines(results, args.items, args.batch_size)
+        bench_neardup(results, args.items, args.batch_size)
+    if "data" in groups:
+        print("➤ Data scripts")
+        if not check_parallel_pipeline():
+            return 1
+        bench_data_scripts(results, args.scale, args.workers)
+    if "index" in groups:
+        print("➤ Bulk index")
+        bench_bulk_index(results, args.scale, min(args.workers, 8))
+
+    report = {
+        "meta": {"timestamp": datetime.now().isoformat(), "python": platform.python_version(),
+                 "platform": platform.platform(), "cpu_count": os.cpu_count(), "args": vars(args)},
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"✅ Đã ghi kết quả vào {args.output}")
+
+    if args.save_baseline:
+        shutil.copyfile(args.output, args.baseline)
+        print(f"✅ Đã lưu baseline: {args.baseline}")
+        return 0
+
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions and args.check:
+            print(f"❌ {len(regressions)} mục chậm hơn baseline")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
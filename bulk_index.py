@@ -0,0 +1,363 @@
+import argparse
+import base64
+import http.client
+import json
+import os
+import queue
+import random
+import sqlite3
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+# Đọc bản xuất chia shard (manifest + NDJSON nén) bằng module của crawler
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "mycrawler"))
+from mycrawler import shards  # noqa: E402
+from mycrawler.profiling import profile_main  # noqa: E402
+
+# Nạp dữ liệu vào Elasticsearch bằng _bulk, thay cho scripts/index_jobs.js khi re-index toàn bộ:
+#   - đọc NDJSON (data/jobs.json của change_to_json.py / job_pipeline.py) hoặc bảng SQLite của crawler
+#     theo luồng, không nạp cả file vào RAM
+#   - cắt body _bulk theo số byte (--max-mb) thay vì số document cố định
+#   - nhiều request chạy song song (--workers), mỗi worker giữ 1 kết nối keep-alive;
+#     hàng đợi có giới hạn -> đọc file chậm lại khi ES không theo kịp (backpressure)
+#   - item bị từ chối 429 / 5xx được gửi lại (chỉ item lỗi) với backoff lũy thừa + jitter
+#   - refresh index 1 lần ở cuối thay vì ?refresh=true cho mỗi lô
+#
+#   python bulk_index.py                                   # data/jobs.json -> index "docs"
+#   python bulk_index.py --db mycrawler/mycrawler/data1.db --table jobs --index jobs_crawler
+#   python bulk_index.py --source data/export/jobs.manifest.json     # shard nén của job_pipeline.py --shards
+#   ES_NODE=http://localhost:9200 ES_INDEX=docs python bulk_index.py --workers 8 --max-mb 10
+
+DEFAULT_SOURCE = os.path.join("data", "jobs.json")
+DEFAULT_NODE = "http://localhost:9200"
+DEFAULT_INDEX = "docs"
+ID_FIELDS = ("Id tin", "id", "_id", "url")
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+# --- NGUỒN DỮ LIỆU ---
+
+def iter_ndjson(path):
+    if path.endswith(".manifest.json"):
+        # Các shard theo đúng thứ tự trong manifest, giải nén theo luồng
+        yield from shards.iter_rows(path)
+        return
+    with open(path, encoding="utf-8-sig") as f:
+        first = f.read(1)
+        while first and first.isspace():
+            first = f.read(1)
+        if first == "[":
+            # JSON array (data/jobs_array.json): không stream được, đọc cả file như index_jobs.js
+            f.seek(0)
+            yield from json.load(f)
+            return
+        f.seek(0)
+        for lineno, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError as e:
+                print(f"⚠️ Bỏ qua dòng {lineno} không phải JSON: {e}")
+
+
+def iter_db_rows(db_path, table, fetch_size=2000):
+    con = sqlite3.connect(db_path)
+    try:
+        cur = con.execute(f"SELECT * FROM {table}")
+        columns = [c[0] for c in cur.description]
+        while True:
+            rows = cur.fetchmany(fetch_size)
+            if not rows:
+                break
+            for row in rows:
+                yield dict(zip(columns, row))
+    finally:
+        con.close()
+
+
+def doc_id(doc):
+    for field in ID_FIELDS:
+        value = doc.get(field)
+        if value:
+            return str(value)
+    return None
+
+
+# --- BODY _bulk ---
+
+def encode_item(doc, index):
+    meta = {"_index": index}
+    _id = doc_id(doc)
+    if _id:
+        meta["_id"] = _id
+    action = json.dumps({"index": meta}, ensure_ascii=False)
+    source = json.dumps(doc, ensure_ascii=False, default=str)
+    return f"{action}\n{source}\n".encode("utf-8")
+
+
+def iter_batches(docs, index, max_bytes, max_docs):
+    # Mỗi lô là list các item đã encode; lô đầy khi thêm item tiếp theo sẽ vượt max_bytes
+    batch = []
+    size = 0
+    for doc in docs:
+        item = encode_item(doc, index)
+        if batch and (size + len(item) > max_bytes or len(batch) >= max_docs):
+            yield batch
+            batch = []
+            size = 0
+        batch.append(item)
+        size += len(item)
+    if batch:
+        yield batch
+
+
+# --- GỬI ---
+
+class EsConnection:
+    # Kết nối keep-alive tới 1 node, tự mở lại khi server đóng
+    def __init__(self, node, timeout=60):
+        parts = urlsplit(node)
+        self.https = parts.scheme == "https"
+        self.host = parts.hostname or "localhost"
+        self.port = parts.port or (443 if self.https else 9200)
+        self.prefix = parts.path.rstrip("/")
+        self.timeout = timeout
+        self.headers = {"Content-Type": "application/x-ndjson", "Connection": "keep-alive"}
+        if parts.username:
+            token = base64.b64encode(f"{parts.username}:{parts.password or ''}".encode()).decode()
+            self.headers["Authorization"] = f"Basic {token}"
+        self.conn = None
+
+    def request(self, method, path, body=None):
+        for attempt in (0, 1):
+            if self.conn is None:
+                cls = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+                self.conn = cls(self.host, self.port, timeout=self.timeout)
+            try:
+                self.conn.request(method, self.prefix + path, body=body, headers=self.headers)
+                response = self.conn.getresponse()
+                return response.status, response.read()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                # Kết nối keep-alive cũ đã bị đóng phía server -> mở lại và thử 1 lần nữa
+                self.close()
+                if attempt:
+                    raise
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+class BulkLoader:
+    def __init__(self, node=DEFAULT_NODE, index=DEFAULT_INDEX, workers=4, max_bytes=5 << 20, max_docs=10000,
+                 max_retries=5, backoff=0.5, max_backoff=30.0, report_every=5.0):
+        self.node = node
+        self.index = index
+        self.workers = max(workers, 1)
+        self.max_bytes = max_bytes
+        self.max_docs = max_docs
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.report_every = report_every
+        self.lock = threading.Lock()
+        self.indexed = 0
+        self.failed = 0
+        self.retried = 0
+        self.requests = 0
+        self.errors = []
+        self.failure = None  # exception đầu tiên làm 1 worker dừng (vd body 200 không phải JSON)
+        self.started = None
+        self.last_report = 0.0
+
+    def sleep_backoff(self, attempt):
+        delay = min(self.backoff * (2 ** attempt), self.max_backoff)
+        time.sleep(delay * random.uniform(0.5, 1.0))
+
+    def send_batch(self, conn, batch):
+        # Gửi lô; item bị 429 / 5xx được gom lại gửi tiếp ở lần sau
+        pending = batch
+        for attempt in range(self.max_retries + 1):
+            try:
+                status, body = conn.request("POST", "/_bulk", b"".join(pending))
+            except OSError as e:
+                # Timeout / mất kết nối: bỏ kết nối hiện tại, gửi lại cả lô sau backoff
+                conn.close()
+                status, body = None, str(e).encode()
+            with self.lock:
+                self.requests += 1
+
+            if status == 200:
+                result = json.loads(body)
+                retry = []
+                rejected = 0
+                if result.get("errors"):
+                    # items trả về theo đúng thứ tự đã gửi
+                    for item, response in zip(pending, result.get("items", [])):
+                        info = next(iter(response.values()))
+                        item_status = info.get("status", 500)
+                        if item_status in RETRY_STATUSES:
+                            retry.append(item)
+                        elif item_status >= 300:
+                            rejected += 1
+                            self.record_error(item_status, info.get("error"))
+                with self.lock:
+                    self.indexed += len(pending) - len(retry) - rejected
+                pending = retry
+            elif status is not None and status not in RETRY_STATUSES:
+                # Lỗi cả request không thử lại được (400, 401, 413, ...)
+                for _ in pending:
+                    self.record_error(status, body[:500].decode("utf-8", "replace"))
+                return
+
+            if not pending:
+                return
+            if attempt < self.max_retries:
+                with self.lock:
+                    self.retried += len(pending)
+                self.sleep_backoff(attempt)
+
+        for _ in pending:
+            self.record_error(status, "hết số lần thử lại")
+
+    def record_error(self, status, error):
+        with self.lock:
+            self.failed += 1
+            if len(self.errors) < 10:
+                self.errors.append((status, error))
+
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    def report(self):
+        now = time.monotonic()
+        with self.lock:
+            if now - self.last_report < self.report_every:
+                return
+            self.last_report = now
+            elapsed = now - self.started
+            rate = self.indexed / elapsed if elapsed else 0.0
+            print(f"  ⏱️ {self.indexed} doc / {elapsed:.1f}s = {rate:,.0f} doc/s "
+                  f"(thử lại {self.retried}, lỗi {self.failed}, {self.requests} request)")
+
+    def worker(self, batches):
+        conn = EsConnection(self.node)
+        try:
+            while True:
+                batch = batches.get()
+                if batch is None or self.failure is not None:
+                    return
+                self.send_batch(conn, batch)
+                self.report()
+        except BaseException as e:
+            # Ghi lại lỗi đầu tiên để producer ngừng đọc và run() ném lại, các worker khác cũng dừng
+            with self.lock:
+                if self.failure is None:
+                    self.failure = e
+        finally:
+            conn.close()
+
+    def put(self, batches, batch, threads):
+        # put có timeout: nếu mọi worker đã chết thì hàng đợi đầy mãi, producer không được chặn vĩnh viễn
+        while True:
+            if self.failure is not None:
+                raise self.failure
+            try:
+                batches.put(batch, timeout=0.5)
+                return
+            except queue.Full:
+                if not any(t.is_alive() for t in threads):
+                    raise self.failure or RuntimeError("mọi worker _bulk đã dừng") from None
+
+    def stop(self, batches, threads):
+        if self.failure is not None:
+            # Bỏ các lô còn chờ để worker nhận được tín hiệu dừng ngay
+            while True:
+                try:
+                    batches.get_nowait()
+                except queue.Empty:
+                    break
+        for _ in threads:
+            while any(t.is_alive() for t in threads):
+                try:
+                    batches.put(None, timeout=0.5)
+                    break
+                except queue.Full:
+                    pass
+        for t in threads:
+            t.join()
+
+    def run(self, docs, refresh=True):
+        self.started = time.monotonic()
+        self.last_report = self.started
+        # Hàng đợi giới hạn: producer (đọc + encode) bị chặn khi đã có đủ lô chờ gửi
+        batches = queue.Queue(maxsize=self.workers * 2)
+        threads = [threading.Thread(target=self.worker, args=(batches,), daemon=True) for _ in range(self.workers)]
+        for t in threads:
+            t.start()
+        try:
+            for batch in iter_batches(docs, self.index, self.max_bytes, self.max_docs):
+                self.put(batches, batch, threads)
+        finally:
+            self.stop(batches, threads)
+        if self.failure is not None:
+            raise self.failure
+
+        if refresh:
+            conn = EsConnection(self.node)
+            try:
+                conn.request("POST", f"/{self.index}/_refresh")
+            except OSError as e:
+                print(f"⚠️ Refresh {self.index} thất bại: {e}")
+            finally:
+                conn.close()
+
+        return self.indexed, self.failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Nạp NDJSON / bảng SQLite vào Elasticsearch bằng _bulk song song")
+    parser.add_argument("--source", default=DEFAULT_SOURCE, help="File NDJSON, JSON array hoặc manifest shard (*.manifest.json)")
+    parser.add_argument("--db", help="Đọc từ DB crawler thay cho --source (vd: mycrawler/mycrawler/data1.db)")
+    parser.add_argument("--table", default="jobs")
+    parser.add_argument("--index", default=os.environ.get("ES_INDEX", DEFAULT_INDEX))
+    parser.add_argument("--node", default=os.environ.get("ES_NODE", DEFAULT_NODE))
+    parser.add_argument("--workers", type=int, default=4, help="Số request _bulk chạy song song")
+    parser.add_argument("--max-mb", type=float, default=5.0, help="Kích thước tối đa 1 body _bulk (MB)")
+    parser.add_argument("--max-docs", type=int, default=10000)
+    parser.add_argument("--retries", type=int, default=5)
+    parser.add_argument("--no-refresh", action="store_true")
+    args = parser.parse_args(argv)
+
+    if args.db:
+        docs = iter_db_rows(args.db, args.table)
+        source = f"{args.db}:{args.table}"
+    else:
+        if not os.path.exists(args.source) or os.path.getsize(args.source) == 0:
+            print(f"❌ Không có dữ liệu: {args.source} không tồn tại hoặc rỗng")
+            return 1
+        docs = iter_ndjson(args.source)
+        source = args.source
+
+    print(f"➤ {source} -> {args.node}/{args.index} ({args.workers} worker, lô <= {args.max_mb} MB)")
+    loader = BulkLoader(args.node, args.index, workers=args.workers, max_bytes=int(args.max_mb * (1 << 20)),
+                        max_docs=args.max_docs, max_retries=args.retries)
+    indexed, failed = loader.run(docs, refresh=not args.no_refresh)
+    for status, error in loader.errors:
+        print(f"  ❌ [{status}] {error}")
+    if failed:
+        print(f"❌ Đã index {indexed} doc, {failed} doc lỗi")
+        return 1
+    elapsed = loader.elapsed()
+    print(f"✅ Đã index {indexed} doc vào {args.index} trong {elapsed:.1f}s "
+          f"({indexed / elapsed if elapsed else 0:,.0f} doc/s, {loader.requests} request, thử lại {loader.retried} item)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(profile_main("bulk_index", main))
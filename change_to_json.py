@@ -1,33 +1,45 @@
 import csv
 import json
 import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "mycrawler"))
+from mycrawler.profiling import profile_main  # noqa: E402
 
 # File nguồn & đích
 input_file = "data/jobs_clean.csv"
 output_file = "data/jobs.json"
 
-# Đảm bảo folder tồn tại
-os.makedirs("data", exist_ok=True)
 
-data_list = []
+def main():
+    # Đảm bảo folder tồn tại
+    os.makedirs("data", exist_ok=True)
+
+    data_list = []
+
+    with open(input_file, mode="r", encoding="utf-8-sig") as infile:
+        reader = csv.DictReader(infile)
+
+        for row in reader:
+            # Strip tất cả giá trị
+            clean_row = {k.strip(): (v.strip() if v else "") for k, v in row.items()}
 
-with open(input_file, mode="r", encoding="utf-8-sig") as infile:
-    reader = csv.DictReader(infile)
+            # Nếu dòng rỗng thì bỏ qua
+            if not any(clean_row.values()):
+                continue
 
-    for row in reader:
-        # Strip tất cả giá trị
-        clean_row = {k.strip(): (v.strip() if v else "") for k, v in row.items()}
+            data_list.append(clean_row)
 
-        # Nếu dòng rỗng thì bỏ qua
-        if not any(clean_row.values()):
-            continue
+    # Ghi JSON ra file — mỗi object trên 1 dòng (ES bulk friendly)
+    # Ghi ra file tạm rồi rename -> không ai đọc phải jobs.json ghi dở
+    with open(output_file + ".tmp", mode="w", encoding="utf-8") as outfile:
+        for obj in data_list:
+            json_line = json.dumps(obj, ensure_ascii=False)
+            outfile.write(json_line + "\n")
+    os.replace(output_file + ".tmp", output_file)
 
-        data_list.append(clean_row)
+    print(f"✅ Đã chuyển {len(data_list)} dòng thành JSON và ghi vào {output_file}")
 
-# Ghi JSON ra file — mỗi object trên 1 dòng (ES bulk friendly)
-with open(output_file, mode="w", encoding="utf-8") as outfile:
-    for obj in data_list:
-        json_line = json.dumps(obj, ensure_ascii=False)
-        outfile.write(json_line + "\n")
 
-print(f"✅ Đã chuyển {len(data_list)} dòng thành JSON và ghi vào {output_file}")
+if __name__ == "__main__":
+    profile_main("change_to_json", main)
@@ -1,24 +1,36 @@
 import csv
 import json
 import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "mycrawler"))
+from mycrawler.profiling import profile_main  # noqa: E402
 
 input_file = "data/jobs_clean.csv"
 output_file = "data/jobs_array.json"
 
-os.makedirs("data", exist_ok=True)
 
-data_list = []
+def main():
+    os.makedirs("data", exist_ok=True)
+
+    data_list = []
+
+    with open(input_file, mode="r", encoding="utf-8-sig") as infile:
+        reader = csv.DictReader(infile)
+
+        for row in reader:
+            clean_row = {k.strip(): (v.strip() if v else "") for k, v in row.items()}
+            if not any(clean_row.values()):
+                continue
+            data_list.append(clean_row)
 
-with open(input_file, mode="r", encoding="utf-8-sig") as infile:
-    reader = csv.DictReader(infile)
+    # Ghi ra file tạm rồi rename -> không ai đọc phải file ghi dở
+    with open(output_file + ".tmp", mode="w", encoding="utf-8") as outfile:
+        json.dump(data_list, outfile, ensure_ascii=False, indent=4)
+    os.replace(output_file + ".tmp", output_file)
 
-    for row in reader:
-        clean_row = {k.strip(): (v.strip() if v else "") for k, v in row.items()}
-        if not any(clean_row.values()):
-            continue
-        data_list.append(clean_row)
+    print(f"Đã tạo JSON chuẩn: {output_file}")
 
-with open(output_file, mode="w", encoding="utf-8") as outfile:
-    json.dump(data_list, outfile, ensure_ascii=False, indent=4)
 
-print(f"Đã tạo JSON chuẩn: {output_file}")
+if __name__ == "__main__":
+    profile_main("change_to_json_array", main)
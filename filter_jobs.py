@@ -1,52 +1,38 @@
-import csv
+import argparse
 import os
+import time
+
+from job_pipeline import CsvSink, run_pipeline, run_pipeline_parallel
+from mycrawler.profiling import profile_main  # job_pipeline đã thêm thư mục mycrawler vào sys.path
 
 source_file = "jobdata.csv"
 output_folder = "data"
 output_file = os.path.join(output_folder, "jobs_clean.csv")
 
-os.makedirs(output_folder, exist_ok=True)
-
-# Danh sách các cột bạn muốn giữ (sau khi strip khoảng trắng)
-fields_needed = [
-    "Id tin",
-    "Tiêu đề tin",
-    "Địa điểm tuyển dụng",
-    "Tỉnh thành tuyển dụng",
-    "Chức vụ",
-    "Mức lương",
-    "Hình thức làm việc",
-    "Ngành nghề",
-    "Lĩnh vực",
-    "Kinh nghiệm"
-]
-
-with open(source_file, mode="r", encoding="utf-8-sig", newline="") as infile, \
-     open(output_file, mode="w", encoding="utf-8-sig", newline="") as outfile:
-
-    reader = csv.DictReader(infile)
-
-    # Chuẩn hóa tên header: strip() bỏ khoảng trắng
-    normalized_fieldnames = [col.strip() for col in reader.fieldnames]
-
-    writer = csv.DictWriter(outfile, fieldnames=fields_needed)
-    writer.writeheader()
+# Danh sách các cột cần giữ nằm ở job_pipeline.FIELDS_NEEDED
+# Chạy song song trên file lớn: python filter_jobs.py --workers 8
 
-    count_in = 0
-    count_out = 0
+def main():
+    parser = argparse.ArgumentParser(description="Lọc jobdata.csv -> data/jobs_clean.csv")
+    parser.add_argument("--source", default=source_file)
+    parser.add_argument("--output", default=output_file)
+    parser.add_argument("--workers", type=int, default=1, help="Số process song song (1 = tuần tự)")
+    parser.add_argument("--chunk-mb", type=int, default=16, help="Kích thước mỗi chunk (MB)")
+    args = parser.parse_args()
 
-    for row in reader:
-        count_in += 1
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
 
-        # Tạo row đã strip key
-        clean_row = {k.strip(): v.strip() if v else "" for k, v in row.items()}
+    start = time.perf_counter()
+    sinks = [CsvSink(args.output)]
+    if args.workers > 1:
+        stats = run_pipeline_parallel(args.source, sinks, args.workers, max(args.chunk_mb, 1) << 20)
+    else:
+        stats = run_pipeline(args.source, sinks)
+    elapsed = time.perf_counter() - start
 
-        # Lấy dữ liệu theo các cột cần thiết
-        filtered = {field: clean_row.get(field, "") for field in fields_needed}
+    print(f"Đã đọc {stats['in']} dòng, ghi {stats['out']} dòng hợp lệ vào {args.output}")
+    print(f"{elapsed:.2f}s, {stats['in'] / elapsed if elapsed else 0:.0f} dòng/giây ({args.workers} process)")
 
-        # Điều kiện: TẤT CẢ các cột phải có dữ liệu (không trống)
-        if all(filtered.values()):
-            writer.writerow(filtered)
-            count_out += 1
 
-    print(f"Đã đọc {count_in} dòng, ghi {count_out} dòng hợp lệ vào {output_file}")
+if __name__ == "__main__":
+    profile_main("filter_jobs", main)
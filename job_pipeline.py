@@ -0,0 +1,358 @@
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+# Gazetteer tỉnh / quận nằm trong package mycrawler (dùng chung với CareerlinkPipeline)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "mycrawler"))
+from mycrawler.gazetteer import LOCATION_FIELDS, normalize_location  # noqa: E402
+from mycrawler.profiling import profile_main  # noqa: E402
+from mycrawler.shards import ShardedNdjsonWriter, check_compression  # noqa: E402
+
+# Pipeline một lượt: đọc CSV nguồn 1 lần, lọc + strip từng dòng,
+# ghi đồng thời ra nhiều đích (CSV sạch, NDJSON, JSON array) mà không giữ cả file trong RAM.
+# Thay cho việc chạy lần lượt filter_jobs.py -> change_to_json.py -> change_to_json_array.py
+
+DEFAULT_SOURCE = os.path.join("data", "jobdata.csv")
+DEFAULT_CSV = os.path.join("data", "jobs_clean.csv")
+DEFAULT_NDJSON = os.path.join("data", "jobs.json")
+DEFAULT_ARRAY = os.path.join("data", "jobs_array.json")
+
+# Danh sách các cột cần giữ (sau khi strip khoảng trắng)
+FIELDS_NEEDED = [
+    "Id tin",
+    "Tiêu đề tin",
+    "Địa điểm tuyển dụng",
+    "Tỉnh thành tuyển dụng",
+    "Chức vụ",
+    "Mức lương",
+    "Hình thức làm việc",
+    "Ngành nghề",
+    "Lĩnh vực",
+    "Kinh nghiệm"
+]
+
+
+def clean_row(row, fields=FIELDS_NEEDED):
+    # Strip key + value, bỏ các cột thừa (key None khi dòng có nhiều cột hơn header)
+    stripped = {k.strip(): (v.strip() if v else "") for k, v in row.items() if k is not None}
+    filtered = {field: stripped.get(field, "") for field in fields}
+
+    # Điều kiện: TẤT CẢ các cột phải có dữ liệu (không trống)
+    if all(filtered.values()):
+        return filtered
+    return None
+
+
+def add_location_codes(row):
+    # Thêm province_code / district_code chuẩn (xem mycrawler/gazetteer.py) -> lọc địa điểm bằng term chính xác
+    row.update(normalize_location(row.get("Địa điểm tuyển dụng", ""), row.get("Tỉnh thành tuyển dụng") or None))
+    return row
+
+
+def iter_clean_rows(infile, stats=None, fields=FIELDS_NEEDED, locations=False):
+    reader = csv.DictReader(infile)
+    for row in reader:
+        if stats is not None:
+            stats["in"] += 1
+        filtered = clean_row(row, fields)
+        if filtered is None:
+            continue
+        if locations:
+            add_location_codes(filtered)
+        if stats is not None:
+            stats["out"] += 1
+        yield filtered
+
+
+# --- CÁC ĐÍCH GHI (SINK) ---
+# Mỗi sink chỉ cần write(row), close() và abort(), ghi dần từng dòng ra file tạm <path>.tmp,
+# close() mới rename thành file thật -> backend / indexer không đọc phải file ghi dở.
+# Lỗi giữa chừng -> abort(): xóa file tạm, file thật của lần chạy trước giữ nguyên
+
+def _discard(sink):
+    sink.file.close()
+    if os.path.exists(sink.path + ".tmp"):
+        os.remove(sink.path + ".tmp")
+
+
+class CsvSink:
+    def __init__(self, path, fields=FIELDS_NEEDED):
+        self.path = path
+        self.file = open(path + ".tmp", mode="w", encoding="utf-8-sig", newline="")
+        self.writer = csv.DictWriter(self.file, fieldnames=fields)
+        self.writer.writeheader()
+
+    def write(self, row):
+        self.writer.writerow(row)
+
+    def close(self):
+        self.file.close()
+        os.replace(self.path + ".tmp", self.path)
+
+    def abort(self):
+        _discard(self)
+
+
+class NdjsonSink:
+    # Mỗi object trên 1 dòng (ES bulk friendly), giống change_to_json.py
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path + ".tmp", mode="w", encoding="utf-8")
+
+    def write(self, row):
+        self.file.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+    def close(self):
+        self.file.close()
+        os.replace(self.path + ".tmp", self.path)
+
+    def abort(self):
+        _discard(self)
+
+
+class JsonArraySink:
+    # Ghi JSON array từng phần tử, định dạng giống json.dump(..., indent=4) của change_to_json_array.py
+    def __init__(self, path, indent=4):
+        self.path = path
+        self.indent = indent
+        self.pad = " " * indent
+        self.count = 0
+        self.file = open(path + ".tmp", mode="w", encoding="utf-8")
+        self.file.write("[")
+
+    def write(self, row):
+        text = json.dumps(row, ensure_ascii=False, indent=self.indent)
+        text = text.replace("\n", "\n" + self.pad)
+        self.file.write(("," if self.count else "") + "\n" + self.pad + text)
+        self.count += 1
+
+    def close(self):
+        self.file.write("\n]" if self.count else "]")
+        self.file.close()
+        os.replace(self.path + ".tmp", self.path)
+
+    def abort(self):
+        _discard(self)
+
+
+def close_sinks(sinks):
+    # Chỉ publish khi cả lượt chạy thành công; sink nào close() lỗi thì bỏ nó và các sink còn lại
+    for i, sink in enumerate(sinks):
+        try:
+            sink.close()
+        except BaseException:
+            abort_sinks(sinks[i:])
+            raise
+
+
+def abort_sinks(sinks):
+    for sink in sinks:
+        try:
+            sink.abort()
+        except OSError as e:
+            print(f"⚠️ Không dọn được file tạm của {sink.path}: {e}")
+
+
+def run_pipeline(source_file, sinks, fields=FIELDS_NEEDED, locations=False):
+    stats = {"in": 0, "out": 0}
+    try:
+        with open(source_file, mode="r", encoding="utf-8-sig", newline="") as infile:
+            for row in iter_clean_rows(infile, stats, fields, locations):
+                for sink in sinks:
+                    sink.write(row)
+    except BaseException:
+        abort_sinks(sinks)
+        raise
+    close_sinks(sinks)
+    return stats
+
+
+# --- CHẾ ĐỘ SONG SONG: CHIA FILE THEO BYTE, ĐÚNG RANH GIỚI BẢN GHI ---
+# Ranh giới bản ghi = ký tự "\n" nằm NGOÀI dấu ngoặc kép. Với CSV chuẩn ("" là escape),
+# trạng thái "đang trong ngoặc" chính là tính chẵn lẻ của số dấu " từ đầu file,
+# nên chỉ cần bytes.count() (chạy ở tốc độ C) thay vì parse CSV để tìm điểm cắt.
+# Nhờ vậy các trường nhiều dòng / có dấu phẩy như "Ngành nghề" không bị cắt đôi.
+# Giả định này sai khi có dấu " lạc giữa trường không bọc ngoặc (vd: Title 5" screen): csv coi đó là ký tự
+# thường nhưng phép đếm thì bị lệch, mọi điểm cắt sau đó rơi vào giữa bản ghi -> check_chunk_starts()
+# parse vài bản ghi đầu mỗi chunk, sai số cột so với header thì chạy tuần tự.
+
+def find_chunk_boundaries(path, chunk_bytes, block_size=1 << 20):
+    # Trả về [hết header, ..., cuối file]; chunk i = [boundaries[i], boundaries[i+1])
+    boundaries = []
+    parity = 0
+    seeking = True
+    next_target = 0  # Ranh giới đầu tiên tìm được chính là cuối dòng header
+    base = 0
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(block_size)
+            if not block:
+                break
+            p = 0
+            while True:
+                if not seeking:
+                    if next_target >= base + len(block):
+                        parity ^= block.count(b'"', p) & 1
+                        break
+                    t = max(next_target - base, p)
+                    parity ^= block.count(b'"', p, t) & 1
+                    p = t
+                    seeking = True
+                idx = block.find(b"\n", p)
+                if idx == -1:
+                    parity ^= block.count(b'"', p) & 1
+                    break
+                parity ^= block.count(b'"', p, idx) & 1
+                p = idx + 1
+                if parity == 0:
+                    boundaries.append(base + p)
+                    seeking = False
+                    next_target = base + p + chunk_bytes
+            base += len(block)
+
+    if not boundaries or boundaries[-1] != base:
+        boundaries.append(base)
+    return boundaries
+
+
+def check_chunk_starts(path, boundaries, records=3, window=1 << 16):
+    # True nếu mọi chunk đều bắt đầu đúng đầu bản ghi: `records` bản ghi đầu có đúng số cột của header
+    with open(path, "rb") as f:
+        header = next(csv.reader(io.StringIO(f.read(boundaries[0]).decode("utf-8-sig"), newline="")), [])
+        for start, end in zip(boundaries[1:], boundaries[2:]):
+            f.seek(start)
+            data = f.read(min(window, end - start))
+            complete = start + len(data) == end
+            if not complete:
+                data = data[:data.rfind(b"\n") + 1]
+            rows = list(csv.reader(io.StringIO(data.decode("utf-8", "replace"), newline="")))
+            if not complete:
+                rows = rows[:-1]  # bản ghi cuối có thể bị cửa sổ đọc cắt ngang
+            if not rows or any(len(row) != len(header) for row in rows[:records]):
+                return False
+    return True
+
+
+def _clean_chunk(task):
+    # Chạy trong process con: đọc header + đoạn byte, parse và lọc như bản tuần tự
+    path, header_end, start, end, fields, locations = task
+    with open(path, "rb") as f:
+        header = f.read(header_end)
+        f.seek(start)
+        data = f.read(end - start)
+    text = header.decode("utf-8-sig") + data.decode("utf-8")
+    stats = {"in": 0, "out": 0}
+    rows = list(iter_clean_rows(io.StringIO(text, newline=""), stats, fields, locations))
+    return stats["in"], rows
+
+
+def run_pipeline_parallel(source_file, sinks, workers, chunk_bytes=16 << 20, fields=FIELDS_NEEDED, locations=False):
+    stats = {"in": 0, "out": 0}
+    boundaries = find_chunk_boundaries(source_file, chunk_bytes)
+    if not check_chunk_starts(source_file, boundaries):
+        print("⚠️ Không chia được file theo ranh giới bản ghi (có dấu \" lạc trong trường?), chạy tuần tự")
+        return run_pipeline(source_file, sinks, fields, locations)
+    header_end = boundaries[0]
+    tasks = [(source_file, header_end, start, end, fields, locations)
+             for start, end in zip(boundaries, boundaries[1:]) if end > start]
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # Chỉ giữ tối đa 2*workers chunk đang chạy, ghi ra theo đúng thứ tự chunk
+            pending = deque()
+            for task in tasks:
+                pending.append(pool.submit(_clean_chunk, task))
+                if len(pending) >= workers * 2:
+                    _write_chunk(pending.popleft().result(), sinks, stats)
+            while pending:
+                _write_chunk(pending.popleft().result(), sinks, stats)
+    except BaseException:
+        abort_sinks(sinks)
+        raise
+    close_sinks(sinks)
+    return stats
+
+
+def _write_chunk(result, sinks, stats):
+    count_in, rows = result
+    stats["in"] += count_in
+    stats["out"] += len(rows)
+    for row in rows:
+        for sink in sinks:
+            sink.write(row)
+
+
+def build_sinks(args):
+    sinks = []
+    fields = FIELDS_NEEDED + LOCATION_FIELDS if args.locations else FIELDS_NEEDED
+    if args.csv:
+        sinks.append(CsvSink(args.csv, fields))
+    if args.ndjson:
+        sinks.append(NdjsonSink(args.ndjson))
+    if args.array:
+        sinks.append(JsonArraySink(args.array))
+    if args.columnar:
+        from job_snapshot import ColumnarSink
+        sinks.append(ColumnarSink(args.columnar, fields))
+    if args.shards:
+        # NDJSON nén theo shard + manifest (mycrawler/mycrawler/shards.py)
+        sinks.append(ShardedNdjsonWriter(args.shards, "jobs", args.compression, int(args.shard_mb * (1 << 20))))
+    return sinks
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Lọc jobdata.csv và xuất CSV sạch / NDJSON / JSON array trong 1 lượt đọc")
+    parser.add_argument("--source", default=DEFAULT_SOURCE, help="File CSV nguồn")
+    parser.add_argument("--csv", help="Ghi CSV sạch (vd: data/jobs_clean.csv)")
+    parser.add_argument("--ndjson", help="Ghi NDJSON, mỗi job 1 dòng (vd: data/jobs.json)")
+    parser.add_argument("--array", help="Ghi JSON array (vd: data/jobs_array.json)")
+    parser.add_argument("--columnar", help="Ghi snapshot dạng cột, mở bằng mmap (vd: data/jobs.cols)")
+    parser.add_argument("--shards", help="Ghi NDJSON nén chia shard + manifest vào thư mục này (vd: data/export)")
+    parser.add_argument("--compression", choices=["gzip", "zstd", "none"], default="gzip", help="Kiểu nén shard")
+    parser.add_argument("--shard-mb", type=float, default=64, help="Kích thước tối đa 1 shard (MB, chưa nén)")
+    parser.add_argument("--workers", type=int, default=1, help="Số process song song (1 = chạy tuần tự)")
+    parser.add_argument("--chunk-mb", type=int, default=16, help="Kích thước mỗi chunk (MB) khi chạy song song")
+    parser.add_argument("--no-locations", dest="locations", action="store_false",
+                        help="Không thêm cột mã tỉnh / quận (giữ đúng định dạng của các script cũ)")
+    args = parser.parse_args(argv)
+    if args.shards:
+        try:
+            check_compression(args.compression)
+        except ValueError as e:
+            parser.error(f"--compression {args.compression}: {e}")
+
+    # Không chỉ định đích nào -> ghi cả 3 file mặc định như các script cũ
+    if not (args.csv or args.ndjson or args.array or args.columnar or args.shards):
+        args.csv, args.ndjson, args.array = DEFAULT_CSV, DEFAULT_NDJSON, DEFAULT_ARRAY
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    for path in (args.csv, args.ndjson, args.array, args.columnar):
+        if path and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    sinks = build_sinks(args)
+    start = time.perf_counter()
+    if args.workers > 1:
+        stats = run_pipeline_parallel(args.source, sinks, args.workers, max(args.chunk_mb, 1) << 20,
+                                      locations=args.locations)
+    else:
+        stats = run_pipeline(args.source, sinks, locations=args.locations)
+    elapsed = time.perf_counter() - start
+
+    targets = ", ".join(sink.path for sink in sinks)
+    print(f"✅ Đã đọc {stats['in']} dòng, ghi {stats['out']} dòng hợp lệ vào {targets}")
+    print(f"⏱️ {elapsed:.2f}s, {stats['in'] / elapsed if elapsed else 0:.0f} dòng/giây ({args.workers} process)")
+
+
+if __name__ == "__main__":
+    # --profile / MYCRAWLER_PROFILE: profile 1 lần chạy (mycrawler/mycrawler/profiling.py)
+    profile_main("job_pipeline", main)
@@ -0,0 +1,271 @@
+import json
+import mmap
+import os
+import struct
+import tempfile
+from array import array
+
+from job_pipeline import FIELDS_NEEDED
+
+# Snapshot dạng cột, đọc bằng mmap (không parse JSON/CSV, không copy dữ liệu khi mở):
+#
+#   MAGIC (8 byte) | độ dài header (uint32) | header JSON | các khối dữ liệu (căn lề 8 byte)
+#
+# Header liệt kê số dòng và từng cột:
+#   "plain": offsets (uint64, n+1) + blob UTF-8            -> giá trị dòng i = blob[offsets[i]:offsets[i+1]]
+#   "dict" : codes (uint16 / uint32, n) + từ điển (offsets + blob) các giá trị khác nhau
+# Cột ít giá trị (tỉnh thành, chức vụ, hình thức làm việc, ...) dùng "dict": mỗi dòng chỉ tốn 2-4 byte
+# và lọc chính xác theo giá trị = so sánh mã số.
+#
+#   python job_pipeline.py --columnar data/jobs.cols
+#   from job_snapshot import open_snapshot; snap = open_snapshot("data/jobs.cols"); snap.row(0)
+
+MAGIC = b"JOBCOL1\0"
+DEFAULT_SNAPSHOT = os.path.join("data", "jobs.cols")
+
+DICT_COLUMNS = [
+    "Tỉnh thành tuyển dụng",
+    "Chức vụ",
+    "Hình thức làm việc",
+    "Mức lương",
+    "Kinh nghiệm",
+    "Ngành nghề",
+    "province_code",
+    "province",
+    "district_code",
+    "district",
+    "province_codes",
+]
+
+
+def _pad(f):
+    extra = (-f.tell()) % 8
+    if extra:
+        f.write(b"\0" * extra)
+
+
+class _PlainColumnWriter:
+    def __init__(self, spool_dir):
+        self.offsets = array("Q", [0])
+        self.blob = tempfile.TemporaryFile(dir=spool_dir)
+
+    def add(self, value):
+        data = value.encode("utf-8")
+        self.blob.write(data)
+        self.offsets.append(self.offsets[-1] + len(data))
+
+    def write(self, f):
+        _pad(f)
+        offsets_at = f.tell()
+        self.offsets.tofile(f)
+        blob_at = f.tell()
+        self.blob.seek(0)
+        while True:
+            chunk = self.blob.read(1 << 20)
+            if not chunk:
+                break
+            f.write(chunk)
+        self.blob.close()
+        return {"encoding": "plain", "offsets": offsets_at, "blob": blob_at, "blob_size": self.offsets[-1]}
+
+
+class _DictColumnWriter:
+    def __init__(self):
+        self.lookup = {}
+        self.values = []
+        self.codes = array("I")
+
+    def add(self, value):
+        code = self.lookup.get(value)
+        if code is None:
+            code = self.lookup[value] = len(self.values)
+            self.values.append(value)
+        self.codes.append(code)
+
+    def write(self, f):
+        codes = array("H", self.codes) if len(self.values) <= 0xFFFF else self.codes
+        _pad(f)
+        codes_at = f.tell()
+        codes.tofile(f)
+
+        dictionary = [v.encode("utf-8") for v in self.values]
+        offsets = array("Q", [0])
+        for data in dictionary:
+            offsets.append(offsets[-1] + len(data))
+        _pad(f)
+        offsets_at = f.tell()
+        offsets.tofile(f)
+        blob_at = f.tell()
+        f.write(b"".join(dictionary))
+        return {"encoding": "dict", "code_type": codes.typecode, "codes": codes_at,
+                "dict_size": len(self.values), "offsets": offsets_at, "blob": blob_at, "blob_size": offsets[-1]}
+
+
+class SnapshotWriter:
+    # Ghi dần từng dòng; cột plain được spool ra file tạm, chỉ giữ mảng offsets / mã trong RAM
+    def __init__(self, path, fields=FIELDS_NEEDED, dict_columns=DICT_COLUMNS):
+        self.path = path
+        self.fields = list(fields)
+        spool_dir = os.path.dirname(os.path.abspath(path))
+        self.columns = {name: _DictColumnWriter() if name in dict_columns else _PlainColumnWriter(spool_dir)
+                        for name in self.fields}
+        self.count = 0
+
+    def write(self, row):
+        for name, column in self.columns.items():
+            column.add(row.get(name) or "")
+        self.count += 1
+
+    def close(self):
+        # Ghi dữ liệu trước vào file tạm, header có offset đúng được ghi sau cùng rồi rename (atomic)
+        directory = os.path.dirname(os.path.abspath(self.path))
+        with tempfile.TemporaryFile(dir=directory) as body:
+            meta = {"rows": self.count, "columns": []}
+            for name, column in self.columns.items():
+                info = column.write(body)  # Offset tính từ đầu khối dữ liệu
+                info["name"] = name
+                meta["columns"].append(info)
+
+            header = json.dumps(meta, ensure_ascii=False).encode("utf-8")
+            data_start = _data_start(len(header))
+
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "wb") as out:
+                out.write(MAGIC)
+                out.write(struct.pack("<I", len(header)))
+                out.write(header)
+                out.write(b"\0" * (data_start - out.tell()))
+                body.seek(0)
+                while True:
+                    chunk = body.read(1 << 20)
+                    if not chunk:
+                        break
+                    out.write(chunk)
+            os.replace(tmp_path, self.path)
+
+    def abort(self):
+        # Bỏ các file spool; file .tmp chỉ có trong close() (lỗi giữa chừng thì xóa nốt)
+        for column in self.columns.values():
+            if isinstance(column, _PlainColumnWriter):
+                column.blob.close()
+        if os.path.exists(self.path + ".tmp"):
+            os.remove(self.path + ".tmp")
+
+
+# Sink cho job_pipeline.run_pipeline (write(row) / close() / abort())
+ColumnarSink = SnapshotWriter
+
+
+def _data_start(header_len):
+    # Khối dữ liệu bắt đầu ngay sau header, căn lề 8 byte
+    prefix_len = len(MAGIC) + 4 + header_len
+    return prefix_len + (-prefix_len) % 8
+
+
+# --- ĐỌC (mmap, lazy) ---
+
+class _StringArray:
+    def __init__(self, view, offsets_at, blob_at, count):
+        self.offsets = view[offsets_at:offsets_at + 8 * (count + 1)].cast("Q")
+        self.view = view
+        self.blob_at = blob_at
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        start = self.blob_at + self.offsets[i]
+        end = self.blob_at + self.offsets[i + 1]
+        return bytes(self.view[start:end]).decode("utf-8")
+
+
+class Column:
+    def __init__(self, view, info, rows, data_start):
+        self.name = info["name"]
+        self.encoding = info["encoding"]
+        self.rows = rows
+        if self.encoding == "dict":
+            size = struct.calcsize(info["code_type"])
+            codes_at = data_start + info["codes"]
+            # memoryview trên mmap: không copy, numpy.asarray(column.codes) cũng không copy
+            self.codes = view[codes_at:codes_at + size * rows].cast(info["code_type"])
+            self.dictionary = _StringArray(view, data_start + info["offsets"], data_start + info["blob"], info["dict_size"])
+        else:
+            self.codes = None
+            self.dictionary = None
+            self.values = _StringArray(view, data_start + info["offsets"], data_start + info["blob"], rows)
+
+    def __len__(self):
+        return self.rows
+
+    def __getitem__(self, i):
+        if self.encoding == "dict":
+            return self.dictionary[self.codes[i]]
+        return self.values[i]
+
+    def code_of(self, value):
+        if self.encoding != "dict":
+            raise ValueError(f"Cột '{self.name}' không dùng dictionary encoding")
+        for code in range(len(self.dictionary)):
+            if self.dictionary[code] == value:
+                return code
+        return None
+
+    def where_equals(self, value):
+        # Chỉ số các dòng có giá trị đúng bằng value
+        if self.encoding == "dict":
+            code = self.code_of(value)
+            if code is None:
+                return []
+            return [i for i, c in enumerate(self.codes) if c == code]
+        return [i for i in range(self.rows) if self.values[i] == value]
+
+
+class Snapshot:
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        self.mm = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self.mm)
+        if bytes(view[:len(MAGIC)]) != MAGIC:
+            raise ValueError(f"{path} không phải snapshot dạng cột")
+        (header_len,) = struct.unpack_from("<I", self.mm, len(MAGIC))
+        header_at = len(MAGIC) + 4
+        meta = json.loads(bytes(view[header_at:header_at + header_len]).decode("utf-8"))
+        self.rows = meta["rows"]
+        data_start = _data_start(header_len)
+        self.columns = {info["name"]: Column(view, info, self.rows, data_start) for info in meta["columns"]}
+        self.fields = list(self.columns)
+
+    def __len__(self):
+        return self.rows
+
+    def column(self, name):
+        return self.columns[name]
+
+    def row(self, i):
+        return {name: column[i] for name, column in self.columns.items()}
+
+    def iter_rows(self):
+        for i in range(self.rows):
+            yield self.row(i)
+
+    def close(self):
+        # Giải phóng các memoryview trước khi đóng mmap
+        self.columns = {}
+        try:
+            self.mm.close()
+        except BufferError:
+            pass
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_snapshot(path=DEFAULT_SNAPSHOT):
+    return Snapshot(path)
@@ -0,0 +1,392 @@
+import argparse
+import csv
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import Manager
+
+# Sink dùng chung với job_pipeline.py, gazetteer / shard trong package mycrawler
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "mycrawler"))
+from job_pipeline import CsvSink, JsonArraySink, NdjsonSink, abort_sinks, close_sinks  # noqa: E402
+from mycrawler.gazetteer import LOCATION_FIELDS, normalize_location  # noqa: E402
+from mycrawler.profiling import profile_main  # noqa: E402
+from mycrawler.shards import ShardedNdjsonWriter, check_compression  # noqa: E402
+
+# --- GỘP CÁC NGUỒN JOB NGOÀI (data/jobs/) VỀ 1 SCHEMA ---
+# Mỗi nguồn = file + cách đọc từng bản ghi + hàm map sang schema chung (cùng tên cột với bảng jobs
+# của CareerLink: url, title, company, location, salary, experience -> normalize_jobs.py, gazetteer dùng chung).
+#   - JSON dump của API được đọc tăng dần (iter_json_array): chỉ giữ 1 phần tử + bộ đệm đọc trong RAM
+#   - CSV đọc bằng csv.DictReader (vốn đã theo dòng)
+#   - --workers > 1: mỗi nguồn đọc + map trong 1 process, gửi về theo lô qua hàng đợi có giới hạn;
+#     process chính làm sạch, bỏ trùng url (dt.csv và vieclam24h.json có chung tin) rồi ghi ra các sink
+#     theo đúng thứ tự nguồn như khi chạy tuần tự (lô của nguồn sau chờ trong RAM đến lượt)
+# Thêm nguồn: viết 1 hàm map_<nguồn>(record) -> dict, thêm 1 dòng vào SOURCES.
+
+JOBS_DIR = os.path.join("data", "jobs")
+DEFAULT_CSV = os.path.join("data", "jobs_sources.csv")
+DEFAULT_NDJSON = os.path.join("data", "jobs_sources.json")
+BATCH_SIZE = 500
+
+JOB_FIELDS = ["source", "source_id", "url", "title", "company", "location", "salary", "experience"]
+
+
+# --- ĐỌC JSON TĂNG DẦN ---
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_NUMBER_END = re.compile(r"[ \t\n\r,\]}]")
+_DECODER = json.JSONDecoder()
+
+
+class _JsonStream:
+    # Bộ đệm đọc file theo khối; value() giải mã 1 giá trị JSON hoàn chỉnh ở vị trí hiện tại
+    def __init__(self, file, chunk_size):
+        self.file = file
+        self.chunk_size = chunk_size
+        self.buf = ""
+        self.pos = 0
+
+    def _fill(self):
+        # Giá trị dài hơn bộ đệm -> đọc thêm ít nhất bằng phần đang có (tránh parse lại quá nhiều lần)
+        data = self.file.read(max(self.chunk_size, len(self.buf) - self.pos))
+        if not data:
+            return False
+        self.buf = self.buf[self.pos:] + data
+        self.pos = 0
+        return True
+
+    def peek(self):
+        while True:
+            self.pos = _WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                raise ValueError("JSON kết thúc giữa chừng")
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"JSON: cần '{char}' ở vị trí {self.pos}, gặp '{self.buf[self.pos]}'")
+        self.pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                obj, end = _DECODER.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # Số sát cuối bộ đệm có thể bị cắt ("-1." của "-1.5e3") -> chỉ nhận khi đã thấy ký tự kết thúc số
+            if isinstance(obj, (int, float)) and not _NUMBER_END.match(self.buf, end) and self._fill():
+                continue
+            self.pos = end
+            return obj
+
+
+def iter_json_array(file, path, chunk_size=1 << 16):
+    # Duyệt các phần tử của mảng nằm ở path (vd ("data", "items")) mà không nạp cả file.
+    # Giá trị đứng trước mảng (meta, code, ...) được giải mã rồi bỏ, phần sau mảng không đọc tới.
+    stream = _JsonStream(file, chunk_size)
+    for key in path:
+        stream.expect("{")
+        while True:
+            if stream.peek() == "}":
+                raise KeyError(f"JSON không có khóa '{key}'")
+            name = stream.value()
+            stream.expect(":")
+            if name == key:
+                break
+            stream.value()
+            if stream.peek() == ",":
+                stream.pos += 1
+    stream.expect("[")
+    if stream.peek() == "]":
+        return
+    while True:
+        yield stream.value()
+        char = stream.peek()
+        stream.pos += 1
+        if char == "]":
+            return
+        if char != ",":
+            raise ValueError(f"JSON: cần ',' hoặc ']' ở vị trí {stream.pos - 1}, gặp '{char}'")
+
+
+def json_records(*path):
+    return lambda f: iter_json_array(f, path)
+
+
+def csv_records(f):
+    return csv.DictReader(f)
+
+
+# --- MAP TỪNG NGUỒN -> SCHEMA CHUNG ---
+# "province" (nếu có) là gợi ý tỉnh cho gazetteer, được thay bằng tên chuẩn khi làm sạch
+
+# experience_range của vieclam24h (đối chiếu với cột experience trong dt.csv)
+VIECLAM24H_EXPERIENCE = {
+    1: "Chưa có kinh nghiệm",
+    2: "Dưới 1 năm",
+    3: "1 năm",
+    4: "2 năm",
+    5: "3 năm",
+    6: "4 năm",
+    7: "5 năm",
+    8: "Hơn 5 năm",
+}
+
+
+def _number(value):
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def salary_text(low, high, negotiable=False):
+    # Lương dạng số (VND) -> chuỗi giống CareerLink ("12 - 15 triệu") để normalize_jobs.py parse chung
+    low, high = _number(low), _number(high)
+    if negotiable or not (low or high):
+        return "Thỏa thuận"
+    if low and high:
+        return f"{low / 1e6:g} - {high / 1e6:g} triệu"
+    return f"Từ {low / 1e6:g} triệu" if low else f"Đến {high / 1e6:g} triệu"
+
+
+def map_vieclam24h(item):
+    provinces = item.get("province_ids") or [0]
+    return {
+        "source_id": item["id"],
+        "url": f"https://vieclam24h.vn/{item['title_slug']}-c{item.get('field_ids_main') or 0}p{provinces[0]}id{item['id']}.html",
+        "title": item.get("title"),
+        "company": (item.get("employer_info") or {}).get("name"),
+        "location": item.get("contact_address"),
+        "salary": salary_text(item.get("salary_min"), item.get("salary_max")),
+        "experience": VIECLAM24H_EXPERIENCE.get(item.get("experience_range"), ""),
+    }
+
+
+def map_vieclam24h_dt(row):
+    # dt.csv: bản vieclam24h đã làm phẳng, mảng kiểu Postgres "{Hà Nội,Hồ Chí Minh}"
+    cities = row.get("location_city", "").strip("{}").split(",")
+    return {
+        "source_id": row["id"],
+        "url": row.get("source_url"),
+        "title": row.get("title"),
+        "company": row.get("company"),
+        "location": row.get("location"),
+        "salary": row.get("salary"),
+        "experience": row.get("experience"),
+        "province": cities[0].strip('"'),
+    }
+
+
+def map_vietnamwork(job):
+    location = (job.get("workingLocations") or [{}])[0]
+    years = int(_number(job.get("yearsOfExperience")))
+    return {
+        "source_id": job["jobId"],
+        "url": job.get("jobUrl"),
+        "title": job.get("jobTitle"),
+        "company": job.get("companyName"),
+        "location": location.get("address") or job.get("address"),
+        "salary": job.get("prettySalary"),
+        "experience": f"{years} năm" if years > 0 else "Không yêu cầu",
+        "province": location.get("cityNameVI"),
+    }
+
+
+def map_topdev(row):
+    # topdev.csv: cột lồng được làm phẳng thành "company.display_name", "salary.min_filter", ...
+    return {
+        "source_id": row["id"],
+        "url": f"https://topdev.vn/viec-lam/{row['slug']}-{row['id']}",
+        "title": row.get("title"),
+        "company": row.get("company.display_name"),
+        "location": "",
+        "salary": salary_text(row.get("salary.min_filter"), row.get("salary.max_filter"),
+                              row.get("salary.is_negotiable") == "1"),
+        "experience": "",
+    }
+
+
+# Tên nguồn -> (file, cách đọc bản ghi, hàm map)
+SOURCES = {
+    "vieclam24h": (os.path.join(JOBS_DIR, "vieclam24h", "vieclam24h.json"), json_records("data", "items"), map_vieclam24h),
+    "vieclam24h_dt": (os.path.join(JOBS_DIR, "vieclam24h", "dt.csv"), csv_records, map_vieclam24h_dt),
+    "vietnamwork": (os.path.join(JOBS_DIR, "vietnamwork", "vietnamwork.json"), json_records("data"), map_vietnamwork),
+    "topdev": (os.path.join(JOBS_DIR, "topdev", "topdev.csv"), csv_records, map_topdev),
+}
+
+
+def iter_source(name):
+    path, read_records, map_record = SOURCES[name]
+    with open(path, mode="r", encoding="utf-8-sig", newline="") as f:
+        for record in read_records(f):
+            job = map_record(record)
+            if job:
+                job["source"] = name
+                yield job
+
+
+# --- LÀM SẠCH (chung cho mọi nguồn) ---
+
+def clean_job(job, locations=True):
+    # Gộp khoảng trắng, bắt buộc có url + title; thêm mã tỉnh / quận như job_pipeline.py --locations
+    province = " ".join(str(job.get("province") or "").split())
+    cleaned = {field: " ".join(str(job.get(field) or "").split()) for field in JOB_FIELDS}
+    if not (cleaned["url"] and cleaned["title"]):
+        return None
+    if locations:
+        cleaned.update(normalize_location(cleaned["location"], province or None))
+    return cleaned
+
+
+class JobCleaner:
+    def __init__(self, locations=True):
+        self.locations = locations
+        self.seen_urls = set()
+        self.stats = {}
+
+    def __call__(self, job):
+        counts = self.stats.setdefault(job["source"], {"in": 0, "out": 0})
+        counts["in"] += 1
+        cleaned = clean_job(job, self.locations)
+        if cleaned is None or cleaned["url"] in self.seen_urls:
+            return None
+        self.seen_urls.add(cleaned["url"])
+        counts["out"] += 1
+        return cleaned
+
+
+# --- CHẠY ---
+
+def run_sources(names, sinks, workers=1, locations=True):
+    cleaner = JobCleaner(locations)
+    if workers > 1 and len(names) > 1:
+        batches = iter_batches_parallel(names, workers)
+    else:
+        batches = (iter_source(name) for name in names)
+    try:
+        for batch in batches:
+            for job in batch:
+                cleaned = cleaner(job)
+                if cleaned is not None:
+                    for sink in sinks:
+                        sink.write(cleaned)
+    except BaseException:
+        # Nguồn hỏng / thiếu file / process con lỗi: dừng các process đọc, bỏ file tạm, file cũ giữ nguyên
+        batches.close()
+        abort_sinks(sinks)
+        raise
+    close_sinks(sinks)
+    return cleaner.stats
+
+
+def _read_source(index, name, queue):
+    # Chạy trong process con: đọc + map 1 nguồn, gửi về theo lô (index, lô); (index, None) = nguồn đã xong
+    # (kể cả khi lỗi)
+    batch = []
+    try:
+        for job in iter_source(name):
+            batch.append(job)
+            if len(batch) >= BATCH_SIZE:
+                queue.put((index, batch))
+                batch = []
+    finally:
+        queue.put((index, batch))
+        queue.put((index, None))
+
+
+def iter_batches_parallel(names, workers):
+    # Các nguồn đọc song song nhưng lô được trả ra đúng thứ tự names như khi chạy tuần tự: nguồn đang tới lượt
+    # đi thẳng ra sink, lô của nguồn sau được giữ lại đến khi các nguồn trước xong -> cùng file kết quả
+    # (thứ tự dòng, nguồn nào thắng khi trùng url) với --workers 1.
+    # Manager đóng trước pool: dừng giữa chừng thì queue.put() đang chờ trong process con báo lỗi
+    # thay vì chờ mãi, pool mới đóng được
+    with ProcessPoolExecutor(max_workers=min(workers, len(names))) as pool, Manager() as manager:
+        # Hàng đợi có giới hạn: nguồn đọc nhanh hơn tốc độ ghi thì phải chờ ở hàng đợi / bộ đệm
+        queue = manager.Queue(maxsize=workers * 4)
+        futures = [pool.submit(_read_source, index, name, queue) for index, name in enumerate(names)]
+        held = [[] for _ in names]
+        finished = [False] * len(names)
+        current = 0
+        while current < len(names):
+            index, batch = queue.get()
+            if batch is None:
+                finished[index] = True
+            elif index == current:
+                yield batch
+            else:
+                held[index].append(batch)
+            while current < len(names) and finished[current]:
+                current += 1
+                if current < len(names):
+                    yield from held[current]
+                    held[current] = []
+        for future in futures:
+            future.result()  # báo lỗi của nguồn nào đọc hỏng
+
+
+def build_sinks(args):
+    fields = JOB_FIELDS + LOCATION_FIELDS if args.locations else JOB_FIELDS
+    sinks = []
+    if args.csv:
+        sinks.append(CsvSink(args.csv, fields))
+    if args.ndjson:
+        sinks.append(NdjsonSink(args.ndjson))
+    if args.array:
+        sinks.append(JsonArraySink(args.array))
+    if args.shards:
+        sinks.append(ShardedNdjsonWriter(args.shards, "jobs_sources", args.compression, int(args.shard_mb * (1 << 20))))
+    return sinks
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Gộp các nguồn job trong data/jobs/ về 1 schema và xuất CSV / NDJSON / JSON array")
+    parser.add_argument("--source", action="append", choices=sorted(SOURCES),
+                        help="Chỉ đọc nguồn này (lặp lại để chọn nhiều, mặc định: tất cả)")
+    parser.add_argument("--csv", help="Ghi CSV (vd: data/jobs_sources.csv)")
+    parser.add_argument("--ndjson", help="Ghi NDJSON, mỗi job 1 dòng (vd: data/jobs_sources.json)")
+    parser.add_argument("--array", help="Ghi JSON array")
+    parser.add_argument("--shards", help="Ghi NDJSON nén chia shard + manifest vào thư mục này")
+    parser.add_argument("--compression", choices=["gzip", "zstd", "none"], default="gzip", help="Kiểu nén shard")
+    parser.add_argument("--shard-mb", type=float, default=64, help="Kích thước tối đa 1 shard (MB, chưa nén)")
+    parser.add_argument("--workers", type=int, default=len(SOURCES), help="Số process đọc nguồn song song (1 = tuần tự)")
+    parser.add_argument("--no-locations", dest="locations", action="store_false", help="Không thêm cột mã tỉnh / quận")
+    args = parser.parse_args(argv)
+    if args.shards:
+        try:
+            check_compression(args.compression)
+        except ValueError as e:
+            parser.error(f"--compression {args.compression}: {e}")
+
+    if not (args.csv or args.ndjson or args.array or args.shards):
+        args.csv, args.ndjson = DEFAULT_CSV, DEFAULT_NDJSON
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    for path in (args.csv, args.ndjson, args.array):
+        if path and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    names = args.source or list(SOURCES)
+    sinks = build_sinks(args)
+    start = time.perf_counter()
+    stats = run_sources(names, sinks, args.workers, args.locations)
+    elapsed = time.perf_counter() - start
+
+    for name in names:
+        counts = stats.get(name, {"in": 0, "out": 0})
+        print(f"  {name}: đọc {counts['in']}, ghi {counts['out']}")
+    total = sum(counts["out"] for counts in stats.values())
+    print(f"✅ Ghi {total} job từ {len(names)} nguồn vào {', '.join(sink.path for sink in sinks)} ({elapsed:.2f}s)")
+
+
+if __name__ == "__main__":
+    profile_main("job_sources", main)
@@ -0,0 +1,95 @@
+import hashlib
+import math
+import os
+import sqlite3
+
+# --- INDEX URL TRONG RAM (thay cho SELECT 1 ... WHERE url = ? mỗi link) ---
+# Nạp 1 lần khi spider mở, dùng chung giữa spider (lọc link) và pipeline (thêm url vừa ghi).
+#   mode "set"  : tập fingerprint 64-bit của url -> chính xác (xác suất trùng ~ 0)
+#   mode "bloom": Bloom filter, tốn ít RAM hơn cho bảng rất lớn, có thể báo nhầm "đã có"
+#                 với xác suất ~ error_rate (link đó sẽ bị bỏ qua ở lượt này)
+
+def url_fingerprint(url):
+    return int.from_bytes(hashlib.blake2b(url.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+class UrlIndex:
+    def __init__(self):
+        self.fingerprints = set()
+
+    def add(self, url):
+        self.fingerprints.add(url_fingerprint(url))
+
+    def __contains__(self, url):
+        return url_fingerprint(url) in self.fingerprints
+
+    def __len__(self):
+        return len(self.fingerprints)
+
+
+class BloomUrlIndex:
+    def __init__(self, capacity, error_rate=0.001):
+        capacity = max(capacity, 1)
+        self.num_bits = max(int(-capacity * math.log(error_rate) / (math.log(2) ** 2)), 8)
+        self.num_hashes = max(int(round(self.num_bits / capacity * math.log(2))), 1)
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, url):
+        # Double hashing: h1 + i*h2 từ 1 lần băm blake2b 16 byte
+        digest = hashlib.blake2b(url.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, url):
+        for pos in self._positions(url):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, url):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(url))
+
+    def __len__(self):
+        return self.count
+
+
+def load_url_index(db_path, table, mode="set", error_rate=0.001):
+    con = sqlite3.connect(db_path)
+    try:
+        cur = con.cursor()
+        cur.execute("SELECT name FROM sqlite_master WHERE type='table' AND name=?;", (table,))
+        if not cur.fetchone():
+            return BloomUrlIndex(100000, error_rate) if mode == "bloom" else UrlIndex()
+
+        if mode == "bloom":
+            cur.execute(f"SELECT COUNT(*) FROM {table}")
+            # Dư chỗ gấp đôi cho các url mới trong lúc crawl
+            index = BloomUrlIndex(max(cur.fetchone()[0] * 2, 100000), error_rate)
+        else:
+            index = UrlIndex()
+
+        cur.execute(f"SELECT url FROM {table}")
+        while True:
+            rows = cur.fetchmany(5000)
+            if not rows:
+                break
+            for (url,) in rows:
+                index.add(url)
+        return index
+    finally:
+        con.close()
+
+
+# Mỗi process chỉ giữ 1 index cho mỗi (db, bảng) -> spider và pipeline dùng chung
+_INDEXES = {}
+
+def get_url_index(db_path, table, settings=None):
+    key = (os.path.abspath(db_path), table)
+    if key not in _INDEXES:
+        mode = settings.get("DEDUP_INDEX_MODE", "set") if settings else "set"
+        error_rate = settings.getfloat("DEDUP_BLOOM_ERROR_RATE", 0.001) if settings else 0.001
+        index = load_url_index(db_path, table, mode, error_rate)
+        print(f"--> [DEDUP] Nạp {len(index)} url từ {db_path}/{table} (mode={mode})")
+        _INDEXES[key] = index
+    return _INDEXES[key]
@@ -0,0 +1,594 @@
+import os
+import pickle
+import socket
+import sqlite3
+import time
+import uuid
+from collections import deque
+from urllib.parse import unquote, urlsplit
+
+from mycrawler import storage
+
+# --- CHẾ ĐỘ PHÂN TÁN: NHIỀU WORKER (PROCESS / MÁY) CHUNG 1 HÀNG ĐỢI REQUEST ---
+# Bật bằng setting DISTRIBUTED (hoặc biến môi trường MYCRAWLER_DISTRIBUTED, run_scheduler.py --distributed):
+#   "sqlite"              = queue.db cạnh data.db / data1.db (storage.db_dir), nhiều process trên 1 máy
+#   "sqlite:///file.db"   = file SQLite khác (sqlite:////đường/dẫn/tuyệt/đối.db)
+#   "redis://host:6379/0" = Redis (hoặc server tương thích, vd benchmarks/fake_redis.py) cho nhiều máy;
+#                           client RESP tối giản bằng socket, không cần cài thư viện redis
+# Mỗi worker chạy "scrapy crawl <spider>" như thường; DistributedScheduler thay scheduler của Scrapy:
+#   - request được tuần tự hóa (Request.to_dict + pickle) vào hàng đợi chung, xếp theo priority
+#   - key chống trùng = fingerprint của Scrapy (hoặc frontier_key = url đã chuẩn hóa của HustEdu);
+#     worker nào xếp hàng trước thì worker khác bỏ qua -> không url nào bị tải 2 lần trong 1 lượt.
+#     Start request (trang danh sách, RSS, recheck) của mọi worker cũng qua chống trùng dù dont_filter;
+#     request dont_filter khác (retry) luôn được xếp hàng
+#   - worker lấy request = thuê (lease) DISTRIBUTED_LEASE giây, trả (ack) khi callback / errback đã chạy xong
+#     (request con đã vào hàng đợi); worker chết giữa chừng -> hết hạn thuê, request quay lại cho worker khác
+#   - worker không đóng khi hàng đợi chung còn request (kể cả đang được worker khác tải)
+#   - hết lượt: worker đóng cuối cùng (hàng đợi chung rỗng) xóa tập chống trùng; lượt trước bị ngắt mà
+#     hàng đợi đã rỗng thì worker đầu tiên mở spider xóa
+# GlobalRateLimitMiddleware: ngân sách chung DISTRIBUTED_DOMAIN_RATE req/s cho mỗi domain, cộng dồn mọi worker
+# (cửa sổ cố định DISTRIBUTED_RATE_WINDOW giây); AdaptiveConcurrencyMiddleware vẫn chỉnh riêng từng worker.
+# Item vẫn ghi qua pipeline theo lô của từng worker (storage.py); nhiều máy thì mỗi máy ghi DB của nó.
+# Thời gian thuê / cửa sổ tính theo đồng hồ hệ thống -> các máy cần đồng bộ giờ (NTP).
+ENV_VAR = "MYCRAWLER_DISTRIBUTED"
+QUEUE_DB = "queue.db"
+DEFAULT_LEASE = 300
+DEFAULT_DOMAIN_RATE = 0.5
+DEFAULT_RATE_WINDOW = 10
+DEFAULT_POLL_INTERVAL = 1.0
+EMPTY_POLL_INTERVAL = 0.5  # giây giữa 2 lần hỏi hàng đợi chung khi vừa thấy rỗng
+
+
+class DistributedError(Exception):
+    pass
+
+
+# --- BACKEND SQLITE (1 MÁY) ---
+
+class SqliteBackend:
+    # Bảng dist_queue vừa là hàng đợi vừa là tập chống trùng: state queued -> leased -> done
+    def __init__(self, path):
+        self.path = path
+        # isolation_level=None: mỗi câu lệnh tự commit, giao dịch nhiều câu mở bằng BEGIN IMMEDIATE
+        self.con = sqlite3.connect(path, timeout=30, isolation_level=None, cached_statements=64)
+        self.con.execute("PRAGMA journal_mode=WAL")
+        self.con.execute("PRAGMA synchronous=NORMAL")
+        self.con.execute("""
+            CREATE TABLE IF NOT EXISTS dist_queue (
+                spider TEXT NOT NULL,
+                key TEXT NOT NULL,
+                priority INTEGER DEFAULT 0,
+                payload BLOB,
+                state TEXT DEFAULT 'queued',
+                lease_until REAL,
+                UNIQUE (spider, key)
+            )
+        """)
+        self.con.execute("CREATE INDEX IF NOT EXISTS idx_dist_queue_next ON dist_queue (spider, state, priority DESC)")
+        self.con.execute("""
+            CREATE TABLE IF NOT EXISTS dist_rate (
+                domain TEXT NOT NULL,
+                slot INTEGER NOT NULL,
+                count INTEGER DEFAULT 0,
+                PRIMARY KEY (domain, slot)
+            ) WITHOUT ROWID
+        """)
+        self.con.execute("CREATE TABLE IF NOT EXISTS dist_round (spider TEXT PRIMARY KEY, claimed_until REAL)")
+
+    def push(self, spider, key, priority, payload):
+        # False nếu key đã có trong lượt này (đang chờ / đang tải / đã xong)
+        cur = self.con.execute("""
+            INSERT OR IGNORE INTO dist_queue (spider, key, priority, payload) VALUES (?, ?, ?, ?)
+        """, (spider, key, priority, payload))
+        return cur.rowcount == 1
+
+    def pop(self, spider, lease):
+        now = time.time()
+        self.con.execute("""
+            UPDATE dist_queue SET state = 'queued', lease_until = NULL
+            WHERE spider = ? AND state = 'leased' AND lease_until < ?
+        """, (spider, now))
+        # 1 câu lệnh: chọn + đánh dấu leased, 2 worker không lấy trùng
+        row = self.con.execute("""
+            UPDATE dist_queue SET state = 'leased', lease_until = ?
+            WHERE rowid = (SELECT rowid FROM dist_queue WHERE spider = ? AND state = 'queued'
+                           ORDER BY priority DESC, rowid LIMIT 1)
+            RETURNING key, payload
+        """, (now + lease, spider)).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def ack(self, spider, key):
+        self.con.execute("UPDATE dist_queue SET state = 'done', payload = NULL WHERE spider = ? AND key = ?",
+                         (spider, key))
+
+    def counts(self, spider):
+        counts = dict(self.con.execute("SELECT state, COUNT(*) FROM dist_queue WHERE spider = ? GROUP BY state",
+                                       (spider,)).fetchall())
+        return {"queued": counts.get("queued", 0), "leased": counts.get("leased", 0),
+                "seen": sum(counts.values())}
+
+    def pending(self, spider):
+        return self.con.execute("""
+            SELECT COUNT(*) FROM dist_queue WHERE spider = ? AND state IN ('queued', 'leased')
+        """, (spider,)).fetchone()[0]
+
+    def claim_round(self, spider, ttl):
+        # Chỉ 1 worker được bắt đầu lượt mới (xóa tập chống trùng) trong ttl giây
+        now = time.time()
+        self.con.execute("BEGIN IMMEDIATE")
+        try:
+            row = self.con.execute("SELECT claimed_until FROM dist_round WHERE spider = ?", (spider,)).fetchone()
+            claimed = row is None or row[0] < now
+            if claimed:
+                self.con.execute("INSERT OR REPLACE INTO dist_round (spider, claimed_until) VALUES (?, ?)",
+                                 (spider, now + ttl))
+            self.con.execute("COMMIT")
+        except BaseException:
+            self.con.execute("ROLLBACK")
+            raise
+        return claimed
+
+    def reset(self, spider, release=False):
+        self.con.execute("DELETE FROM dist_queue WHERE spider = ?", (spider,))
+        if release:
+            self.con.execute("DELETE FROM dist_round WHERE spider = ?", (spider,))
+
+    def acquire(self, domain, budget, window):
+        # Trả về 0 nếu được gửi ngay, hoặc số giây đến cửa sổ kế tiếp
+        now = time.time()
+        slot = int(now // window)
+        count = self.con.execute("""
+            INSERT INTO dist_rate (domain, slot, count) VALUES (?, ?, 1)
+            ON CONFLICT(domain, slot) DO UPDATE SET count = count + 1
+            RETURNING count
+        """, (domain, slot)).fetchone()[0]
+        if count == 1:
+            self.con.execute("DELETE FROM dist_rate WHERE domain = ? AND slot < ?", (domain, slot))
+        return 0 if count <= budget else (slot + 1) * window - now
+
+    def close(self):
+        self.con.close()
+
+
+# --- BACKEND REDIS (NHIỀU MÁY) ---
+
+class RespClient:
+    # Client RESP2 tối giản (1 kết nối, gọi tuần tự trong thread của reactor)
+    def __init__(self, host, port=6379, db=0, password=None, timeout=10):
+        self.address = (host, port)
+        self.db = db
+        self.password = password
+        self.timeout = timeout
+        self.sock = None
+        self.reader = None
+
+    def connect(self):
+        self.sock = socket.create_connection(self.address, timeout=self.timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.reader = self.sock.makefile("rb")
+        if self.password:
+            self.call("AUTH", self.password)
+        if self.db:
+            self.call("SELECT", self.db)
+
+    def close(self):
+        if self.sock is not None:
+            self.reader.close()
+            self.sock.close()
+            self.sock = self.reader = None
+
+    def execute(self, *args):
+        return self.send([args])[0]
+
+    def transaction(self, *commands):
+        # MULTI ... EXEC gửi 1 lần: các lệnh chạy liền một mạch, client khác không thấy trạng thái ở giữa.
+        # None nếu key đang WATCH bị client khác ghi (không lệnh nào chạy)
+        return self.send([("MULTI",), *commands, ("EXEC",)])[-1]
+
+    def send(self, commands):
+        # Mất kết nối khi gửi (server đóng kết nối nhàn rỗi) -> nối lại 1 lần; lỗi khi đọc thì báo lên
+        # (lệnh có thể đã chạy, gửi lại INCR / ZREM là sai)
+        for attempt in (0, 1):
+            if self.sock is None:
+                self.connect()
+            try:
+                self.sock.sendall(b"".join(self.encode(args) for args in commands))
+                break
+            except OSError:
+                self.close()
+                if attempt:
+                    raise
+        try:
+            return [self.read_reply() for _ in commands]
+        except (OSError, DistributedError):
+            self.close()
+            raise
+
+    def call(self, *args):
+        # Dùng khi đang connect() (không nối lại)
+        self.sock.sendall(self.encode(args))
+        return self.read_reply()
+
+    @staticmethod
+    def encode(args):
+        parts = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            if isinstance(arg, str):
+                arg = arg.encode("utf-8")
+            elif not isinstance(arg, bytes):
+                arg = repr(arg).encode("ascii") if isinstance(arg, float) else str(arg).encode("ascii")
+            parts.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+        return b"".join(parts)
+
+    def read_reply(self):
+        line = self.reader.readline()
+        if not line.endswith(b"\r\n"):
+            raise ConnectionError("Redis đóng kết nối")
+        kind, body = line[:1], line[1:-2]
+        if kind == b"+":
+            return body.decode("utf-8")
+        if kind == b"-":
+            raise DistributedError(body.decode("utf-8", "replace"))
+        if kind == b":":
+            return int(body)
+        if kind == b"$":
+            size = int(body)
+            if size < 0:
+                return None
+            data = self.reader.read(size + 2)
+            return data[:-2]
+        if kind == b"*":
+            size = int(body)
+            return None if size < 0 else [self.read_reply() for _ in range(size)]
+        raise DistributedError(f"Không hiểu reply Redis: {line!r}")
+
+
+class RedisBackend:
+    # Mỗi spider: <prefix>:<spider>:seen (SET chống trùng), :queue (ZSET điểm = -priority),
+    # :payload (HASH key -> request), :leases (ZSET điểm = hạn thuê), :scores (HASH điểm của request đang thuê)
+    # Chuyển request giữa :queue và :leases luôn trong 1 MULTI/EXEC: request lúc nào cũng nằm ở 1 trong 2,
+    # worker khác không thấy pending() = 0 rồi reset() giữa chừng, worker chết giữa chừng không làm mất request
+    def __init__(self, client, prefix="mycrawler"):
+        self.client = client
+        self.prefix = prefix
+
+    def keys(self, spider):
+        base = f"{self.prefix}:{spider}"
+        return f"{base}:seen", f"{base}:queue", f"{base}:payload", f"{base}:leases", f"{base}:scores"
+
+    def push(self, spider, key, priority, payload):
+        seen, queue, payloads, _, _ = self.keys(spider)
+        if not self.client.execute("SADD", seen, key):
+            return False
+        # Payload trước, rồi mới vào hàng đợi -> worker pop luôn thấy payload
+        self.client.execute("HSET", payloads, key, payload)
+        self.client.execute("ZADD", queue, -priority, key)
+        return True
+
+    def pop(self, spider, lease):
+        _, queue, payloads, leases, scores = self.keys(spider)
+        now = time.time()
+        for key in self.client.execute("ZRANGEBYSCORE", leases, "-inf", now, "LIMIT", 0, 100):
+            # Hết hạn thuê -> trả về hàng đợi với priority cũ. WATCH: worker khác đã trả về (và có thể đã
+            # thuê lại) trước đó thì EXEC không chạy -> không xóa nhầm lease mới
+            self.client.execute("WATCH", leases)
+            until = self.client.execute("ZSCORE", leases, key)
+            if until is None or float(until) >= now:
+                self.client.execute("UNWATCH")
+                continue
+            score = self.client.execute("HGET", scores, key)
+            self.client.transaction(("ZREM", leases, key), ("ZADD", queue, score or 0, key))
+        candidates = self.client.execute("ZRANGEBYSCORE", queue, "-inf", "+inf", "WITHSCORES", "LIMIT", 0, 10)
+        for key, score in zip(candidates[0::2], candidates[1::2]):
+            # ZREM trả 1 cho đúng 1 worker -> worker đó giữ request; các worker khác thử request kế tiếp
+            removed, added, _, payload = self.client.transaction(
+                ("ZREM", queue, key), ("ZADD", leases, "NX", now + lease, key),
+                ("HSET", scores, key, score), ("HGET", payloads, key))
+            if not removed:
+                if added:
+                    # Request vừa được worker khác tải xong (ack) -> bỏ lease thừa vừa tạo
+                    self.ack(spider, key)
+                continue
+            if payload is None:
+                self.ack(spider, key)
+                return None
+            return key.decode("utf-8"), payload
+        return None
+
+    def ack(self, spider, key):
+        _, _, payloads, leases, scores = self.keys(spider)
+        self.client.transaction(("ZREM", leases, key), ("HDEL", scores, key), ("HDEL", payloads, key))
+
+    def counts(self, spider):
+        seen, queue, _, leases, _ = self.keys(spider)
+        queued, leased, count = self.client.transaction(("ZCARD", queue), ("ZCARD", leases), ("SCARD", seen))
+        return {"queued": queued, "leased": leased, "seen": count}
+
+    def pending(self, spider):
+        _, queue, _, leases, _ = self.keys(spider)
+        return sum(self.client.transaction(("ZCARD", queue), ("ZCARD", leases)))
+
+    def claim_round(self, spider, ttl):
+        return self.client.execute("SET", f"{self.prefix}:{spider}:round", os.getpid(), "NX", "EX", int(ttl)) == "OK"
+
+    def reset(self, spider, release=False):
+        keys = list(self.keys(spider))
+        if release:
+            keys.append(f"{self.prefix}:{spider}:round")
+        self.client.execute("DEL", *keys)
+
+    def acquire(self, domain, budget, window):
+        now = time.time()
+        slot = int(now // window)
+        key = f"{self.prefix}:rate:{domain}:{slot}"
+        count = self.client.execute("INCR", key)
+        if count == 1:
+            self.client.execute("EXPIRE", key, int(window) * 2 + 1)
+        return 0 if count <= budget else (slot + 1) * window - now
+
+    def close(self):
+        self.client.close()
+
+
+def backend_url(settings=None):
+    return (settings.get("DISTRIBUTED") if settings else None) or os.environ.get(ENV_VAR, "")
+
+
+def open_backend(url, settings=None):
+    value = (url or "").strip()
+    if value.lower() in ("1", "true", "on", "sqlite"):
+        return SqliteBackend(os.path.join(storage.db_dir(settings), QUEUE_DB))
+    parts = urlsplit(value)
+    if parts.scheme == "sqlite":
+        # sqlite:///queue.db = đường dẫn tương đối, sqlite:////var/lib/queue.db = tuyệt đối
+        return SqliteBackend(unquote(parts.path[1:]) or os.path.join(storage.db_dir(settings), QUEUE_DB))
+    if parts.scheme == "redis":
+        db = int(parts.path.strip("/") or 0)
+        client = RespClient(parts.hostname or "localhost", parts.port or 6379, db,
+                            unquote(parts.password) if parts.password else None)
+        return RedisBackend(client, (settings.get("DISTRIBUTED_PREFIX") if settings else None) or "mycrawler")
+    raise ValueError(f"Không hỗ trợ DISTRIBUTED='{url}' (sqlite / sqlite:///file.db / redis://host:port/db)")
+
+
+# Scheduler + middleware trong cùng process dùng chung 1 backend (1 kết nối)
+_BACKENDS = {}
+
+def get_backend(url, settings=None):
+    backend = _BACKENDS.get(url)
+    if backend is None:
+        backend = _BACKENDS[url] = open_backend(url, settings)
+    return backend
+
+
+# --- SCRAPY ---
+
+class DistributedScheduler:
+    # Đặt sẵn trong SCHEDULER; DISTRIBUTED rỗng -> trả về scheduler mặc định của Scrapy (không đổi gì)
+    def __init__(self, crawler, backend, lease, poll_interval=DEFAULT_POLL_INTERVAL):
+        self.crawler = crawler
+        self.stats = crawler.stats
+        self.backend = backend
+        self.lease = lease
+        self.poll_interval = poll_interval
+        self.poller = None
+        self.fingerprinter = crawler.request_fingerprinter
+        self.local = deque()   # request không tuần tự hóa được: chỉ worker này tải
+        self.leaving = {}      # key -> request đã rời downloader, chờ callback xong mới ack
+        self.empty_at = 0.0
+        self.spider = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        from scrapy import signals
+        from scrapy.core.scheduler import Scheduler
+
+        url = backend_url(crawler.settings)
+        if not url:
+            return Scheduler.from_crawler(crawler)
+        scheduler = cls(crawler, get_backend(url, crawler.settings),
+                        crawler.settings.getfloat("DISTRIBUTED_LEASE", DEFAULT_LEASE),
+                        crawler.settings.getfloat("DISTRIBUTED_POLL_INTERVAL", DEFAULT_POLL_INTERVAL))
+        crawler.signals.connect(scheduler.request_left_downloader, signal=signals.request_left_downloader)
+        return scheduler
+
+    def open(self, spider):
+        from twisted.internet import task
+
+        self.spider = spider
+        name = spider.name
+        if self.backend.pending(name) == 0 and self.backend.claim_round(name, self.lease):
+            # Hàng đợi chung rỗng: lượt trước đã xong -> bắt đầu lượt mới
+            self.backend.reset(name)
+            print(f"--> [DISTRIBUTED] {name}: bắt đầu lượt mới trên hàng đợi chung.")
+        else:
+            counts = self.backend.counts(name)
+            print(f"--> [DISTRIBUTED] {name}: tham gia lượt đang chạy "
+                  f"({counts['queued']} chờ, {counts['leased']} đang tải, {counts['seen']} đã gặp).")
+        self.poller = task.LoopingCall(self.poll)
+        self.poller.start(self.poll_interval, now=False)
+        return None
+
+    def poll(self):
+        # Engine chỉ hỏi lại scheduler sau mỗi response hoặc mỗi 5 giây (heartbeat): worker đang rảnh
+        # được đánh thức sớm hơn để nhận request do worker khác vừa xếp hàng
+        slot = getattr(self.crawler.engine, "_slot", None)
+        if slot is not None:
+            slot.nextcall.schedule()
+
+    def close(self, reason):
+        # Request đã lấy mà chưa tải / chưa xử lý xong (bị hủy khi đóng) tự quay lại hàng đợi khi hết hạn thuê
+        if self.poller is not None and self.poller.running:
+            self.poller.stop()
+        self.ack_finished()
+        if not self.local and self.backend.pending(self.spider.name) == 0:
+            # Lượt đã xong ở mọi worker: xóa tập chống trùng để lượt sau tải lại trang danh sách / RSS
+            self.backend.reset(self.spider.name, release=True)
+        return None
+
+    def request_key(self, request):
+        # None -> không chống trùng (key riêng cho mỗi lần xếp hàng)
+        meta = request.meta
+        if request.dont_filter and not (meta.get("is_start_request") and not meta.get("retry_times")):
+            return None
+        # HustEdu: url đã chuẩn hóa; đích redirect mang theo frontier_key của url gốc -> dùng fingerprint
+        if meta.get("frontier_key") and not meta.get("redirect_times"):
+            return meta["frontier_key"]
+        return self.fingerprinter.fingerprint(request).hex()
+
+    def enqueue_request(self, request):
+        key = self.request_key(request)
+        if key is None:
+            key = f"{self.fingerprinter.fingerprint(request).hex()}:{uuid.uuid4().hex}"
+        request.meta["dist_key"] = key
+        try:
+            payload = pickle.dumps(request.to_dict(spider=self.spider), protocol=4)
+        except (ValueError, TypeError, AttributeError, pickle.PicklingError) as e:
+            print(f"⚠️ [DISTRIBUTED] Không tuần tự hóa được {request.url} ({e}), tải tại worker này")
+            request.meta.pop("dist_key", None)
+            self.local.append(request)
+            self.stats.inc_value("scheduler/unserializable", spider=self.spider)
+            self.stats.inc_value("scheduler/enqueued", spider=self.spider)
+            return True
+        if not self.backend.push(self.spider.name, key, request.priority, payload):
+            self.stats.inc_value("metrics/distributed/duplicate", spider=self.spider)
+            return False
+        self.empty_at = 0.0
+        self.stats.inc_value("scheduler/enqueued/distributed", spider=self.spider)
+        self.stats.inc_value("scheduler/enqueued", spider=self.spider)
+        return True
+
+    def next_request(self):
+        from scrapy.utils.request import request_from_dict
+
+        self.ack_finished()
+        if self.local:
+            self.stats.inc_value("scheduler/dequeued", spider=self.spider)
+            return self.local.popleft()
+        if time.monotonic() - self.empty_at < EMPTY_POLL_INTERVAL:
+            return None
+        popped = self.backend.pop(self.spider.name, self.lease)
+        if popped is None:
+            self.empty_at = time.monotonic()
+            return None
+        key, payload = popped
+        request = request_from_dict(pickle.loads(payload), spider=self.spider)
+        request.meta["dist_key"] = key
+        self.stats.inc_value("scheduler/dequeued/distributed", spider=self.spider)
+        self.stats.inc_value("scheduler/dequeued", spider=self.spider)
+        return request
+
+    def request_left_downloader(self, request, spider):
+        key = request.meta.get("dist_key")
+        if key:
+            self.leaving[key] = request
+
+    def ack_finished(self):
+        # Ack khi request không còn trong downloader (middleware xử lý response xong) lẫn scraper (callback xong);
+        # ack sớm hơn thì worker khác thấy hàng đợi rỗng và đóng trước khi request con kịp vào hàng
+        if not self.leaving:
+            return
+        engine = self.crawler.engine
+        scraper_slot = engine.scraper.slot
+        busy = engine.downloader.active | scraper_slot.active | {request for _, request, _ in scraper_slot.queue}
+        for key, request in list(self.leaving.items()):
+            if request not in busy:
+                self.backend.ack(self.spider.name, key)
+                del self.leaving[key]
+
+    def has_pending_requests(self):
+        # Còn request đang được worker khác tải / xử lý -> chưa đóng (con của nó có thể vào hàng đợi)
+        self.ack_finished()
+        return bool(self.local) or self.backend.pending(self.spider.name) > 0
+
+    def __len__(self):
+        return len(self.local) + self.backend.pending(self.spider.name)
+
+
+class GlobalRateLimitMiddleware:
+    # Downloader middleware: mỗi request lấy 1 suất trong ngân sách chung của domain, hết suất thì chờ cửa sổ sau
+    def __init__(self, crawler, backend, rate, window):
+        self.crawler = crawler
+        self.stats = crawler.stats
+        self.backend = backend
+        self.window = window
+        self.budget = max(1, int(rate * window))
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        from scrapy.exceptions import NotConfigured
+
+        settings = crawler.settings
+        url = backend_url(settings)
+        rate = settings.getfloat("DISTRIBUTED_DOMAIN_RATE", DEFAULT_DOMAIN_RATE)
+        if not url or rate <= 0:
+            raise NotConfigured
+        return cls(crawler, get_backend(url, settings), rate,
+                   settings.getfloat("DISTRIBUTED_RATE_WINDOW", DEFAULT_RATE_WINDOW))
+
+    async def process_request(self, request, spider):
+        from twisted.internet import reactor
+        from twisted.internet.task import deferLater
+        from scrapy.utils.defer import maybe_deferred_to_future
+        from scrapy.utils.httpobj import urlparse_cached
+
+        domain = urlparse_cached(request).hostname or ""
+        waited = 0.0
+        while True:
+            wait = self.backend.acquire(domain, self.budget, self.window)
+            if not wait:
+                break
+            waited += wait
+            await maybe_deferred_to_future(deferLater(reactor, wait, lambda: None))
+        if waited and self.stats is not None:
+            self.stats.inc_value("metrics/distributed/rate_waits")
+            self.stats.inc_value("metrics/distributed/rate_wait_seconds", waited)
+        return None
+
+
+# --- CHẠY NHIỀU WORKER / XEM HÀNG ĐỢI ---
+
+def run_workers(spider, workers, url, extra_args=()):
+    # N process "scrapy crawl <spider>" trong thư mục project, cùng 1 hàng đợi chung
+    import subprocess
+    import sys
+
+    project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, **{ENV_VAR: url})
+    command = [sys.executable, "-m", "scrapy", "crawl", spider, *extra_args]
+    print(f"➤ Chạy {workers} worker '{spider}' trên {url}")
+    procs = [subprocess.Popen(command, cwd=project_dir, env=env) for _ in range(workers)]
+    codes = [proc.wait() for proc in procs]
+    print(f"✅ {workers} worker '{spider}' đã xong (exit code: {', '.join(map(str, codes))})")
+    return max(codes)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Hàng đợi crawl chung cho nhiều worker")
+    parser.add_argument("--backend", default=os.environ.get(ENV_VAR) or "sqlite",
+                        help="sqlite / sqlite:///file.db / redis://host:port/db (mặc định MYCRAWLER_DISTRIBUTED hoặc sqlite)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    run = sub.add_parser("run", help="Chạy N worker trên máy này")
+    run.add_argument("spider")
+    run.add_argument("--workers", type=int, default=2)
+    status = sub.add_parser("status", help="Số request đang chờ / đang tải / đã gặp")
+    status.add_argument("spiders", nargs="*", default=["careerlink", "hustedu"])
+    reset = sub.add_parser("reset", help="Xóa hàng đợi + tập chống trùng (khi không còn worker nào chạy)")
+    reset.add_argument("spiders", nargs="+")
+    args, extra = parser.parse_known_args()
+
+    try:
+        if args.command == "run":
+            raise SystemExit(run_workers(args.spider, args.workers, args.backend, extra))
+        backend = open_backend(args.backend)
+        for name in (args.spiders if args.command == "status" else []):
+            counts = backend.counts(name)
+            print(f"  {name:<12} chờ={counts['queued']} đang tải={counts['leased']} đã gặp={counts['seen']}")
+        if args.command == "reset":
+            for name in args.spiders:
+                backend.reset(name, release=True)
+            print(f"✅ Đã xóa hàng đợi chung của {', '.join(args.spiders)}")
+        backend.close()
+    except (ValueError, OSError, DistributedError) as e:
+        parser.error(str(e))
@@ -0,0 +1,111 @@
+from functools import lru_cache
+from urllib.parse import urlsplit
+
+from lxml import etree
+from parsel.csstranslator import HTMLTranslator
+from scrapy.http import HtmlResponse
+
+# --- TRÍCH XUẤT NHANH BẰNG XPATH ĐÃ BIÊN DỊCH (dùng trong callback của spider) ---
+# response.css(...) / response.xpath(...) mỗi lần gọi: dịch CSS -> XPath, lxml biên dịch lại biểu thức,
+# rồi bọc từng kết quả thành Selector. Khi tăng concurrency, CPU parse là nút thắt.
+#   - Document: parse response 1 lần thẳng từ bytes (response.selector giải mã body thành str
+#     rồi encode lại trước khi đưa cho lxml -> chậm gần gấp đôi trên trang lớn)
+#   - compiled(): CSS / XPath -> etree.XPath, biên dịch 1 lần cho cả process
+#   - SelectorMemory: nhớ selector dự phòng nào đã thành công cho từng site + dạng url,
+#     lần sau thử selector đó trước (HustEdu có 4 cách lấy title, 4 cách lấy tóm tắt, ...).
+#     Chiến lược generic() (<title>, meta description: khớp gần như mọi trang) không bao giờ được nhớ và
+#     vẫn được thử theo đúng thứ tự ưu tiên -> kết quả không phụ thuộc trang nào được parse trước
+_translator = HTMLTranslator()
+
+
+@lru_cache(maxsize=32)
+def _html_parser(encoding):
+    return etree.HTMLParser(recover=True, encoding=encoding)
+
+
+def parse_root(response):
+    if isinstance(response, HtmlResponse) and response.body:
+        try:
+            root = etree.fromstring(response.body, parser=_html_parser(response.encoding), base_url=response.url)
+        except (LookupError, ValueError, etree.LxmlError):
+            root = None
+        if root is not None:
+            return root
+    # XML (RSS), body rỗng, encoding lạ: để parsel xử lý như response.xpath(...)
+    return response.selector.root
+
+
+@lru_cache(maxsize=1024)
+def compiled(query):
+    # "//..." hoặc "(...)" là XPath, còn lại là CSS (hỗ trợ ::text, ::attr(x) như Scrapy)
+    if not query.startswith(("/", "(")):
+        query = _translator.css_to_xpath(query)
+    return etree.XPath(query, smart_strings=False)
+
+
+def _to_text(value):
+    if isinstance(value, str):
+        return value
+    return etree.tostring(value, encoding="unicode", method="html", with_tail=False)
+
+
+def url_pattern(url):
+    # Dạng url để nhớ selector: host + đoạn path đầu + độ sâu
+    # vd https://hust.edu.vn/vi/news/tuyen-sinh/bai-123.html -> "hust.edu.vn/vi/4"
+    parts = urlsplit(url)
+    segments = [s for s in parts.path.split("/") if s]
+    return f"{parts.netloc}/{segments[0] if segments else ''}/{len(segments)}"
+
+
+class Document:
+    def __init__(self, response):
+        self.url = response.url
+        self.root = parse_root(response)
+        self.pattern = url_pattern(response.url)
+
+    def getall(self, query):
+        return [_to_text(v) for v in compiled(query)(self.root)]
+
+    def get(self, query, default=""):
+        result = compiled(query)(self.root)
+        return _to_text(result[0]) if result else default
+
+    def text(self, query):
+        # Nối mọi text node và gom khoảng trắng (như " ".join(...getall()).strip() rồi split)
+        return " ".join(" ".join(self.getall(query)).split())
+
+
+def generic(strategy):
+    # Đánh dấu chiến lược chung (không theo template của trang)
+    strategy.generic = True
+    return strategy
+
+
+def _is_generic(strategy):
+    return getattr(strategy, "generic", False)
+
+
+class SelectorMemory:
+    def __init__(self, stats=None):
+        self.stats = stats
+        self.winners = {}  # (field, url pattern) -> vị trí chiến lược thành công gần nhất
+
+    def first(self, doc, field, strategies, default=""):
+        # strategies: list hàm doc -> giá trị ("" / None / [] = không lấy được)
+        key = (field, doc.pattern)
+        start = self.winners.get(key, 0)
+        # Chỉ bỏ qua được selector theo template; chiến lược chung đứng trước vẫn thử trước chiến lược đã nhớ
+        ahead = [i for i in range(start) if _is_generic(strategies[i])]
+        order = ahead + [start] + [i for i in range(len(strategies)) if i != start and i not in ahead]
+        for i in order:
+            value = strategies[i](doc)
+            if value:
+                if i != start and i not in ahead:
+                    if _is_generic(strategies[i]):
+                        self.winners.pop(key, None)  # trang sau thử lại đủ thứ tự
+                    else:
+                        self.winners[key] = i
+                    if self.stats is not None:
+                        self.stats.inc_value(f"metrics/extract/fallback/{field}")
+                return value
+        return default
@@ -0,0 +1,143 @@
+import time
+from datetime import datetime
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from w3lib.url import canonicalize_url
+
+# --- FRONTIER LƯU TRÊN ĐĨA + CHUẨN HÓA URL (HustEdu) ---
+# Cùng 1 bài đi qua RSS, trang chuyên mục, link trong bài với nhiều dạng url khác nhau
+# (http/https, www., "/" cuối, #anchor, ?utm_source=...) -> trước đây mỗi dạng bị tải 1 lần.
+#   - canonicalize(): key duy nhất cho mọi dạng của 1 url; request vẫn gửi url gốc
+#   - bảng frontier (storage.py, cùng DB với bảng dữ liệu): key -> trạng thái queued / done / failed
+#     url đã gặp (kể cả đang chờ) không bao giờ được xếp hàng lại, giữ qua các lượt crawl
+#   - url còn queued / failed khi lượt trước bị ngắt / lỗi được nạp lại lúc mở spider; mỗi lần nạp lại
+#     tăng attempts, quá max_attempts thì chuyển "dropped" (url bị offsite / dupefilter chặn không treo mãi)
+#   - ghi theo lô như pipeline (batch_size thao tác hoặc flush_interval giây), mọi key nằm sẵn trong RAM
+#   - trang danh sách / phân trang (state "list"): không nằm trong known mà trong lists -> spider tải lại
+#     mỗi lượt (chỉ chống trùng trong lượt), bài mới chỉ xuất hiện ở đó mới được phát hiện
+# Trang đã tải được kiểm tra lại qua recheck.py (dont_filter, không đi qua frontier).
+TRACKING_PARAMS = {"fbclid", "gclid", "dclid", "msclkid", "zarsrc", "_ga", "mc_cid", "mc_eid", "igshid", "ref_src", "spm"}
+TRACKING_PREFIXES = ("utm_",)
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def canonicalize(url):
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    if scheme == "http":
+        scheme = "https"  # site phục vụ cả 2, coi là 1
+    host = (parts.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    if parts.port and parts.port != DEFAULT_PORTS.get(parts.scheme.lower()):
+        host = f"{host}:{parts.port}"
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+             if k.lower() not in TRACKING_PARAMS and not k.lower().startswith(TRACKING_PREFIXES)]
+    path = parts.path or "/"
+    while "//" in path:
+        path = path.replace("//", "/")
+    if len(path) > 1:
+        path = path.rstrip("/")
+    # w3lib: chuẩn hóa percent-encoding, sắp xếp tham số, bỏ fragment
+    return canonicalize_url(urlunsplit((scheme, host, path, urlencode(query), "")))
+
+
+class Frontier:
+    def __init__(self, con, spider_name, max_attempts=3, batch_size=100, flush_interval=5.0, stats=None):
+        self.con = con
+        self.spider_name = spider_name
+        self.max_attempts = max_attempts
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.stats = stats
+        self.known = set()
+        self.lists = set()        # key của trang danh sách
+        self.pending_add = []
+        self.pending_state = {}   # key -> "done" | "failed"
+        self.last_flush = time.monotonic()
+
+    def load(self):
+        # Nạp mọi key đã gặp; trả về [(key, url, callback, priority, depth)] cần chạy tiếp
+        cur = self.con.execute("SELECT key, state = 'list' FROM frontier WHERE spider = ?", (self.spider_name,))
+        while True:
+            rows = cur.fetchmany(5000)
+            if not rows:
+                break
+            for key, listing in rows:
+                (self.lists if listing else self.known).add(key)
+        with self.con:
+            self.con.execute("""
+                UPDATE frontier SET state = 'dropped', updated_at = ?
+                WHERE spider = ? AND state IN ('queued', 'failed') AND attempts >= ?
+            """, (datetime.now(), self.spider_name, self.max_attempts))
+            resume = self.con.execute("""
+                SELECT key, url, callback, priority, depth FROM frontier
+                WHERE spider = ? AND state IN ('queued', 'failed')
+                ORDER BY priority DESC, added_at
+            """, (self.spider_name,)).fetchall()
+            self.con.execute("""
+                UPDATE frontier SET attempts = attempts + 1, state = 'queued', updated_at = ?
+                WHERE spider = ? AND state IN ('queued', 'failed')
+            """, (datetime.now(), self.spider_name))
+        self.count("resumed", len(resume))
+        return resume
+
+    def add(self, url, callback, priority=0, depth=0):
+        # Trả về key nếu url (mọi dạng của nó) chưa từng gặp, None nếu đã có
+        key = canonicalize(url)
+        if key in self.known:
+            self.count("skipped")
+            return None
+        self.known.add(key)
+        self.pending_add.append((self.spider_name, key, url, callback, priority, depth, datetime.now()))
+        self.count("queued")
+        self.maybe_flush()
+        return key
+
+    def mark(self, key, state, url=None):
+        # state: "done" | "failed" | "list"; url: để ghi được cả key do process khác thêm mà chưa flush (distributed.py)
+        if state == "list":
+            self.lists.add(key)
+        self.pending_state[key] = (state, url)
+        self.count(state)
+        self.maybe_flush()
+
+    def seen(self, url):
+        # Url đích sau redirect: đánh dấu luôn để dạng này cũng không bị tải lại
+        key = canonicalize(url)
+        if key not in self.known:
+            self.known.add(key)
+            self.pending_add.append((self.spider_name, key, url, None, 0, 0, datetime.now()))
+            self.pending_state[key] = ("done", url)
+
+    def maybe_flush(self):
+        if (len(self.pending_add) + len(self.pending_state) >= self.batch_size
+                or time.monotonic() - self.last_flush >= self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        self.last_flush = time.monotonic()
+        if not self.pending_add and not self.pending_state:
+            return
+        now = datetime.now()
+        with self.con:
+            if self.pending_add:
+                self.con.executemany("""
+                    INSERT OR IGNORE INTO frontier (spider, key, url, callback, priority, depth, added_at, state, attempts)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, 'queued', 0)
+                """, self.pending_add)
+            if self.pending_state:
+                # Upsert: ở chế độ phân tán, key có thể do worker khác thêm và chưa flush; INSERT OR IGNORE
+                # đến sau của worker đó không ghi đè trạng thái đã xong
+                self.con.executemany("""
+                    INSERT INTO frontier (spider, key, url, state, attempts, added_at, updated_at)
+                    VALUES (?, ?, ?, ?, 0, ?, ?)
+                    ON CONFLICT(spider, key) DO UPDATE SET state = excluded.state, updated_at = excluded.updated_at
+                """, [(self.spider_name, key, url, state, now, now)
+                      for key, (state, url) in self.pending_state.items()])
+        self.pending_add = []
+        self.pending_state = {}
+
+    def count(self, kind, n=1):
+        if self.stats is not None and n:
+            self.stats.inc_value(f"metrics/frontier/{kind}", n)
@@ -0,0 +1,288 @@
+import re
+import sqlite3
+from functools import lru_cache
+
+from mycrawler.textfold import words
+
+# --- CHUẨN HÓA ĐỊA ĐIỂM: TỈNH / QUẬN HUYỆN -> MÃ (mã đơn vị hành chính của Tổng cục Thống kê) ---
+# "46 An Dương - Phường Yên Phụ - Quận Tây Hồ - Thành phố Hà Nội" -> province_code 01, district_code 003
+# "TP.HCM", "Sài Gòn", "Hồ Chí Minh" -> 79 ; "Q.1", "Quận 1" (TP.HCM) -> 760
+#   - văn bản được bỏ dấu + tách âm tiết, dò trên trie theo token (khớp dài nhất, trái sang phải)
+#   - bỏ qua tên đứng sau "phường / xã / đường / phố" (tên phường, tên đường trùng tên quận / tỉnh)
+#   - ưu tiên tên quận đứng sau "quận / huyện / thị xã / thành phố"
+#   - kết quả được cache (LRU) theo chuỗi gốc: phần lớn giá trị lặp lại rất nhiều lần
+# Quận / huyện hiện có cho các tỉnh tuyển dụng nhiều nhất (HN, HCM, ĐN, HP, CT, BD, ĐN);
+# tỉnh khác chỉ có mã tỉnh.
+
+PROVINCES = {
+    "01": ("Hà Nội", ["hn", "hanoi"]),
+    "02": ("Hà Giang", []),
+    "04": ("Cao Bằng", []),
+    "06": ("Bắc Kạn", ["bac can"]),
+    "08": ("Tuyên Quang", []),
+    "10": ("Lào Cai", []),
+    "11": ("Điện Biên", []),
+    "12": ("Lai Châu", []),
+    "14": ("Sơn La", []),
+    "15": ("Yên Bái", []),
+    "17": ("Hòa Bình", []),
+    "19": ("Thái Nguyên", []),
+    "20": ("Lạng Sơn", []),
+    "22": ("Quảng Ninh", []),
+    "24": ("Bắc Giang", []),
+    "25": ("Phú Thọ", []),
+    "26": ("Vĩnh Phúc", []),
+    "27": ("Bắc Ninh", []),
+    "30": ("Hải Dương", []),
+    "31": ("Hải Phòng", []),
+    "33": ("Hưng Yên", []),
+    "34": ("Thái Bình", []),
+    "35": ("Hà Nam", []),
+    "36": ("Nam Định", []),
+    "37": ("Ninh Bình", []),
+    "38": ("Thanh Hóa", []),
+    "40": ("Nghệ An", []),
+    "42": ("Hà Tĩnh", []),
+    "44": ("Quảng Bình", []),
+    "45": ("Quảng Trị", []),
+    "46": ("Thừa Thiên Huế", ["hue", "tt hue"]),
+    "48": ("Đà Nẵng", ["danang"]),
+    "49": ("Quảng Nam", []),
+    "51": ("Quảng Ngãi", []),
+    "52": ("Bình Định", []),
+    "54": ("Phú Yên", []),
+    "56": ("Khánh Hòa", ["nha trang"]),
+    "58": ("Ninh Thuận", []),
+    "60": ("Bình Thuận", []),
+    "62": ("Kon Tum", []),
+    "64": ("Gia Lai", []),
+    "66": ("Đắk Lắk", ["dac lac", "dak lac", "daklak"]),
+    "67": ("Đắk Nông", ["dac nong"]),
+    "68": ("Lâm Đồng", []),
+    "70": ("Bình Phước", []),
+    "72": ("Tây Ninh", []),
+    "74": ("Bình Dương", []),
+    "75": ("Đồng Nai", []),
+    "77": ("Bà Rịa - Vũng Tàu", ["ba ria", "vung tau", "brvt"]),
+    "79": ("Hồ Chí Minh", ["hcm", "tphcm", "tp hcm", "hcmc", "sai gon", "saigon"]),
+    "80": ("Long An", []),
+    "82": ("Tiền Giang", []),
+    "83": ("Bến Tre", []),
+    "84": ("Trà Vinh", []),
+    "86": ("Vĩnh Long", []),
+    "87": ("Đồng Tháp", []),
+    "89": ("An Giang", []),
+    "91": ("Kiên Giang", []),
+    "92": ("Cần Thơ", []),
+    "93": ("Hậu Giang", []),
+    "94": ("Sóc Trăng", []),
+    "95": ("Bạc Liêu", []),
+    "96": ("Cà Mau", []),
+}
+
+# province_code -> {district_code: (tên, [alias])}
+DISTRICTS = {
+    "01": {
+        "001": ("Ba Đình", []), "002": ("Hoàn Kiếm", []), "003": ("Tây Hồ", []), "004": ("Long Biên", []),
+        "005": ("Cầu Giấy", []), "006": ("Đống Đa", []), "007": ("Hai Bà Trưng", []), "008": ("Hoàng Mai", []),
+        "009": ("Thanh Xuân", []), "016": ("Sóc Sơn", []), "017": ("Đông Anh", []), "018": ("Gia Lâm", []),
+        "019": ("Nam Từ Liêm", []), "020": ("Thanh Trì", []), "021": ("Bắc Từ Liêm", []), "250": ("Mê Linh", []),
+        "268": ("Hà Đông", []), "269": ("Sơn Tây", []), "271": ("Ba Vì", []), "272": ("Phúc Thọ", []),
+        "273": ("Đan Phượng", []), "274": ("Hoài Đức", []), "275": ("Quốc Oai", []), "276": ("Thạch Thất", []),
+        "277": ("Chương Mỹ", []), "278": ("Thanh Oai", []), "279": ("Thường Tín", []), "280": ("Phú Xuyên", []),
+        "281": ("Ứng Hòa", []), "282": ("Mỹ Đức", []),
+    },
+    "79": {
+        "760": ("Quận 1", []), "761": ("Quận 12", []), "764": ("Gò Vấp", []), "765": ("Bình Thạnh", []),
+        "766": ("Tân Bình", []), "767": ("Tân Phú", []), "768": ("Phú Nhuận", []),
+        "769": ("Thủ Đức", ["quan 2", "q 2", "q2", "quan 9", "q 9", "q9"]),  # Quận 2, 9 đã nhập vào TP Thủ Đức
+        "770": ("Quận 3", []), "771": ("Quận 10", []), "772": ("Quận 11", []), "773": ("Quận 4", []),
+        "774": ("Quận 5", []), "775": ("Quận 6", []), "776": ("Quận 8", []), "777": ("Bình Tân", []),
+        "778": ("Quận 7", []), "783": ("Củ Chi", []), "784": ("Hóc Môn", []), "785": ("Bình Chánh", []),
+        "786": ("Nhà Bè", []), "787": ("Cần Giờ", []),
+    },
+    "48": {
+        "490": ("Liên Chiểu", []), "491": ("Thanh Khê", []), "492": ("Hải Châu", []), "493": ("Sơn Trà", []),
+        "494": ("Ngũ Hành Sơn", []), "495": ("Cẩm Lệ", []), "497": ("Hòa Vang", []),
+    },
+    "31": {
+        "303": ("Hồng Bàng", []), "304": ("Ngô Quyền", []), "305": ("Lê Chân", []), "306": ("Hải An", []),
+        "307": ("Kiến An", []), "308": ("Đồ Sơn", []), "309": ("Dương Kinh", []), "311": ("Thủy Nguyên", []),
+        "312": ("An Dương", []), "313": ("An Lão", []), "314": ("Kiến Thụy", []), "315": ("Tiên Lãng", []),
+        "316": ("Vĩnh Bảo", []), "317": ("Cát Hải", []),
+    },
+    "92": {
+        "916": ("Ninh Kiều", []), "917": ("Ô Môn", []), "918": ("Bình Thủy", []), "919": ("Cái Răng", []),
+        "923": ("Thốt Nốt", []), "924": ("Vĩnh Thạnh", []), "925": ("Cờ Đỏ", []), "926": ("Phong Điền", []),
+        "927": ("Thới Lai", []),
+    },
+    "74": {
+        "718": ("Thủ Dầu Một", ["tdm"]), "719": ("Bàu Bàng", []), "720": ("Dầu Tiếng", []), "721": ("Bến Cát", []),
+        "722": ("Phú Giáo", []), "723": ("Tân Uyên", []), "724": ("Dĩ An", []), "725": ("Thuận An", []),
+        "726": ("Bắc Tân Uyên", []),
+    },
+    "75": {
+        "731": ("Biên Hòa", []), "732": ("Long Khánh", []), "734": ("Tân Phú", []), "735": ("Vĩnh Cửu", []),
+        "736": ("Định Quán", []), "737": ("Trảng Bom", []), "738": ("Thống Nhất", []), "739": ("Cẩm Mỹ", []),
+        "740": ("Long Thành", []), "741": ("Xuân Lộc", []), "742": ("Nhơn Trạch", []),
+    },
+}
+
+LOCATION_FIELDS = ["province_code", "province", "district_code", "district", "province_codes"]
+
+# Token đứng trước tên -> tên đó là phường / đường, không phải quận / tỉnh
+SKIP_PREFIXES = {"phuong", "p", "xa", "duong", "d", "pho", "ap", "thon", "khu", "to", "ngo", "hem", "kp"}
+DISTRICT_PREFIXES = {"quan", "q", "huyen", "h", "tx", "tp"}
+
+
+def _aliases(name, extra):
+    folded = " ".join(words(name))
+    result = {folded, *extra}
+    number = re.fullmatch(r"quan (\d+)", folded)
+    if number:
+        n = number.group(1)
+        result.update({f"q {n}", f"q{n}", f"district {n}"})
+    return result
+
+
+class Gazetteer:
+    # Trie theo token: {token: {token: ..., None: [(loại, mã tỉnh, mã quận)]}}
+    def __init__(self, provinces=PROVINCES, districts=DISTRICTS):
+        self.root = {}
+        self.provinces = {code: name for code, (name, _) in provinces.items()}
+        self.districts = {}
+        for code, (name, extra) in provinces.items():
+            for alias in _aliases(name, extra):
+                self.insert(alias, ("province", code, None))
+        for province_code, items in districts.items():
+            for code, (name, extra) in items.items():
+                self.districts[code] = (province_code, name)
+                for alias in _aliases(name, extra):
+                    self.insert(alias, ("district", province_code, code))
+
+    def insert(self, alias, entry):
+        node = self.root
+        for token in alias.split():
+            node = node.setdefault(token, {})
+        node.setdefault(None, []).append(entry)
+
+    def scan(self, tokens):
+        # Khớp dài nhất từ trái sang phải, không chồng lấn; trả về [(vị trí, entries)]
+        matches = []
+        i = 0
+        while i < len(tokens):
+            node = self.root
+            best = None
+            j = i
+            while j < len(tokens) and tokens[j] in node:
+                node = node[tokens[j]]
+                j += 1
+                if None in node:
+                    best = (j, node[None])
+            if best is None:
+                i += 1
+                continue
+            matches.append((i, best[1]))
+            i = best[0]
+        return matches
+
+    def provinces_in(self, tokens):
+        codes = []
+        for start, entries in self.scan(tokens):
+            if _prefix(tokens, start) == "skip":
+                continue
+            for kind, province_code, _ in entries:
+                if kind == "province" and province_code not in codes:
+                    codes.append(province_code)
+        return codes
+
+    def resolve(self, address, province_hint=None):
+        tokens = words(address)
+        # Tỉnh: ưu tiên cột tỉnh thành (có thể nhiều tỉnh "Hồ Chí Minh, Hà Nội"), không có thì lấy từ địa chỉ
+        provinces = self.provinces_in(words(province_hint)) if province_hint else []
+        if not provinces:
+            found = self.provinces_in(tokens)
+            provinces = found[-1:]  # Địa chỉ VN ghi tỉnh ở cuối
+
+        best = None
+        for start, entries in self.scan(tokens):
+            prefix = _prefix(tokens, start)
+            if prefix == "skip":
+                continue
+            candidates = [e for e in entries if e[0] == "district" and (not provinces or e[1] in provinces)]
+            if len(candidates) != 1:
+                continue  # Không có hoặc trùng tên ở nhiều tỉnh mà chưa biết tỉnh
+            rank = (prefix == "district", start)
+            if best is None or rank > best[0]:
+                best = (rank, candidates[0])
+
+        district_code = best[1][2] if best else None
+        if district_code and not provinces:
+            provinces = [best[1][1]]
+        province_code = provinces[0] if provinces else None
+        if district_code and best[1][1] != province_code:
+            # Tin nhiều tỉnh: quận thuộc tỉnh nào thì tỉnh đó là tỉnh chính
+            province_code = best[1][1]
+        return {
+            "province_code": province_code or "",
+            "province": self.provinces.get(province_code, ""),
+            "district_code": district_code or "",
+            "district": self.districts[district_code][1] if district_code else "",
+            "province_codes": ",".join(provinces),
+        }
+
+
+def _prefix(tokens, start):
+    if start == 0:
+        return None
+    before = tokens[start - 1]
+    two = tokens[start - 2] if start >= 2 else None
+    if two in ("thanh", "thi") and before in ("pho", "xa"):
+        return "district"  # "thành phố ...", "thị xã ..."
+    if before in SKIP_PREFIXES:
+        return "skip"
+    if before in DISTRICT_PREFIXES:
+        return "district"
+    return None
+
+
+_GAZETTEER = None
+
+
+@lru_cache(maxsize=100000)
+def normalize_location(address, province_hint=None):
+    global _GAZETTEER
+    if _GAZETTEER is None:
+        _GAZETTEER = Gazetteer()
+    return _GAZETTEER.resolve(address, province_hint)
+
+
+def backfill_table(db_path, table="jobs", column="location", batch_size=1000):
+    # Gán mã cho các dòng cũ chưa có province_code (DB đã có cột, vd sau khi CareerlinkPipeline mở lần đầu)
+    con = sqlite3.connect(db_path)
+    try:
+        rows = con.execute(f"SELECT url, {column} FROM {table} WHERE province_code IS NULL").fetchall()
+        for i in range(0, len(rows), batch_size):
+            updates = []
+            for url, location in rows[i:i + batch_size]:
+                codes = normalize_location(location or "")
+                updates.append((codes["province_code"] or None, codes["district_code"] or None, url))
+            with con:
+                con.executemany(f"UPDATE {table} SET province_code = ?, district_code = ? WHERE url = ?", updates)
+        return len(rows)
+    finally:
+        con.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Tra mã tỉnh / quận cho địa chỉ, hoặc gán mã cho bảng jobs cũ")
+    parser.add_argument("address", nargs="?")
+    parser.add_argument("--province", help="Giá trị cột tỉnh thành (nếu có)")
+    parser.add_argument("--db", help="Gán mã cho các dòng chưa có trong bảng jobs (vd: data1.db)")
+    args = parser.parse_args()
+    if args.address:
+        print(normalize_location(args.address, args.province))
+    if args.db:
+        print(f"✅ Đã gán mã địa điểm cho {backfill_table(args.db)} dòng trong {args.db}")
@@ -0,0 +1,199 @@
+import json
+import os
+import sqlite3
+import time
+from datetime import datetime
+
+from scrapy import signals
+
+from mycrawler import storage
+
+# --- ĐO THÔNG LƯỢNG / ĐỘ TRỄ CỦA CRAWLER ---
+# Mọi số đo đi qua crawler.stats với tiền tố "metrics/":
+#   metrics/download/<callback>/...   độ trễ tải trang (download_latency của Scrapy)
+#   metrics/callback/<callback>/...   thời gian chạy callback (parse_list, parse_job, parse_rss, parse_universal)
+#   metrics/db_write/...              thời gian 1 lần flush lô xuống SQLite (pipeline)
+#   metrics/pipeline/new|updated|unchanged|not_modified
+#   metrics/neardup/checked|duplicates|time/...  lượt dò tin trùng gần đúng sau crawl (neardup.py)
+#   metrics/extract/fallback/<field>  số lần selector đã nhớ (extract.py) trượt, phải thử selector khác
+#   metrics/pagination/depth|pages|new_links|stop/<chuỗi>  độ sâu phân trang CareerLink đã đi tới trong lượt
+#   metrics/frontier/queued|skipped|done|failed|resumed  frontier HustEdu (skipped = dạng url đã gặp)
+# Histogram = đếm theo các mốc LATENCY_BUCKETS (giây) + count / sum / max.
+# Cuối mỗi lượt crawl, CrawlMetricsExtension ghi 1 dòng vào METRICS_DB (bảng crawl_runs)
+# để scheduler tóm tắt được các lượt gần nhất.
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def observe(stats, name, seconds):
+    if stats is None:
+        return
+    for bound in LATENCY_BUCKETS:
+        if seconds <= bound:
+            stats.inc_value(f"{name}/le_{bound}")
+            break
+    else:
+        stats.inc_value(f"{name}/le_inf")
+    stats.inc_value(f"{name}/count")
+    stats.inc_value(f"{name}/sum", seconds)
+    stats.max_value(f"{name}/max", seconds)
+
+
+def histogram_percentile(values, name, q):
+    # Ước lượng phân vị q (0..1) từ histogram: trả về mốc bucket chứa phân vị đó
+    total = values.get(f"{name}/count", 0)
+    if not total:
+        return None
+    seen = 0
+    for bound in LATENCY_BUCKETS:
+        seen += values.get(f"{name}/le_{bound}", 0)
+        if seen >= q * total:
+            return bound
+    return values.get(f"{name}/max")
+
+
+def callback_name(response):
+    callback = response.request.callback if response.request is not None else None
+    return getattr(callback, "__name__", "parse")
+
+
+class CallbackTimingMiddleware:
+    # Spider middleware đặt sát spider: đo thời gian chạy callback (tổng thời gian giữa các lần yield)
+    def __init__(self, stats):
+        self.stats = stats
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler.stats)
+
+    def process_spider_output(self, response, result, spider):
+        name = self.start(response)
+        elapsed = 0.0
+        start = time.perf_counter()
+        for i in result:
+            elapsed += time.perf_counter() - start
+            yield i
+            start = time.perf_counter()
+        elapsed += time.perf_counter() - start
+        observe(self.stats, f"metrics/callback/{name}", elapsed)
+
+    async def process_spider_output_async(self, response, result, spider):
+        name = self.start(response)
+        elapsed = 0.0
+        start = time.perf_counter()
+        async for i in result:
+            elapsed += time.perf_counter() - start
+            yield i
+            start = time.perf_counter()
+        elapsed += time.perf_counter() - start
+        observe(self.stats, f"metrics/callback/{name}", elapsed)
+
+    def start(self, response):
+        name = callback_name(response)
+        latency = response.meta.get("download_latency")
+        if latency is not None:
+            observe(self.stats, f"metrics/download/{name}", latency)
+        return name
+
+
+class CrawlMetricsExtension:
+    def __init__(self, stats, db_path):
+        self.stats = stats
+        self.db_path = db_path
+        self.started = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        ext = cls(crawler.stats, storage.setting_db_path(crawler.settings, "METRICS_DB", "metrics.db"))
+        crawler.signals.connect(ext.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(ext.spider_closed, signal=signals.spider_closed)
+        return ext
+
+    def spider_opened(self, spider):
+        self.started = time.monotonic()
+
+    def spider_closed(self, spider, reason):
+        elapsed = time.monotonic() - self.started if self.started else 0.0
+        values = self.stats.get_stats()
+        items = values.get("item_scraped_count", 0)
+        metrics = {k: v for k, v in values.items() if k.startswith("metrics/")}
+        record_run(self.db_path, spider.name, reason, elapsed, items, metrics)
+
+
+# --- CHUỖI THỜI GIAN (SQLite) ---
+
+def create_metrics_table(con):
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS crawl_runs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            spider TEXT,
+            finished_at TIMESTAMP,
+            reason TEXT,
+            elapsed REAL,
+            items INTEGER,
+            items_per_sec REAL,
+            metrics TEXT
+        )
+    """)
+
+
+def record_run(db_path, spider_name, reason, elapsed, items, metrics):
+    con = sqlite3.connect(db_path)
+    try:
+        with con:
+            create_metrics_table(con)
+            con.execute(
+                "INSERT INTO crawl_runs (spider, finished_at, reason, elapsed, items, items_per_sec, metrics) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (spider_name, datetime.now(), reason, elapsed, items, items / elapsed if elapsed else 0.0, json.dumps(metrics)),
+            )
+    finally:
+        con.close()
+
+
+def summarize_metrics(db_path="metrics.db", spider_name=None, last=10):
+    # In tóm tắt N lượt gần nhất: items/s, p50/p95 callback, download, db_write
+    if not os.path.exists(db_path):
+        print(f"⚠️ Chưa có {db_path}")
+        return []
+    con = sqlite3.connect(db_path)
+    try:
+        query = "SELECT spider, finished_at, elapsed, items, items_per_sec, metrics FROM crawl_runs"
+        params = ()
+        if spider_name:
+            query += " WHERE spider = ?"
+            params = (spider_name,)
+        rows = con.execute(query + " ORDER BY id DESC LIMIT ?", params + (last,)).fetchall()
+    finally:
+        con.close()
+
+    for spider, finished_at, elapsed, items, items_per_sec, metrics in rows:
+        values = json.loads(metrics)
+        parts = [f"[{finished_at}] {spider}: {items} item / {elapsed:.1f}s = {items_per_sec:.2f} item/s"]
+        names = sorted({k.rsplit("/", 1)[0] for k in values if k.endswith("/count")})
+        for name in names:
+            count = values[f"{name}/count"]
+            avg = values.get(f"{name}/sum", 0) / count
+            p50 = histogram_percentile(values, name, 0.5)
+            p95 = histogram_percentile(values, name, 0.95)
+            parts.append(f"    {name[len('metrics/'):]}: n={count} avg={avg * 1000:.1f}ms p50<={p50}s p95<={p95}s")
+        counts = {k.rsplit("/", 1)[1]: v for k, v in values.items() if k.startswith("metrics/pipeline/")}
+        if counts:
+            parts.append("    pipeline: " + ", ".join(f"{k}={v}" for k, v in sorted(counts.items())))
+        pagination = {k[len("metrics/pagination/"):]: v for k, v in values.items() if k.startswith("metrics/pagination/")}
+        if pagination:
+            parts.append("    pagination: " + ", ".join(f"{k}={v}" for k, v in sorted(pagination.items())))
+        frontier = {k[len("metrics/frontier/"):]: v for k, v in values.items() if k.startswith("metrics/frontier/")}
+        if frontier:
+            parts.append("    frontier: " + ", ".join(f"{k}={v}" for k, v in sorted(frontier.items())))
+        print("\n".join(parts))
+    return rows
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Tóm tắt số đo các lượt crawl gần nhất")
+    parser.add_argument("--db", default=storage.setting_db_path(None, "METRICS_DB", "metrics.db"))
+    parser.add_argument("--spider")
+    parser.add_argument("--last", type=int, default=10)
+    args = parser.parse_args()
+    summarize_metrics(args.db, args.spider, args.last)
@@ -98,3 +98,56 @@ class MycrawlerDownloaderMiddleware:
 
     def spider_opened(self, spider):
         spider.logger.info("Spider opened: %s" % spider.name)
+
+
+# --- CONDITIONAL GET CHO CÁC LƯỢT KIỂM TRA LẠI (recheck) ---
+# Spider đọc etag / last_modified đã lưu trong DB và gắn vào meta của request recheck:
+#   meta={"recheck": True, "cache_etag": ..., "cache_last_modified": ...}
+# Downloader middleware gửi If-None-Match / If-Modified-Since và cho phép 304 đi tới spider.
+# Spider middleware:
+#   - 304: bỏ qua kết quả callback, trả item {"url", "not_modified": True} -> pipeline chỉ cập nhật last_checked
+#   - 200: gắn ETag / Last-Modified của response vào item để pipeline lưu vào DB
+class ConditionalGetDownloaderMiddleware:
+    def process_request(self, request, spider):
+        if not request.meta.get("recheck"):
+            return None
+
+        etag = request.meta.get("cache_etag")
+        last_modified = request.meta.get("cache_last_modified")
+        if etag:
+            request.headers.setdefault("If-None-Match", etag)
+        if last_modified:
+            request.headers.setdefault("If-Modified-Since", last_modified)
+        if etag or last_modified:
+            allowed = request.meta.setdefault("handle_httpstatus_list", [])
+            if 304 not in allowed:
+                allowed.append(304)
+        return None
+
+
+class ConditionalGetSpiderMiddleware:
+    def process_spider_output(self, response, result, spider):
+        if response.status == 304 and response.meta.get("recheck"):
+            yield self.not_modified_item(response, spider)
+            return
+        for i in result:
+            yield self.add_validators(response, i)
+
+    async def process_spider_output_async(self, response, result, spider):
+        if response.status == 304 and response.meta.get("recheck"):
+            yield self.not_modified_item(response, spider)
+            return
+        async for i in result:
+            yield self.add_validators(response, i)
+
+    def not_modified_item(self, response, spider):
+        spider.crawler.stats.inc_value("conditional_get/not_modified")
+        return {"url": response.url, "not_modified": True}
+
+    def add_validators(self, response, i):
+        if isinstance(i, dict) and i.get("url") == response.url:
+            etag = response.headers.get("ETag")
+            last_modified = response.headers.get("Last-Modified")
+            i["etag"] = etag.decode("latin-1") if etag else None
+            i["last_modified"] = last_modified.decode("latin-1") if last_modified else None
+        return i
@@ -0,0 +1,411 @@
+import csv
+import hashlib
+import operator
+import random
+import sqlite3
+import struct
+import time
+from array import array
+from datetime import datetime
+
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+
+from mycrawler.metrics import observe
+from mycrawler import storage
+from mycrawler.textfold import words
+
+try:
+    import numpy as np
+except ImportError:  # không có numpy: tính chữ ký / độ giống bằng Python thuần (chậm hơn nhiều)
+    np = None
+
+# --- PHÁT HIỆN TIN TRÙNG GẦN ĐÚNG GIỮA CÁC NGUỒN (MinHash + LSH) ---
+# Cùng 1 tin đăng xuất hiện ở CSV cũ, CareerLink, vieclam24h, ... với url / Id khác nhau
+# và chữ hơi khác (hoa thường, dấu, thêm "- Hà Nội", ...) -> MD5 content_hash không bắt được.
+#   1. shingle: âm tiết đã bỏ dấu + bigram của title (trọng số x2), token company ("c:"), token location ("l:")
+#   2. chữ ký MinHash NUM_PERM giá trị: P(2 chữ ký trùng ở 1 vị trí) = Jaccard của 2 tập shingle
+#   3. LSH: chia chữ ký thành BANDS dải x ROWS hàng, mỗi dải băm thành 1 bucket;
+#      2 tin chung ít nhất 1 bucket mới được so chữ ký -> không phải so từng cặp O(n²)
+#      16 x 4: Jaccard 0.8 -> ~100% thành ứng viên, Jaccard 0.3 -> ~12%
+# Chữ ký + bucket lưu trong SQLite (NEARDUP_DB) dùng chung cho mọi nguồn; nếu trùng thì dup_of = tin gốc
+# (tin xuất hiện đầu tiên của cụm). Chỉ tin gốc có bucket: bản trùng không làm phình bucket, mỗi cụm chỉ cần so 1 lần.
+# Không dò trong flush của pipeline (chặn ghi DB): NearDupExtension chạy check_changed() khi spider đóng,
+# chỉ trên các dòng mới / đổi nội dung từ lượt trước (change_seq > mốc lưu trong crawl_state, storage.py).
+# Chữ ký của cả lô tính 1 lần bằng numpy (shingle x hoán vị), cho đúng kết quả như bản Python thuần.
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+DEFAULT_THRESHOLD = 0.8
+# Số ứng viên tối đa được so chữ ký (ưu tiên tin chung nhiều dải nhất = giống nhất)
+MAX_CANDIDATES = 50
+
+_PRIME = (1 << 61) - 1
+_MASK = (1 << 32) - 1
+# Hệ số hoán vị cố định -> chữ ký giống nhau giữa các lần chạy / các process
+_rng = random.Random(1315423911)
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+# Số shingle mỗi lần tính bằng numpy: mảng tạm 64 x 8192 uint64 = 4MB
+CHUNK_SHINGLES = 8192
+JOB_FIELDS = ("title", "company", "location")
+
+
+def shingles(title, company=None, location=None):
+    tokens = words(title)
+    title_shingles = set(tokens)
+    title_shingles.update(f"{a} {b}" for a, b in zip(tokens, tokens[1:]))
+    # Title tính 2 lần (2 tiền tố) -> company / địa chỉ dài không lấn át khác biệt ở title
+    result = {prefix + s for s in title_shingles for prefix in ("t:", "T:")}
+    result.update("c:" + w for w in words(company))
+    result.update("l:" + w for w in words(location))
+    return result
+
+
+def _hash64(text):
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def _minhash_py(shingle_set):
+    hashes = [_hash64(s) for s in shingle_set]
+    return array("I", [min((a * h + b) % _PRIME for h in hashes) & _MASK for a, b in _PERMUTATIONS])
+
+
+if np is not None:
+    _P = np.uint64(_PRIME)
+    _A = np.array([a for a, _ in _PERMUTATIONS], dtype=np.uint64)[:, None]
+    _A0, _A1 = _A & np.uint64(_MASK), _A >> np.uint64(32)
+    _B = np.array([b for _, b in _PERMUTATIONS], dtype=np.uint64)[:, None]
+
+
+def _fold_prime(x):
+    # x (uint64) -> giá trị đồng dư mod 2^61-1, < 2^61 + 8 (vì 2^61 ≡ 1)
+    return (x & _P) + (x >> np.uint64(61))
+
+
+def _mod_prime(x):
+    x = _fold_prime(x)
+    return np.where(x >= _P, x - _P, x)
+
+
+def _minhash_block(hashes, starts):
+    # (a*h + b) mod 2^61-1 cho mọi hoán vị x mọi shingle, không tràn uint64: a, h < 2^61 tách thành 2 nửa 32 bit,
+    # a*h = a1*h1*2^64 + (a1*h0 + a0*h1)*2^32 + a0*h0 với 2^64 ≡ 8, 2^61 ≡ 1
+    h = _mod_prime(np.array(hashes, dtype=np.uint64))[None, :]
+    h0, h1 = h & np.uint64(_MASK), h >> np.uint64(32)
+    mid = _A1 * h0 + _A0 * h1
+    x = ((_A1 * h1) << np.uint64(3)) + (mid >> np.uint64(29)) \
+        + ((mid & np.uint64((1 << 29) - 1)) << np.uint64(32)) + _fold_prime(_A0 * h0)
+    x = _mod_prime(_mod_prime(x) + _B)
+    # min theo từng tin (các cột starts[i]..starts[i+1]) -> (số tin, NUM_PERM)
+    return (np.minimum.reduceat(x, starts, axis=1) & np.uint64(_MASK)).astype(np.uint32).T
+
+
+def minhash_many(shingle_sets):
+    # Chữ ký cho cả lô (None cho tập rỗng)
+    if np is None:
+        return [_minhash_py(s) if s else None for s in shingle_sets]
+    signatures = [None] * len(shingle_sets)
+    hashes, starts, owners = [], [], []
+
+    def run():
+        for i, row in zip(owners, _minhash_block(hashes, starts)):
+            signatures[i] = array("I", row.tobytes())
+
+    for i, shingle_set in enumerate(shingle_sets):
+        if not shingle_set:
+            continue
+        if hashes and len(hashes) + len(shingle_set) > CHUNK_SHINGLES:
+            run()
+            hashes, starts, owners = [], [], []
+        starts.append(len(hashes))
+        owners.append(i)
+        hashes.extend(_hash64(s) for s in shingle_set)
+    if hashes:
+        run()
+    return signatures
+
+
+def minhash(shingle_set):
+    if not shingle_set:
+        return None
+    return minhash_many([shingle_set])[0]
+
+
+def similarity(sig_a, sig_b):
+    # Ước lượng Jaccard = tỉ lệ vị trí trùng nhau
+    return sum(map(operator.eq, sig_a, sig_b)) / NUM_PERM
+
+
+def similarities(signature, others):
+    if np is None or len(others) < 8:
+        return [similarity(signature, other) for other in others]
+    matrix = np.frombuffer(b"".join(others), dtype=np.uint32).reshape(len(others), NUM_PERM)
+    return ((matrix == np.frombuffer(signature, dtype=np.uint32)).sum(axis=1) / NUM_PERM).tolist()
+
+
+def band_buckets(signature):
+    # Mỗi dải -> 1 số nguyên 64-bit có dấu (kiểu INTEGER của SQLite), có số thứ tự dải bên trong
+    buckets = []
+    for band in range(BANDS):
+        rows = signature[band * ROWS:(band + 1) * ROWS]
+        digest = hashlib.blake2b(struct.pack(f"<H{ROWS}I", band, *rows), digest_size=8).digest()
+        buckets.append(int.from_bytes(digest, "little", signed=True))
+    return buckets
+
+
+class NearDupIndex:
+    def __init__(self, db_path="neardup.db", threshold=DEFAULT_THRESHOLD):
+        self.db_path = db_path
+        self.threshold = threshold
+        self.con = sqlite3.connect(db_path, timeout=30)
+        self.con.execute("PRAGMA journal_mode=WAL;")
+        self.con.execute("""
+            CREATE TABLE IF NOT EXISTS neardup_docs (
+                key TEXT PRIMARY KEY,
+                source TEXT,
+                signature BLOB,
+                dup_of TEXT,
+                similarity REAL,
+                added_at TIMESTAMP
+            )
+        """)
+        self.con.execute("""
+            CREATE TABLE IF NOT EXISTS neardup_buckets (
+                bucket INTEGER,
+                key TEXT,
+                PRIMARY KEY (bucket, key)
+            ) WITHOUT ROWID
+        """)
+        self.con.commit()
+
+    def candidates(self, buckets, exclude=None):
+        placeholders = ",".join("?" * len(buckets))
+        rows = self.con.execute(f"""
+            SELECT d.key, d.signature, d.dup_of
+            FROM (SELECT key, COUNT(*) AS shared FROM neardup_buckets WHERE bucket IN ({placeholders})
+                  GROUP BY key ORDER BY shared DESC LIMIT ?) b
+            JOIN neardup_docs d ON d.key = b.key
+        """, buckets + [MAX_CANDIDATES + 1]).fetchall()
+        for key, blob, dup_of in rows:
+            if key == exclude:
+                continue
+            signature = array("I")
+            signature.frombytes(blob)
+            yield key, signature, dup_of
+
+    def best_match(self, signature, buckets, exclude=None):
+        best_key, best_sim = None, 0.0
+        candidates = list(self.candidates(buckets, exclude))
+        sims = similarities(signature, [other for _, other, _ in candidates])
+        for (key, _, dup_of), sim in zip(candidates, sims):
+            if sim >= self.threshold and sim > best_sim:
+                # Trỏ về tin gốc của cụm để cả cụm có cùng dup_of
+                best_key, best_sim = dup_of or key, sim
+        return best_key, best_sim
+
+    def find(self, title, company=None, location=None):
+        # Chỉ tra cứu, không thêm vào index
+        signature = minhash(shingles(title, company, location))
+        if signature is None:
+            return None, 0.0
+        return self.best_match(signature, band_buckets(signature))
+
+    def add(self, key, title, company=None, location=None, source=None):
+        # Thêm / cập nhật 1 tin; trả về (key tin gốc, độ giống) nếu trùng, (None, 0.0) nếu không
+        return self.add_signature(key, minhash(shingles(title, company, location)), source)
+
+    def add_signature(self, key, signature, source=None):
+        if signature is None:
+            return None, 0.0
+        buckets = band_buckets(signature)
+        dup_of, sim = self.best_match(signature, buckets, exclude=key)
+        if dup_of == key:
+            dup_of, sim = None, 0.0
+        old = self.con.execute("SELECT signature FROM neardup_docs WHERE key = ?", (key,)).fetchone()
+        if old:
+            # Cập nhật: xóa đúng các bucket cũ (tính lại từ chữ ký cũ, không phải quét theo key)
+            old_signature = array("I")
+            old_signature.frombytes(old[0])
+            self.con.executemany("DELETE FROM neardup_buckets WHERE bucket = ? AND key = ?",
+                                 [(bucket, key) for bucket in band_buckets(old_signature)])
+        self.con.execute("""
+            INSERT INTO neardup_docs (key, source, signature, dup_of, similarity, added_at) VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(key) DO UPDATE SET source=excluded.source, signature=excluded.signature,
+                dup_of=excluded.dup_of, similarity=excluded.similarity
+        """, (key, source, signature.tobytes(), dup_of, sim or None, datetime.now()))
+        if dup_of is None:
+            self.con.executemany("INSERT OR IGNORE INTO neardup_buckets (bucket, key) VALUES (?, ?)",
+                                 [(bucket, key) for bucket in buckets])
+        return dup_of, sim
+
+    def add_many(self, records):
+        # records: (key, title, company, location, source); 1 transaction cho cả lô,
+        # các tin trong cùng lô cũng được so với nhau
+        records = list(records)
+        signatures = minhash_many([shingles(title, company, location) for _, title, company, location, _ in records])
+        results = []
+        with self.con:
+            for (key, _, _, _, source), signature in zip(records, signatures):
+                results.append(self.add_signature(key, signature, source))
+        return results
+
+    def commit(self):
+        self.con.commit()
+
+    def close(self):
+        self.con.commit()
+        self.con.close()
+
+
+# --- NẠP CÁC NGUỒN CÓ SẴN ---
+
+def backfill_csv(index, path, batch_size=1000):
+    # CSV sạch (data/jobs_clean.csv): không có tên công ty -> dùng địa chỉ tuyển dụng thay cho company
+    # (cùng nhà tuyển dụng thường cùng địa chỉ), tỉnh thành làm location
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        reader = csv.DictReader(f)
+        batch = []
+        count = dups = 0
+        for row in reader:
+            row = {k.strip(): (v or "").strip() for k, v in row.items() if k}
+            if not row.get("Id tin"):
+                continue
+            batch.append((f"legacy:{row['Id tin']}", row.get("Tiêu đề tin"), row.get("Địa điểm tuyển dụng"),
+                          row.get("Tỉnh thành tuyển dụng"), "legacy"))
+            if len(batch) >= batch_size:
+                dups += sum(1 for dup_of, _ in index.add_many(batch) if dup_of)
+                count += len(batch)
+                batch = []
+        if batch:
+            dups += sum(1 for dup_of, _ in index.add_many(batch) if dup_of)
+            count += len(batch)
+    return count, dups
+
+
+def backfill_table(index, db_path, table="jobs", source="careerlink", batch_size=1000):
+    con = sqlite3.connect(db_path)
+    try:
+        cur = con.execute(f"SELECT url, title, company, location FROM {table}")
+        count = dups = 0
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                break
+            batch = [(f"{source}:{url}", title, company, location, source) for url, title, company, location in rows]
+            dups += sum(1 for dup_of, _ in index.add_many(batch) if dup_of)
+            count += len(batch)
+        return count, dups
+    finally:
+        con.close()
+
+
+def check_changed(index, con, table="jobs", source="careerlink", since=None, fields=JOB_FIELDS, batch_size=1000):
+    # Dòng mới / đổi nội dung sau mốc since (change_seq) -> index, ghi dup_of vào bảng (kể cả xóa dup_of cũ).
+    # Trả về (số tin đã dò, [(url, title, dup_of, độ giống)] tin trùng, mốc mới)
+    columns = ", ".join(fields)
+    position = since or 0
+    count = 0
+    duplicates = []
+    while True:
+        # Phân trang theo change_seq: không giữ cursor mở trong lúc UPDATE cùng bảng
+        rows = con.execute(f"""
+            SELECT url, {columns}, change_seq FROM {table}
+            WHERE change_seq > ? ORDER BY change_seq LIMIT ?
+        """, (position, batch_size)).fetchall()
+        if not rows:
+            break
+        results = index.add_many([(f"{source}:{row[0]}",) + tuple(row[1:4]) + (source,) for row in rows])
+        with con:
+            con.executemany(f"UPDATE {table} SET dup_of = ? WHERE url = ?",
+                            [(dup_of, row[0]) for row, (dup_of, _) in zip(rows, results)])
+        duplicates.extend((row[0], row[1], dup_of, sim) for row, (dup_of, sim) in zip(rows, results) if dup_of)
+        count += len(rows)
+        position = rows[-1][-1]
+    return count, duplicates, position
+
+
+class NearDupExtension:
+    # Sau mỗi lượt crawl: dò trùng các tin spider vừa thêm / sửa (NEARDUP_SPIDERS: spider -> bảng có cột dup_of)
+    def __init__(self, settings, stats):
+        self.settings = settings
+        self.stats = stats
+        self.tables = settings.getdict("NEARDUP_SPIDERS", {"careerlink": "jobs"})
+        self.start_seq = {}  # bảng -> change_seq lớn nhất lúc spider mở
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.getbool("NEARDUP_ENABLED", True):
+            raise NotConfigured
+        ext = cls(crawler.settings, crawler.stats)
+        crawler.signals.connect(ext.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(ext.spider_closed, signal=signals.spider_closed)
+        return ext
+
+    def spider_opened(self, spider):
+        table = self.tables.get(spider.name)
+        if table is not None:
+            con = storage.connect(table, self.settings)
+            self.start_seq[table] = con.execute(f"SELECT COALESCE(MAX(change_seq), 0) FROM {table}").fetchone()[0]
+
+    def spider_closed(self, spider, reason):
+        table = self.tables.get(spider.name)
+        if table is None:
+            return
+        started = time.perf_counter()
+        state_key = f"neardup/{spider.name}/checkpoint"
+        # Lần đầu: chỉ dò tin của lượt này (dữ liệu cũ nạp bằng python -m mycrawler.neardup --db ...)
+        # (mốc dạng [last_updated, url] của bản cũ cũng coi như chưa có)
+        since = storage.get_state(table, state_key, self.settings)
+        if not isinstance(since, int):
+            since = self.start_seq.get(table, 0)
+        index = NearDupIndex(storage.setting_db_path(self.settings, "NEARDUP_DB", "neardup.db"), self.settings.getfloat("NEARDUP_THRESHOLD", 0.8))
+        try:
+            count, duplicates, checkpoint = check_changed(index, storage.connect(table, self.settings), table, spider.name, since)
+        finally:
+            index.close()
+        storage.set_state(table, state_key, checkpoint, self.settings)
+        for url, title, dup_of, sim in duplicates:
+            print(f"--> [DUP] 👯 {title} ~ {dup_of} ({sim:.0%})")
+        if count:
+            print(f"--> [NEARDUP] Dò {count} tin mới / đổi nội dung, {len(duplicates)} tin trùng gần đúng.")
+        self.stats.inc_value("metrics/neardup/checked", count)
+        self.stats.inc_value("metrics/neardup/duplicates", len(duplicates))
+        observe(self.stats, "metrics/neardup/time", time.perf_counter() - started)
+
+
+def summarize(index, limit=10):
+    con = index.con
+    total = con.execute("SELECT COUNT(*) FROM neardup_docs").fetchone()[0]
+    dups = con.execute("SELECT COUNT(*) FROM neardup_docs WHERE dup_of IS NOT NULL").fetchone()[0]
+    print(f"➤ {total} tin, {dups} tin trùng gần đúng ({dups / total * 100 if total else 0:.1f}%)")
+    rows = con.execute("""
+        SELECT dup_of, COUNT(*) AS n FROM neardup_docs WHERE dup_of IS NOT NULL
+        GROUP BY dup_of ORDER BY n DESC LIMIT ?
+    """, (limit,)).fetchall()
+    for dup_of, n in rows:
+        print(f"    {dup_of}: {n} bản trùng")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Nạp / thống kê tin trùng gần đúng (MinHash + LSH)")
+    parser.add_argument("--neardup-db", default=storage.setting_db_path(None, "NEARDUP_DB", "neardup.db"))
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--csv", help="CSV sạch (vd: ../data/jobs_clean.csv)")
+    parser.add_argument("--db", help="DB crawler có bảng jobs (vd: data1.db)")
+    parser.add_argument("--table", default="jobs")
+    parser.add_argument("--source", default="careerlink")
+    args = parser.parse_args()
+
+    index = NearDupIndex(args.neardup_db, args.threshold)
+    try:
+        if args.csv:
+            count, dups = backfill_csv(index, args.csv)
+            print(f"✅ {args.csv}: {count} tin, {dups} trùng")
+        if args.db:
+            count, dups = backfill_table(index, args.db, args.table, args.source)
+            print(f"✅ {args.db}/{args.table}: {count} tin, {dups} trùng")
+        summarize(index)
+    finally:
+        index.close()
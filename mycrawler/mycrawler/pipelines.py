@@ -1,123 +1,205 @@
-import sqlite3
 import hashlib
+import time
 from datetime import datetime
 from scrapy.exceptions import DropItem
+from twisted.internet import task
 
-# --- PIPELINE CHO HUSTEDU (Lưu vào data.db) ---
-class MycrawlerPipeline:
-    def __init__(self):
-        self.con = sqlite3.connect('data.db') # HUSTEDU -> data.db
-        self.cur = self.con.cursor()
-        self.cur.execute("PRAGMA journal_mode=WAL;")
-        self.create_table()
-
-    def create_table(self):
-        self.cur.execute("""
-            CREATE TABLE IF NOT EXISTS news (
-                url TEXT PRIMARY KEY,
-                title TEXT,
-                short TEXT,
-                content_hash TEXT,
-                last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                last_checked TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        self.con.commit()
+from mycrawler.dedup import get_url_index
+from mycrawler.gazetteer import normalize_location
+from mycrawler.metrics import observe
+from mycrawler import storage
 
-    def process_item(self, item, spider):
-        # Chỉ xử lý nếu spider là hustedu
-        if spider.name != "hustedu":
-            return item
+# --- PIPELINE GHI THEO LÔ (dùng chung cho HustEdu và CareerLink) ---
+# Item được gom vào buffer, đủ PIPELINE_BATCH_SIZE item hoặc quá PIPELINE_FLUSH_INTERVAL giây thì ghi:
+#   1 câu SELECT ... WHERE url IN (...) để lấy hash cũ của cả lô,
+#   executemany upsert / cập nhật last_checked trong 1 transaction (1 lần commit cho cả lô).
+#   Dòng thêm / đổi nội dung được đánh change_seq = MAX + 1 ngay trong transaction ghi (storage.py).
+# LoopingCall ghi buffer mỗi PIPELINE_FLUSH_INTERVAL giây kể cả khi không có item mới (spider đang chờ
+# trang chậm, lượt recheck thưa) -> item không nằm trong RAM chờ process_item tiếp theo.
+# Buffer luôn được ghi nốt khi close_spider.
+# Kết nối, schema, index do storage.py quản lý (dùng chung với spider, không đóng khi spider xong);
+# câu SQL được dựng 1 lần khi mở spider -> sqlite3 dùng lại câu lệnh đã biên dịch.
+class BatchedSqlitePipeline:
+    spider_name = None
+    table = None
+    fields = ()           # Các cột dữ liệu ngoài url, content_hash, last_checked, last_updated
+    # ETag / Last-Modified của lần tải gần nhất (cho conditional GET khi recheck)
+    validator_fields = ("etag", "last_modified")
+    SQLITE_MAX_PARAMS = 500
 
-        content_str = (item['title'] + item['short']).encode('utf-8')
-        content_hash = hashlib.md5(content_str).hexdigest()
-        current_time = datetime.now()
-
-        self.cur.execute("SELECT content_hash FROM news WHERE url = ?", (item['url'],))
-        row = self.cur.fetchone()
-
-        if row is None:
-            print(f"--> [NEW] 🔥 Thêm mới: {item['title'][:30]}...")
-            self.cur.execute("""
-                INSERT INTO news (url, title, short, content_hash, last_updated, last_checked) 
-                VALUES (?, ?, ?, ?, ?, ?)
-            """, (item['url'], item['title'], item['short'], content_hash, current_time, current_time))
-            self.con.commit()
-        else:
-            db_hash = row[0]
-            if db_hash != content_hash:
-                print(f"--> [UPDATE] ♻️ Có sửa đổi: {item['title'][:30]}...")
-                self.cur.execute("""
-                    UPDATE news 
-                    SET title = ?, short = ?, content_hash = ?, last_updated = ?, last_checked = ?
-                    WHERE url = ?
-                """, (item['title'], item['short'], content_hash, current_time, current_time, item['url']))
-            else:
-                self.cur.execute("UPDATE news SET last_checked = ? WHERE url = ?", (current_time, item['url']))
-            self.con.commit()
-        return item
-
-    def close_spider(self, spider):
-        if spider.name == "hustedu":
-            self.con.close()
+    def __init__(self, batch_size=50, flush_interval=5.0, stats=None):
+        self.batch_size = batch_size
+        self.stats = stats  # crawler.stats: đếm new/updated/unchanged + thời gian ghi DB (metrics.py)
+        self.flush_interval = flush_interval
+        self.buffer = {}  # url -> (item, content_hash, thời điểm nhận) ; trùng url thì giữ bản mới nhất
+        self.last_flush = time.monotonic()
+        self.con = None
+        self.flusher = None
 
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(
+            batch_size=crawler.settings.getint("PIPELINE_BATCH_SIZE", 50),
+            flush_interval=crawler.settings.getfloat("PIPELINE_FLUSH_INTERVAL", 5.0),
+            stats=crawler.stats,
+        )
 
-# --- PIPELINE CHO CAREERLINK (Lưu vào data1.db) ---
-class CareerlinkPipeline:
     def open_spider(self, spider):
-        if spider.name != "careerlink":
+        if spider.name != self.spider_name:
             return
-            
-        self.con = sqlite3.connect('data1.db') # CAREERLINK -> data1.db
+        settings = spider.settings
+        self.con = storage.connect(self.table, settings)
         self.cur = self.con.cursor()
-        
-        self.cur.execute("""
-            CREATE TABLE IF NOT EXISTS jobs (
-                url TEXT PRIMARY KEY,
-                title TEXT,
-                company TEXT,
-                location TEXT,
-                salary TEXT,
-                experience TEXT,
-                content_hash TEXT,
-                last_checked TIMESTAMP,
-                last_updated TIMESTAMP
-            )
-        """)
-        self.con.commit()
+        self.upsert_query = self.upsert_sql()
+        self.touch_query = self.touch_sql()
+        # Index url dùng chung với spider: url vừa nhận được coi như đã có ngay
+        self.url_index = get_url_index(storage.db_path(self.table, settings), self.table, settings)
+        if self.flush_interval > 0:
+            self.flusher = task.LoopingCall(self.flush)
+            self.flusher.start(self.flush_interval, now=False)
 
     def close_spider(self, spider):
-        if spider.name == "careerlink":
-            self.con.close()
+        if spider.name != self.spider_name:
+            return
+        if self.flusher is not None and self.flusher.running:
+            self.flusher.stop()
+        self.flush()
+        self.cur.close()
+
+    def content_hash(self, item):
+        raise NotImplementedError
+
+    def log_new(self, item):
+        pass
+
+    def log_update(self, item):
+        pass
+
+    def enrich(self, item):
+        # Thêm cột suy ra từ dữ liệu (vd mã tỉnh / quận) vào bản sao item trước khi ghi
+        return item
 
     def process_item(self, item, spider):
-        if spider.name != "careerlink":
+        if spider.name != self.spider_name:
             return item
 
-        content_str = f"{item['title']}{item['company']}{item['salary']}{item['location']}"
-        content_hash = hashlib.md5(content_str.encode('utf-8')).hexdigest()
-        now = datetime.now()
-
-        self.cur.execute("SELECT content_hash FROM jobs WHERE url = ?", (item['url'],))
-        row = self.cur.fetchone()
-
-        if row is None:
-            print(f"--> [NEW JOB] 🆕 {item['title']} ({item['company']})")
-            self.cur.execute("""
-                INSERT INTO jobs (url, title, company, location, salary, experience, content_hash, last_checked, last_updated)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (item['url'], item['title'], item['company'], item['location'], item['salary'], item['experience'], content_hash, now, now))
-        else:
-            old_hash = row[0]
-            if old_hash != content_hash:
-                print(f"--> [UPDATE] ♻️ Job thay đổi thông tin: {item['title']}")
-                self.cur.execute("""
-                    UPDATE jobs 
-                    SET title=?, company=?, location=?, salary=?, experience=?, content_hash=?, last_checked=?, last_updated=?
-                    WHERE url=?
-                """, (item['title'], item['company'], item['location'], item['salary'], item['experience'], content_hash, now, now, item['url']))
+        # 304 Not Modified (conditional GET): không có dữ liệu mới, chỉ cập nhật last_checked
+        content_hash = None if item.get('not_modified') else self.content_hash(item)
+        row = dict(item) if content_hash is None else self.enrich(dict(item))
+        self.buffer[item['url']] = (row, content_hash, datetime.now())
+        self.url_index.add(item['url'])
+        if len(self.buffer) >= self.batch_size or time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush()
+        return item
+
+    def fetch_existing_hashes(self, urls):
+        existing = {}
+        for i in range(0, len(urls), self.SQLITE_MAX_PARAMS):
+            part = urls[i:i + self.SQLITE_MAX_PARAMS]
+            placeholders = ",".join("?" * len(part))
+            self.cur.execute(f"SELECT url, content_hash FROM {self.table} WHERE url IN ({placeholders})", part)
+            existing.update(self.cur.fetchall())
+        return existing
+
+    def upsert_sql(self):
+        # Dòng mới: first_seen = now, change_count = 0 ; dòng đã có mà hash đổi: change_count + 1
+        # change_seq tính khi câu lệnh chạy (đang giữ khóa ghi) -> tăng đúng theo thứ tự commit
+        columns = ("url",) + tuple(self.fields) + self.validator_fields + ("content_hash", "last_checked", "last_updated")
+        updates = ", ".join(f"{col}=excluded.{col}" for col in columns[1:] + ("change_seq",))
+        return f"""
+            INSERT INTO {self.table} ({", ".join(columns)}, first_seen, change_count, check_count, change_seq)
+            VALUES ({", ".join("?" * len(columns))}, ?, 0, 1, (SELECT COALESCE(MAX(change_seq), 0) + 1 FROM {self.table}))
+            ON CONFLICT(url) DO UPDATE SET {updates},
+                change_count = COALESCE({self.table}.change_count, 0) + 1,
+                check_count = COALESCE({self.table}.check_count, 0) + 1
+        """
+
+    def touch_sql(self):
+        # Nội dung không đổi / 304: chỉ cập nhật last_checked + validator mới (nếu có)
+        return f"""
+            UPDATE {self.table}
+            SET last_checked = ?, etag = COALESCE(?, etag), last_modified = COALESCE(?, last_modified),
+                check_count = COALESCE(check_count, 0) + 1
+            WHERE url = ?
+        """
+
+    def flush(self):
+        if not self.buffer:
+            return
+        batch = list(self.buffer.values())
+        self.buffer = {}
+        started = time.perf_counter()
+
+        existing = self.fetch_existing_hashes([item['url'] for item, _, _ in batch])
+        upserts = []
+        touches = []
+        for item, content_hash, now in batch:
+            validators = tuple(item.get(f) for f in self.validator_fields)
+            old_hash = existing.get(item['url'])
+            if content_hash is None or old_hash == content_hash:
+                if content_hash is None and old_hash is None:
+                    continue  # 304 cho url không còn trong DB
+                touches.append((now,) + validators + (item['url'],))
+                self.count("not_modified" if content_hash is None else "unchanged")
+                continue
+            if old_hash is None:
+                self.log_new(item)
+                self.count("new")
             else:
-                self.cur.execute("UPDATE jobs SET last_checked = ? WHERE url = ?", (now, item['url']))
+                self.log_update(item)
+                self.count("updated")
+            upserts.append((item['url'],) + tuple(item[f] for f in self.fields) + validators + (content_hash, now, now, now))
+
+        with self.con:
+            if upserts:
+                self.cur.executemany(self.upsert_query, upserts)
+            if touches:
+                self.cur.executemany(self.touch_query, touches)
+        self.last_flush = time.monotonic()
+        observe(self.stats, "metrics/db_write", time.perf_counter() - started)
+
+    def count(self, kind):
+        if self.stats is not None:
+            self.stats.inc_value(f"metrics/pipeline/{kind}")
+
+
+# --- PIPELINE CHO HUSTEDU (Lưu vào data.db) ---
+class MycrawlerPipeline(BatchedSqlitePipeline):
+    spider_name = "hustedu"
+    table = "news"  # HUSTEDU -> data.db (storage.DATABASES)
+    fields = ("title", "short")
+
+    def content_hash(self, item):
+        content_str = (item['title'] + item['short']).encode('utf-8')
+        return hashlib.md5(content_str).hexdigest()
+
+    def log_new(self, item):
+        print(f"--> [NEW] 🔥 Thêm mới: {item['title'][:30]}...")
+
+    def log_update(self, item):
+        print(f"--> [UPDATE] ♻️ Có sửa đổi: {item['title'][:30]}...")
+
+
+# --- PIPELINE CHO CAREERLINK (Lưu vào data1.db) ---
+class CareerlinkPipeline(BatchedSqlitePipeline):
+    spider_name = "careerlink"
+    table = "jobs"  # CAREERLINK -> data1.db (storage.DATABASES)
+    fields = ("title", "company", "location", "salary", "experience", "province_code", "district_code")
+    # dup_of (key tin gốc, vd "legacy:784509") do NearDupExtension ghi sau lượt crawl (neardup.py)
+
+    def content_hash(self, item):
+        content_str = f"{item['title']}{item['company']}{item['salary']}{item['location']}"
+        return hashlib.md5(content_str.encode('utf-8')).hexdigest()
+
+    def enrich(self, item):
+        # Không đưa vào content_hash: tin cũ chưa có mã được bổ sung bằng python -m mycrawler.gazetteer --db data1.db
+        location = normalize_location(item.get('location'))
+        item['province_code'] = location["province_code"] or None
+        item['district_code'] = location["district_code"] or None
+        return item
+
+    def log_new(self, item):
+        print(f"--> [NEW JOB] 🆕 {item['title']} ({item['company']})")
 
-        self.con.commit()
-        return item
\ No newline at end of file
+    def log_update(self, item):
+        print(f"--> [UPDATE] ♻️ Job thay đổi thông tin: {item['title']}")
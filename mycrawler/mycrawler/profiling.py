@@ -0,0 +1,281 @@
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+
+# --- PROFILE THEO YÊU CẦU CHO 1 LƯỢT CRAWL / 1 LẦN CHẠY SCRIPT DỮ LIỆU ---
+# Bật bằng biến môi trường MYCRAWLER_PROFILE (hoặc setting PROFILE, hoặc --profile của script):
+#   "1"        = sample (chi phí thấp, dùng được trên production)
+#   "all"      = sample,cprofile,memory
+#   memory làm chậm nhiều lần (mọi lần cấp phát đều bị ghi lại) -> chỉ bật khi tìm chỗ tốn RAM
+#   hoặc danh sách: "sample", "cprofile", "memory", "sample,memory", ...
+#   - sample  : luồng phụ lấy stack của thread đang chạy mỗi PROFILE_INTERVAL giây
+#               -> <tên>.<thời điểm>.collapsed (1 dòng "a;b;c số_mẫu", đọc bằng flamegraph.pl / speedscope)
+#   - cprofile: cProfile cho toàn lượt -> <tên>.<thời điểm>.prof (pstats / snakeviz), top hàm in ra log
+#   - memory  : tracemalloc, so snapshot đầu / cuối lượt -> top PROFILE_TOP chỗ cấp phát in ra log,
+#               snapshot cuối ghi ra <tên>.<thời điểm>.tracemalloc (so sánh giữa 2 lượt bằng tracemalloc).
+#               Mặc định chỉ giữ 1 frame mỗi lần cấp phát (đủ cho top theo dòng code); cần traceback sâu hơn
+#               thì đặt MYCRAWLER_PROFILE_FRAMES / PROFILE_MEMORY_FRAMES (càng sâu càng chậm)
+# File ghi vào MYCRAWLER_PROFILE_DIR / PROFILE_DIR (mặc định ./profiles).
+# Chỉ profile thread gọi start() (reactor của Scrapy / thread chính của script); process con của
+# --workers không được profile.
+ENV_VAR = "MYCRAWLER_PROFILE"
+DIR_ENV_VAR = "MYCRAWLER_PROFILE_DIR"
+FRAMES_ENV_VAR = "MYCRAWLER_PROFILE_FRAMES"
+MODES = ("sample", "cprofile", "memory")
+DEFAULT_MODES = ("sample",)
+DEFAULT_MEMORY_FRAMES = 1
+DEFAULT_DIR = "profiles"
+DEFAULT_INTERVAL = 0.005
+TOP_N = 20
+
+
+def parse_modes(value):
+    value = (value or "").strip().lower()
+    if value in ("", "0", "false", "off"):
+        return set()
+    if value in ("1", "true", "on"):
+        return set(DEFAULT_MODES)
+    if value == "all":
+        return set(MODES)
+    modes = {mode.strip() for mode in value.split(",") if mode.strip()}
+    unknown = modes - set(MODES)
+    if unknown:
+        raise ValueError(f"Không hỗ trợ profile '{', '.join(sorted(unknown))}' (sample / cprofile / memory / all)")
+    return modes
+
+
+def _frame_label(code):
+    name = getattr(code, "co_qualname", code.co_name)
+    return f"{name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    # Lấy mẫu stack của 1 thread bằng sys._current_frames(); đếm theo stack đầy đủ (collapsed)
+    def __init__(self, thread_id, interval=DEFAULT_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def _run(self):
+        labels = {}
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                label = labels.get(code)
+                if label is None:
+                    label = labels[code] = _frame_label(code)
+                stack.append(label)
+                frame = frame.f_back
+            self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+
+    def write(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+    def top_frames(self, n):
+        # Hàm đang chạy (đỉnh stack) chiếm nhiều mẫu nhất
+        leaves = Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        return leaves.most_common(n)
+
+
+# tracemalloc là toàn process: nhiều lượt chạy chồng nhau (scheduler thường trú) dùng chung 1 lần bật
+_TRACEMALLOC_USERS = 0
+_TRACEMALLOC_LOCK = threading.Lock()
+_MEMORY_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, cProfile.__file__),
+    tracemalloc.Filter(False, pstats.__file__),
+    tracemalloc.Filter(False, __file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+def _start_tracemalloc(frames):
+    global _TRACEMALLOC_USERS
+    with _TRACEMALLOC_LOCK:
+        if _TRACEMALLOC_USERS == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+        _TRACEMALLOC_USERS += 1
+
+
+def _stop_tracemalloc():
+    global _TRACEMALLOC_USERS
+    with _TRACEMALLOC_LOCK:
+        _TRACEMALLOC_USERS -= 1
+        if _TRACEMALLOC_USERS == 0:
+            tracemalloc.stop()
+
+
+class RunProfiler:
+    def __init__(self, name, modes, out_dir=None, interval=DEFAULT_INTERVAL, top=TOP_N, frames=None):
+        self.name = name
+        self.modes = set(modes)
+        self.out_dir = out_dir or os.environ.get(DIR_ENV_VAR) or DEFAULT_DIR
+        self.interval = interval
+        self.top = top
+        self.frames = frames or int(os.environ.get(FRAMES_ENV_VAR) or DEFAULT_MEMORY_FRAMES)
+        self.sampler = None
+        self.cprofile = None
+        self.memory_before = None
+
+    def path(self, ext):
+        return os.path.join(self.out_dir, f"{self.name}.{self.stamp}.{ext}")
+
+    def start(self):
+        os.makedirs(self.out_dir, exist_ok=True)
+        self.stamp = datetime.now().strftime("%Y%m%dT%H%M%S")
+        self.started = time.perf_counter()
+        if "memory" in self.modes:
+            _start_tracemalloc(self.frames)
+            self.memory_before = tracemalloc.take_snapshot().filter_traces(_MEMORY_FILTERS)
+        if "cprofile" in self.modes:
+            self.cprofile = cProfile.Profile()
+            try:
+                self.cprofile.enable()
+            except ValueError as e:
+                # Đã có profiler khác đang bật (vd 2 spider chạy cùng lúc trong scheduler)
+                print(f"⚠️ [PROFILE] {self.name}: bỏ qua cProfile ({e})")
+                self.cprofile = None
+        if "sample" in self.modes:
+            self.sampler = StackSampler(threading.get_ident(), self.interval)
+            self.sampler.start()
+        print(f"➤ [PROFILE] {self.name}: bật {', '.join(sorted(self.modes))} -> {self.out_dir}")
+        return self
+
+    def stop(self):
+        # Dừng mọi thứ và chụp snapshot bộ nhớ trước, rồi mới tạo báo cáo (không tính cấp phát của báo cáo)
+        elapsed = time.perf_counter() - self.started
+        if self.sampler is not None:
+            self.sampler.stop()
+        if self.cprofile is not None:
+            self.cprofile.disable()
+        snapshot = None
+        if self.memory_before is not None:
+            snapshot = tracemalloc.take_snapshot().filter_traces(_MEMORY_FILTERS)
+            current, peak = tracemalloc.get_traced_memory()
+            _stop_tracemalloc()
+
+        lines = [f"📊 [PROFILE] {self.name}: {elapsed:.2f}s"]
+        if self.sampler is not None:
+            path = self.path("collapsed")
+            self.sampler.write(path)
+            lines.append(f"  sample: {self.sampler.samples} mẫu, {len(self.sampler.stacks)} stack -> {path}")
+            for label, count in self.sampler.top_frames(self.top):
+                lines.append(f"    {count / max(self.sampler.samples, 1):6.1%}  {label}")
+        if self.cprofile is not None:
+            path = self.path("prof")
+            self.cprofile.dump_stats(path)
+            out = io.StringIO()
+            pstats.Stats(self.cprofile, stream=out).sort_stats("cumulative").print_stats(self.top)
+            lines.append(f"  cprofile -> {path}")
+            lines.extend("    " + line for line in out.getvalue().strip().splitlines()[-self.top - 1:])
+        if snapshot is not None:
+            path = self.path("tracemalloc")
+            snapshot.dump(path)
+            lines.append(f"  memory: hiện {current / (1 << 20):.1f} MB, đỉnh {peak / (1 << 20):.1f} MB -> {path}")
+            lines.append(f"  top {self.top} chỗ cấp phát (tăng trong lượt):")
+            for stat in snapshot.compare_to(self.memory_before, "lineno")[:self.top]:
+                frame = stat.traceback[0]
+                lines.append(f"    {stat.size_diff / 1024:+10.1f} KiB {stat.count_diff:+8d} khối  "
+                             f"{frame.filename}:{frame.lineno}")
+            self.memory_before = None
+        print("\n".join(lines))
+
+
+class profile_run:
+    # with profile_run("job_pipeline"): ...  -> không làm gì nếu MYCRAWLER_PROFILE không bật
+    def __init__(self, name, modes=None, **kwargs):
+        self.modes = parse_modes(os.environ.get(ENV_VAR, "") if modes is None else modes)
+        self.profiler = RunProfiler(name, self.modes, **kwargs) if self.modes else None
+
+    def __enter__(self):
+        if self.profiler is not None:
+            self.profiler.start()
+        return self.profiler
+
+    def __exit__(self, *exc):
+        if self.profiler is not None:
+            self.profiler.stop()
+        return False
+
+
+def profiled(fn, name):
+    # Bọc 1 hàm (vd export chạy trong thread của scheduler) để mỗi lần gọi được profile riêng
+    def wrapper(*args, **kwargs):
+        with profile_run(name):
+            return fn(*args, **kwargs)
+    return wrapper
+
+
+def profile_main(name, main):
+    # Điểm vào chung cho script dữ liệu: "--profile" / "--profile=sample,memory" được gỡ khỏi
+    # sys.argv (argparse của script không cần biết) và ghi vào MYCRAWLER_PROFILE
+    for arg in list(sys.argv[1:]):
+        if arg == "--profile" or arg.startswith("--profile="):
+            sys.argv.remove(arg)
+            os.environ[ENV_VAR] = arg.partition("=")[2] or "1"
+    with profile_run(name):
+        return main()
+
+
+class ProfilingExtension:
+    # Profile từng lượt crawl: spider_opened -> spider_closed (mỗi spider 1 bộ file)
+    def __init__(self, modes, out_dir, interval, top, frames=None):
+        self.modes = modes
+        self.out_dir = out_dir
+        self.interval = interval
+        self.top = top
+        self.frames = frames
+        self.profilers = {}
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        # Import scrapy ở đây: script dữ liệu dùng module này không cần cài scrapy
+        from scrapy import signals
+        from scrapy.exceptions import NotConfigured
+
+        settings = crawler.settings
+        modes = parse_modes(settings.get("PROFILE") or os.environ.get(ENV_VAR, ""))
+        if not modes:
+            raise NotConfigured
+        ext = cls(modes, settings.get("PROFILE_DIR"), settings.getfloat("PROFILE_INTERVAL", DEFAULT_INTERVAL),
+                  settings.getint("PROFILE_TOP", TOP_N), settings.getint("PROFILE_MEMORY_FRAMES", 0) or None)
+        crawler.signals.connect(ext.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(ext.spider_closed, signal=signals.spider_closed)
+        return ext
+
+    def spider_opened(self, spider):
+        self.profilers[spider.name] = RunProfiler(spider.name, self.modes, self.out_dir, self.interval, self.top,
+                                                  self.frames).start()
+
+    def spider_closed(self, spider, reason):
+        profiler = self.profilers.pop(spider.name, None)
+        if profiler is not None:
+            profiler.stop()
@@ -0,0 +1,48 @@
+import math
+from datetime import datetime
+
+# --- CHỌN URL KIỂM TRA LẠI THEO XÁC SUẤT ĐÃ THAY ĐỔI ---
+# Pipeline lưu cho mỗi url: first_seen, change_count (số lần content_hash đổi), check_count.
+# Tốc độ thay đổi ước lượng (Gamma-Poisson, có prior để url mới không bị 0):
+#     rate = (change_count + PRIOR_CHANGES) / (số giờ theo dõi + PRIOR_HOURS)
+# Xác suất đã thay đổi kể từ lần kiểm tra cuối:
+#     p = 1 - exp(-rate * số giờ kể từ last_checked)
+# Mỗi chu kỳ lấy tối đa `budget` url có p cao nhất, bỏ qua url có p < min_probability
+# -> tin không bao giờ đổi sẽ ít bị tải lại.
+# p đồng biến theo x = rate * số giờ nên lọc + lấy top `budget` theo x ngay trong SQLite
+# (ORDER BY ... LIMIT chỉ giữ `budget` dòng khi sort), không đưa từng dòng lên Python.
+PRIOR_CHANGES = 1.0
+PRIOR_HOURS = 24.0 * 7   # Prior: ~1 lần thay đổi / tuần
+
+
+def change_probability(change_count, hours_observed, hours_since_check):
+    rate = (change_count + PRIOR_CHANGES) / (max(hours_observed, 0.0) + PRIOR_HOURS)
+    return 1.0 - math.exp(-rate * max(hours_since_check, 0.0))
+
+
+def select_rechecks(cur, table, budget, min_probability=0.0, now=None):
+    # Trả về [(xác suất, url, etag, last_modified)] theo thứ tự xác suất giảm dần
+    if budget <= 0:
+        return []
+    now = str(now or datetime.now())
+    min_x = -math.log1p(-min(min_probability, 1.0 - 1e-12))
+    rate = f"(change_count + {PRIOR_CHANGES!r}) / (hours_observed + {PRIOR_HOURS!r})"
+    cur.execute(f"""
+        SELECT url, etag, last_modified, change_count, hours_observed, hours_since_check
+        FROM (
+            SELECT url, etag, last_modified, COALESCE(change_count, 0) AS change_count,
+                   MAX(COALESCE((julianday(?) - julianday(COALESCE(first_seen, last_updated, last_checked))) * 24, 0), 0) AS hours_observed,
+                   MAX(COALESCE((julianday(?) - julianday(last_checked)) * 24, 0), 0) AS hours_since_check
+            FROM {table}
+        )
+        WHERE {rate} * hours_since_check >= ?
+        ORDER BY {rate} * hours_since_check DESC, url DESC
+        LIMIT ?
+    """, (now, now, min_x * (1 - 1e-9), budget))
+
+    result = []
+    for url, etag, last_modified, change_count, hours_observed, hours_since_check in cur.fetchall():
+        p = change_probability(change_count, hours_observed, hours_since_check)
+        if p >= min_probability:
+            result.append((p, url, etag, last_modified))
+    return sorted(result, reverse=True)
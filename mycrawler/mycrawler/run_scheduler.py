@@ -1,52 +1,191 @@
 import time
 import subprocess
 import sys
-import sqlite3
 import json
 from datetime import datetime
 import os
 
+# Chạy trực tiếp "python run_scheduler.py" trong thư mục này: thêm thư mục project để import package mycrawler
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from mycrawler import storage  # noqa: E402
+from mycrawler.distributed import ENV_VAR as DISTRIBUTED_ENV_VAR, DistributedError, open_backend  # noqa: E402
+from mycrawler.profiling import ENV_VAR as PROFILE_ENV_VAR, parse_modes, profiled  # noqa: E402
+from mycrawler.shards import ShardedNdjsonWriter, check_compression  # noqa: E402
+
+# Export đọc qua kết nối chỉ đọc riêng (storage.read_connection): DB ở chế độ WAL nên
+# crawler vẫn ghi bình thường trong lúc xuất; ORDER BY last_updated dùng index, không sort cả bảng.
+
+def _publish_json(json_path, data):
+    # Ghi ra file tạm rồi rename -> backend / người đọc không bao giờ thấy jobs.json ghi dở
+    tmp_path = json_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=4)
+    os.replace(tmp_path, json_path)
+
 # Hàm xuất tin tức (HustEdu) - Lấy từ data.db
 def export_news_to_json():
-    db_path = 'data.db' # <--- SỬA LẠI THÀNH data.db
     json_path = 'news.json'
-    if not os.path.exists(db_path): 
-        # print("⚠️ Chưa có data.db (Tin tức)") 
+    con = storage.read_connection('news')
+    if con is None:
+        # print("⚠️ Chưa có data.db (Tin tức)")
         return
     try:
-        con = sqlite3.connect(db_path)
-        con.row_factory = sqlite3.Row 
         cur = con.cursor()
         cur.execute("SELECT * FROM news ORDER BY last_updated DESC")
         data = [dict(row) for row in cur.fetchall()]
-        with open(json_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=4)
+        _publish_json(json_path, data)
         print(f"✅ [NEWS] Đã xuất {len(data)} tin tức ra 'news.json'")
-        con.close()
     except Exception: pass
+    finally:
+        con.close()
 
 # Hàm xuất việc làm (CareerLink) - Lấy từ data1.db
 def export_jobs_to_json():
-    db_path = 'data1.db' # CareerLink dùng data1.db -> Đúng
     json_path = 'jobs.json'
-    if not os.path.exists(db_path): 
+    con = storage.read_connection('jobs')
+    if con is None:
         print("⚠️ Chưa có data1.db (Việc làm)")
         return
     try:
-        con = sqlite3.connect(db_path)
-        con.row_factory = sqlite3.Row 
         cur = con.cursor()
         
         cur.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='jobs';")
         if cur.fetchone():
             cur.execute("SELECT * FROM jobs ORDER BY last_updated DESC")
             data = [dict(row) for row in cur.fetchall()]
-            with open(json_path, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=4)
+            _publish_json(json_path, data)
             print(f"✅ [JOBS] Đã xuất {len(data)} việc làm ra 'jobs.json'")
-        con.close()
     except Exception as e: 
         print(f"❌ Lỗi xuất Jobs: {e}")
+    finally:
+        con.close()
+
+# --- XUẤT DELTA (chỉ ghi các dòng mới / thay đổi) ---
+# Giữ mốc change_seq lớn nhất đã xuất (high-water mark) trong file state,
+# mỗi chu kỳ chỉ append các dòng có change_seq > mốc vào change log NDJSON.
+# Không dùng last_updated: đó là giờ nhận item, lô ghi trễ (nhiều worker cùng ghi 1 DB) có thể mang
+# giờ sớm hơn mốc đã xuất và bị bỏ sót; change_seq được gán lúc commit (storage.py).
+# Thỉnh thoảng gộp lại thành 1 snapshot NDJSON đầy đủ và làm rỗng change log.
+# Các dòng được đọc dần từ cursor (fetchmany), không nạp cả bảng vào list.
+SNAPSHOT_EVERY = 60                     # Số lần xuất delta giữa 2 snapshot
+SNAPSHOT_MAX_BYTES = 64 * 1024 * 1024   # Change log lớn hơn mức này -> snapshot luôn
+FETCH_SIZE = 1000
+
+def _load_state(state_path):
+    if os.path.exists(state_path):
+        with open(state_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return {"seq": None, "deltas_since_snapshot": 0}
+
+def _save_state(state_path, state):
+    tmp_path = state_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False)
+    os.replace(tmp_path, state_path)
+
+def _stream_rows(cur, query, params=()):
+    cur.execute(query, params)
+    while True:
+        rows = cur.fetchmany(FETCH_SIZE)
+        if not rows:
+            break
+        for row in rows:
+            yield dict(row)
+
+def _write_ndjson(f, rows):
+    count = 0
+    high_water = None
+    for row in rows:
+        f.write(json.dumps(row, ensure_ascii=False, default=str) + "\n")
+        count += 1
+        if row.get('change_seq') is not None:
+            high_water = max(high_water or 0, row['change_seq'])
+    return count, high_water
+
+def export_table_delta(table, prefix):
+    # prefix='jobs' -> jobs.changes.ndjson, jobs.snapshot.ndjson, jobs.export_state.json
+    changes_path = f'{prefix}.changes.ndjson'
+    snapshot_path = f'{prefix}.snapshot.ndjson'
+    state_path = f'{prefix}.export_state.json'
+    con = storage.read_connection(table)
+    if con is None:
+        print(f"⚠️ Chưa có {storage.db_path(table)}")
+        return
+
+    cur = con.cursor()
+    try:
+        cur.execute("SELECT name FROM sqlite_master WHERE type='table' AND name=?;", (table,))
+        if not cur.fetchone():
+            return
+
+        state = _load_state(state_path)
+        changes_size = os.path.getsize(changes_path) if os.path.exists(changes_path) else 0
+        # State cũ (mốc last_updated) -> snapshot lại 1 lần rồi chuyển sang mốc change_seq
+        need_snapshot = (state.get("seq") is None
+                         or state["deltas_since_snapshot"] >= SNAPSHOT_EVERY
+                         or changes_size >= SNAPSHOT_MAX_BYTES)
+
+        if need_snapshot:
+            # Ghi snapshot ra file tạm rồi rename -> người đọc không thấy file ghi dở
+            tmp_path = snapshot_path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                count, high_water = _write_ndjson(f, _stream_rows(cur, f"SELECT * FROM {table}"))
+            os.replace(tmp_path, snapshot_path)
+            open(changes_path, 'w', encoding='utf-8').close()
+            state = {"seq": high_water or 0, "deltas_since_snapshot": 0}
+            print(f"✅ [{table.upper()}] Snapshot {count} dòng ra '{snapshot_path}'")
+        else:
+            with open(changes_path, 'a', encoding='utf-8') as f:
+                count, high_water = _write_ndjson(f, _stream_rows(
+                    cur, f"SELECT * FROM {table} WHERE change_seq > ? ORDER BY change_seq ASC",
+                    (state["seq"],)))
+            if high_water:
+                state["seq"] = high_water
+            state["deltas_since_snapshot"] += 1
+            print(f"✅ [{table.upper()}] Delta: {count} dòng mới/thay đổi -> '{changes_path}'")
+
+        _save_state(state_path, state)
+    except Exception as e:
+        print(f"❌ Lỗi xuất delta {table}: {e}")
+    finally:
+        con.close()
+
+def export_jobs_delta():
+    export_table_delta('jobs', 'jobs')
+
+def export_news_delta():
+    export_table_delta('news', 'news')
+
+# --- XUẤT THEO SHARD NÉN (shards.py) ---
+# NDJSON nén theo luồng từ cursor, chia shard theo kích thước, manifest có số dòng + sha256;
+# shard và manifest được publish bằng tmp + rename. Thư mục / kiểu nén / cỡ shard đổi bằng biến môi trường.
+EXPORT_DIR = os.environ.get("EXPORT_DIR", "exports")
+EXPORT_COMPRESSION = os.environ.get("EXPORT_COMPRESSION", "gzip")   # gzip / zstd / none
+EXPORT_SHARD_MB = float(os.environ.get("EXPORT_SHARD_MB", "64"))
+
+def export_table_sharded(table, prefix):
+    con = storage.read_connection(table)
+    if con is None:
+        print(f"⚠️ Chưa có {storage.db_path(table)}")
+        return
+    writer = ShardedNdjsonWriter(EXPORT_DIR, prefix, EXPORT_COMPRESSION, int(EXPORT_SHARD_MB * (1 << 20)))
+    try:
+        for row in _stream_rows(con.cursor(), f"SELECT * FROM {table} ORDER BY last_updated DESC"):
+            writer.write(row)
+        manifest = writer.close()
+        print(f"✅ [{table.upper()}] Đã xuất {manifest['rows']} dòng, {len(manifest['shards'])} shard "
+              f"({manifest['compressed_bytes'] / (1 << 20):.1f} MB {manifest['compression']}) -> '{writer.path}'")
+    except Exception as e:
+        writer.abort()
+        print(f"❌ Lỗi xuất shard {table}: {e}")
+    finally:
+        con.close()
+
+def export_jobs_sharded():
+    export_table_sharded('jobs', 'jobs')
+
+def export_news_sharded():
+    export_table_sharded('news', 'news')
 
 def run_crawler():
     print(f"\n[{datetime.now()}] ➤ Chạy Crawler CareerLink ...")
@@ -56,13 +195,147 @@ def run_crawler():
     subprocess.run(command)
     
     print("➤ Đang đồng bộ dữ liệu sang JSON...")
-    # export_news_to_json() # Bỏ comment nếu muốn xuất cả tin tức (cần data.db có sẵn)
-    export_jobs_to_json()   # Xuất việc làm từ data1.db
+    # export_for("hustedu")() # Bỏ comment nếu muốn xuất cả tin tức (cần data.db có sẵn)
+    export_for("careerlink")()  # Xuất việc làm từ data1.db (full hoặc delta theo EXPORT_MODE)
 
-if __name__ == "__main__":
-    SLEEP_TIME = 60 
+# "full": ghi lại toàn bộ jobs.json mỗi chu kỳ (như cũ), "delta": change log + snapshot,
+# "sharded": NDJSON nén theo shard + manifest trong EXPORT_DIR
+EXPORT_MODE = os.environ.get("EXPORT_MODE", "full")
+EXPORTERS = {
+    "careerlink": {"full": export_jobs_to_json, "delta": export_jobs_delta, "sharded": export_jobs_sharded},
+    "hustedu": {"full": export_news_to_json, "delta": export_news_delta, "sharded": export_news_sharded},
+}
+
+def export_for(spider_name):
+    # Bật MYCRAWLER_PROFILE: mỗi lần xuất cũng được profile riêng (export_<spider>.*)
+    return profiled(EXPORTERS[spider_name][EXPORT_MODE], f"export_{spider_name}")
+
+
+# --- SCHEDULER THƯỜNG TRÚ ---
+# Chỉ khởi động Python + Scrapy + reactor 1 lần, mỗi spider chạy theo chu kỳ riêng (LoopingCall).
+# Spider đang chạy thì lượt kế tiếp bị bỏ qua (không chồng lượt). Xuất JSON chạy trong thread
+# sau khi crawl xong, không chặn reactor / các spider khác.
+SPIDER_INTERVALS = {
+    "careerlink": 60,
+    "hustedu": 300,
+}
+
+class ResidentScheduler:
+    def __init__(self, intervals):
+        from scrapy.crawler import CrawlerRunner
+        from scrapy.utils.project import get_project_settings
+
+        self.intervals = intervals
+        settings = get_project_settings()
+        self.runner = CrawlerRunner(settings)
+        self.metrics_db = storage.setting_db_path(settings, "METRICS_DB", "metrics.db")
+        self.running = set()
+        self.exporting = set()
+        self.loops = []
+
+    def start(self):
+        from twisted.internet import task
+
+        for name, interval in self.intervals.items():
+            loop = task.LoopingCall(self.run_spider, name)
+            loop.start(interval, now=True)
+            self.loops.append(loop)
+            print(f"➤ Lên lịch '{name}' mỗi {interval} giây")
+
+    def run_spider(self, name):
+        if name in self.running:
+            print(f"[{datetime.now()}] ⏭️ '{name}' vẫn đang chạy, bỏ qua lượt này")
+            return
+        print(f"\n[{datetime.now()}] ➤ Chạy Crawler {name} ...")
+        self.running.add(name)
+        d = self.runner.crawl(name)
+        d.addBoth(self.crawl_finished, name)
+        # Không trả về d -> LoopingCall không chờ crawl xong
+
+    def crawl_finished(self, result, name):
+        from twisted.internet import threads
+        from twisted.python.failure import Failure
+
+        from mycrawler.metrics import summarize_metrics
+
+        self.running.discard(name)
+        if isinstance(result, Failure):
+            print(f"❌ Crawler {name} lỗi: {result.getErrorMessage()}")
+        else:
+            summarize_metrics(self.metrics_db, name, last=1)
+        if name in self.exporting:
+            return
+        print(f"➤ [{name}] Đang đồng bộ dữ liệu sang JSON...")
+        self.exporting.add(name)
+        d = threads.deferToThread(export_for(name))
+        d.addErrback(lambda f: print(f"❌ Lỗi xuất {name}: {f.getErrorMessage()}"))
+        d.addBoth(lambda _: self.exporting.discard(name))
+
+
+def run_resident(intervals):
+    from scrapy.utils.log import configure_logging
+    from scrapy.utils.reactor import install_reactor
+
+    install_reactor("twisted.internet.asyncioreactor.AsyncioSelectorReactor")
+    from twisted.internet import reactor
+
+    configure_logging()
+    ResidentScheduler(intervals).start()
+    reactor.run()
+
+
+def run_subprocess_loop(sleep_time=60):
+    # Chế độ cũ: mỗi chu kỳ chạy "scrapy crawl careerlink" trong process mới
     while True:
         run_crawler()
-        print(f"Đang nghỉ {SLEEP_TIME} giây...")
+        print(f"Đang nghỉ {sleep_time} giây...")
         print("="*60)
-        time.sleep(SLEEP_TIME)
\ No newline at end of file
+        time.sleep(sleep_time)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Chạy crawler theo chu kỳ và xuất dữ liệu")
+    parser.add_argument("--delta", action="store_true", help="Xuất delta (change log + snapshot) thay vì ghi lại toàn bộ JSON")
+    parser.add_argument("--sharded", action="store_true", help="Xuất NDJSON nén theo shard + manifest (thư mục EXPORT_DIR)")
+    parser.add_argument("--subprocess", action="store_true", help="Chế độ cũ: scrapy crawl trong subprocess + sleep")
+    parser.add_argument("--profile", nargs="?", const="1", metavar="MODES",
+                        help="Profile từng lượt crawl + xuất: sample,cprofile,memory (mặc định sample), xem profiling.py")
+    parser.add_argument("--distributed", nargs="?", const="sqlite", metavar="BACKEND",
+                        help="Làm 1 worker của hàng đợi chung: sqlite (mặc định, nhiều process 1 máy) / redis://host:port/db, xem distributed.py")
+    parser.add_argument("--careerlink-interval", type=int, default=SPIDER_INTERVALS["careerlink"], help="Chu kỳ careerlink (giây), 0 = tắt")
+    parser.add_argument("--hustedu-interval", type=int, default=SPIDER_INTERVALS["hustedu"], help="Chu kỳ hustedu (giây), 0 = tắt")
+    args = parser.parse_args()
+
+    if args.delta:
+        EXPORT_MODE = "delta"
+    elif args.sharded:
+        EXPORT_MODE = "sharded"
+    if EXPORT_MODE == "sharded":
+        try:
+            check_compression(EXPORT_COMPRESSION)
+        except ValueError as e:
+            parser.error(f"EXPORT_COMPRESSION={EXPORT_COMPRESSION}: {e}")
+    if args.profile:
+        # Qua biến môi trường: subprocess "scrapy crawl" và ProfilingExtension của scheduler thường trú đều đọc được
+        try:
+            parse_modes(args.profile)
+        except ValueError as e:
+            parser.error(str(e))
+        os.environ[PROFILE_ENV_VAR] = args.profile
+    if args.distributed:
+        # Kiểm tra backend trước khi lên lịch; subprocess / scheduler thường trú đọc biến môi trường
+        try:
+            backend = open_backend(args.distributed)
+            backend.pending("careerlink")
+            backend.close()
+        except (ValueError, OSError, DistributedError) as e:
+            parser.error(f"--distributed {args.distributed}: {e}")
+        os.environ[DISTRIBUTED_ENV_VAR] = args.distributed
+
+    if args.subprocess:
+        run_subprocess_loop(args.careerlink_interval or 60)
+    else:
+        intervals = {"careerlink": args.careerlink_interval, "hustedu": args.hustedu_interval}
+        run_resident({name: sec for name, sec in intervals.items() if sec > 0})
@@ -23,8 +23,8 @@ ROBOTSTXT_OBEY = False
 
 # Concurrency and throttling settings
 #CONCURRENT_REQUESTS = 16
-CONCURRENT_REQUESTS_PER_DOMAIN = 1
-DOWNLOAD_DELAY = 1
+#CONCURRENT_REQUESTS_PER_DOMAIN = 1
+#DOWNLOAD_DELAY = 1  # (xem "Cấu hình mạng" bên dưới)
 
 # Disable cookies (enabled by default)
 #COOKIES_ENABLED = False
@@ -90,6 +90,95 @@ ITEM_PIPELINES = {
    "mycrawler.pipelines.MycrawlerPipeline": 300,
 }
 
-# Cấu hình mạng
-CONCURRENT_REQUESTS = 1
-DOWNLOAD_DELAY = 2
\ No newline at end of file
+# Cấu hình mạng: CONCURRENT_REQUESTS là trần chung; concurrency / delay của từng domain do
+# AdaptiveConcurrencyMiddleware tự chỉnh (AIMD, xem mycrawler/throttle.py), bắt đầu từ
+# CONCURRENT_REQUESTS_PER_DOMAIN / DOWNLOAD_DELAY khi domain chưa có giới hạn đã học
+CONCURRENT_REQUESTS = 16
+CONCURRENT_REQUESTS_PER_DOMAIN = 1
+DOWNLOAD_DELAY = 2
+
+ADAPTIVE_ENABLED = True
+ADAPTIVE_MIN_CONCURRENCY = 1
+ADAPTIVE_MAX_CONCURRENCY = 8
+ADAPTIVE_MIN_DELAY = 0.5
+ADAPTIVE_MAX_DELAY = 60
+ADAPTIVE_RATE_STEP = 0.5        # req/s cộng thêm mỗi cửa sổ tốt
+ADAPTIVE_TARGET_LATENCY = 3.0   # giây, độ trễ TB trong 1 cửa sổ
+ADAPTIVE_MAX_ERROR_RATE = 0.05  # tỉ lệ 429 / 5xx / 403 / trang chặn / lỗi tải
+ADAPTIVE_WINDOW = 10            # số response mỗi lần đánh giá
+ADAPTIVE_WINDOW_SECONDS = 10.0  # hoặc hết số giây này (domain đang chậm)
+ADAPTIVE_COOLDOWN = 10.0        # giây giữa 2 lần giảm
+ADAPTIVE_DEBUG = False          # in cả các lần tăng
+ADAPTIVE_BAN_MARKERS = ["captcha", "cf-chl", "challenge-platform", "access denied", "too many requests"]
+#ADAPTIVE_DB = "metrics.db"     # mặc định dùng chung METRICS_DB (bảng domain_limits)
+
+# Thư mục chứa data.db (news) / data1.db (jobs), xem mycrawler/storage.py; mặc định là thư mục
+# package mycrawler, hoặc biến môi trường MYCRAWLER_DB_DIR
+#CRAWL_DB_DIR = "/var/lib/mycrawler"
+
+# Ghi DB theo lô trong pipeline: flush khi đủ số item hoặc quá số giây
+PIPELINE_BATCH_SIZE = 50
+PIPELINE_FLUSH_INTERVAL = 5.0
+
+# Index url chống trùng trong RAM: "set" (chính xác) hoặc "bloom" (ít RAM, cho bảng rất lớn)
+DEDUP_INDEX_MODE = "set"
+DEDUP_BLOOM_ERROR_RATE = 0.001
+
+# Conditional GET (ETag / Last-Modified) cho các request kiểm tra lại job / bài cũ
+DOWNLOADER_MIDDLEWARES = {
+    "mycrawler.middlewares.ConditionalGetDownloaderMiddleware": 560,
+    "mycrawler.distributed.GlobalRateLimitMiddleware": 940,   # Chỉ bật ở chế độ phân tán (DISTRIBUTED)
+    "mycrawler.throttle.AdaptiveConcurrencyMiddleware": 950,  # Sát downloader: thấy 429 / 5xx trước RetryMiddleware
+}
+SPIDER_MIDDLEWARES = {
+    "mycrawler.middlewares.ConditionalGetSpiderMiddleware": 543,
+    "mycrawler.metrics.CallbackTimingMiddleware": 950,  # Sát spider -> chỉ đo thời gian callback
+}
+
+# Phân trang CareerLink: dừng khi PAGINATION_STOP_AFTER trang liên tiếp không có job mới
+# (0 = không dừng sớm), tối đa PAGINATION_MAX_PAGES trang mỗi lượt
+PAGINATION_STOP_AFTER = 2
+PAGINATION_MAX_PAGES = 50
+
+# Frontier HustEdu (frontier.py): url còn dở / lỗi được chạy lại tối đa FRONTIER_MAX_ATTEMPTS lượt
+FRONTIER_MAX_ATTEMPTS = 3
+
+# Recheck thích nghi: mỗi lượt tối đa RECHECK_BUDGET url (mặc định = BATCH_SIZE của spider),
+# chỉ lấy url có xác suất đã thay đổi >= RECHECK_MIN_PROBABILITY
+#RECHECK_BUDGET = 30
+RECHECK_MIN_PROBABILITY = 0.05
+
+# Số đo thông lượng / độ trễ mỗi lượt crawl (xem: python -m mycrawler.metrics)
+EXTENSIONS = {
+    "mycrawler.neardup.NearDupExtension": 490,  # trước CrawlMetrics để số đo metrics/neardup/* vào crawl_runs
+    "mycrawler.metrics.CrawlMetricsExtension": 500,
+    "mycrawler.profiling.ProfilingExtension": 510,
+}
+METRICS_DB = "metrics.db"  # tên tương đối -> cùng thư mục với data.db (storage.db_dir)
+
+# Profile 1 lượt crawl (mycrawler/profiling.py): tắt nếu không đặt PROFILE và biến môi trường MYCRAWLER_PROFILE
+# vd: scrapy crawl careerlink -s PROFILE=sample,memory   hoặc   MYCRAWLER_PROFILE=1 python run_scheduler.py
+#PROFILE = "sample,memory"
+#PROFILE_DIR = "profiles"
+#PROFILE_INTERVAL = 0.005
+#PROFILE_TOP = 20
+#PROFILE_MEMORY_FRAMES = 1         # số frame tracemalloc giữ cho mỗi lần cấp phát (memory)
+
+# Chế độ phân tán (mycrawler/distributed.py): nhiều worker "scrapy crawl" (1 hoặc nhiều máy) dùng chung
+# hàng đợi request + tập chống trùng. Tắt nếu không đặt DISTRIBUTED và biến môi trường MYCRAWLER_DISTRIBUTED
+# (SCHEDULER khi đó trả về scheduler mặc định của Scrapy)
+# vd: scrapy crawl careerlink -s DISTRIBUTED=sqlite   hoặc   python run_scheduler.py --distributed redis://10.0.0.5:6379/0
+SCHEDULER = "mycrawler.distributed.DistributedScheduler"
+#DISTRIBUTED = "sqlite"            # sqlite / sqlite:///file.db (1 máy) hoặc redis://host:port/db (nhiều máy)
+DISTRIBUTED_LEASE = 300            # giây; worker chết -> request quay lại hàng đợi sau chừng này
+DISTRIBUTED_DOMAIN_RATE = 0.5      # req/s mỗi domain, tính chung cho mọi worker
+DISTRIBUTED_RATE_WINDOW = 10       # giây; ngân sách = rate x window request mỗi cửa sổ
+DISTRIBUTED_POLL_INTERVAL = 1.0    # giây; worker rảnh hỏi lại hàng đợi chung
+#DISTRIBUTED_PREFIX = "mycrawler"  # tiền tố key Redis
+
+# Dò tin trùng gần đúng giữa các nguồn (MinHash + LSH, xem mycrawler/neardup.py): chạy khi spider đóng,
+# trên các tin mới / đổi nội dung của lượt (không chặn ghi DB của pipeline)
+NEARDUP_ENABLED = True
+NEARDUP_SPIDERS = {"careerlink": "jobs"}  # spider -> bảng có cột dup_of
+NEARDUP_DB = "neardup.db"  # tên tương đối -> cùng thư mục với data.db (storage.db_dir)
+NEARDUP_THRESHOLD = 0.8
@@ -0,0 +1,266 @@
+import glob
+import gzip
+import hashlib
+import importlib
+import io
+import json
+import os
+from datetime import datetime
+
+# --- XUẤT NDJSON THEO SHARD NÉN + MANIFEST (publish nguyên tử) ---
+# 1 file jobs.json lớn, ghi đè tại chỗ: tốn đĩa / băng thông, người đọc có thể thấy file ghi dở.
+#   - Dòng được nén theo luồng ngay khi ghi (gzip, hoặc zstd: compression.zstd của Python 3.14+,
+#     backports.zstd hoặc zstandard, module nào có trước),
+#     chỉ giữ bộ đệm nhỏ FLUSH_BYTES trong RAM
+#   - Mỗi shard tối đa max_bytes NDJSON chưa nén (ranh giới cố định, không phụ thuộc mức nén)
+#     -> indexer đọc song song từng shard
+#   - Shard ghi vào <tên>.tmp rồi os.replace; manifest (số dòng, sha256 từng shard) ghi sau cùng,
+#     cũng tmp + rename -> ai đọc theo manifest chỉ thấy 1 lần xuất hoàn chỉnh
+#   - Tên shard có mã lần xuất (generation): lần xuất mới không ghi đè shard mà manifest cũ đang trỏ tới;
+#     giữ KEEP_GENERATIONS lần gần nhất cho người đang đọc dở, xóa phần cũ hơn
+# Tên file: <prefix>.<generation>.<00000>.ndjson[.gz|.zst], manifest: <prefix>.manifest.json
+DEFAULT_MAX_BYTES = 64 << 20
+FLUSH_BYTES = 256 << 10
+KEEP_GENERATIONS = 2
+EXTENSIONS = {"gzip": ".ndjson.gz", "zstd": ".ndjson.zst", "none": ".ndjson"}
+
+
+class _ChecksumFile:
+    # Bọc file đích: tính sha256 + số byte của dữ liệu đã nén trong lúc ghi (không đọc lại file)
+    def __init__(self, file):
+        self.file = file
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data):
+        self.sha256.update(data)
+        self.size += len(data)
+        return self.file.write(data)
+
+    def flush(self):
+        self.file.flush()
+
+
+# compression.zstd (Python 3.14+) và backports.zstd cùng API (ZstdFile); zstandard là package bên thứ ba
+ZSTD_MODULES = ("compression.zstd", "backports.zstd", "zstandard")
+
+
+def _zstd():
+    for name in ZSTD_MODULES:
+        try:
+            return importlib.import_module(name)
+        except ImportError:
+            continue
+    raise ValueError("nén zstd cần Python 3.14+ hoặc package backports.zstd / zstandard "
+                     "(pip install backports.zstd), hoặc dùng gzip")
+
+
+def check_compression(compression):
+    # Gọi khi đọc tham số dòng lệnh / biến môi trường: báo lỗi trước khi đọc nguồn hay mở file nào
+    if compression not in EXTENSIONS:
+        raise ValueError(f"không hỗ trợ nén '{compression}' (gzip / zstd / none)")
+    if compression == "zstd":
+        _zstd()
+
+
+def _compressor(compression, fileobj, level):
+    if compression == "gzip":
+        # mtime=0: cùng dữ liệu -> cùng bytes, cùng checksum
+        return gzip.GzipFile(filename="", mode="wb", fileobj=fileobj, compresslevel=level or 6, mtime=0)
+    if compression == "zstd":
+        zstd = _zstd()
+        if zstd.__name__ == "zstandard":
+            return zstd.ZstdCompressor(level=level or 3).stream_writer(fileobj, closefd=False)
+        return zstd.ZstdFile(fileobj, mode="w", level=level or 3)
+    return fileobj
+
+
+def _decompressor(compression, fileobj):
+    if compression == "gzip":
+        return gzip.GzipFile(fileobj=fileobj, mode="rb")
+    if compression == "zstd":
+        zstd = _zstd()
+        if zstd.__name__ == "zstandard":
+            return io.BufferedReader(zstd.ZstdDecompressor().stream_reader(fileobj))
+        return zstd.ZstdFile(fileobj, mode="r")
+    return fileobj
+
+
+class ShardedNdjsonWriter:
+    def __init__(self, directory, prefix, compression="gzip", max_bytes=DEFAULT_MAX_BYTES, level=None,
+                 keep=KEEP_GENERATIONS):
+        check_compression(compression)  # báo thiếu module zstd ngay, trước khi mở file nào
+        self.directory = directory
+        self.prefix = prefix
+        self.compression = compression
+        self.max_bytes = max_bytes
+        self.level = level
+        self.keep = keep
+        self.generation = datetime.now().strftime("%Y%m%dT%H%M%S%f")
+        self.path = os.path.join(directory, f"{prefix}.manifest.json")
+        self.shards = []
+        self.rows = 0
+        self.file = None
+        os.makedirs(directory, exist_ok=True)
+
+    def _open_shard(self):
+        name = f"{self.prefix}.{self.generation}.{len(self.shards):05d}{EXTENSIONS[self.compression]}"
+        self.shard_name = name
+        self.tmp_path = os.path.join(self.directory, name + ".tmp")
+        self.file = open(self.tmp_path, "wb")
+        self.checksum = _ChecksumFile(self.file)
+        self.stream = _compressor(self.compression, self.checksum, self.level)
+        self.pending = []
+        self.pending_bytes = 0
+        self.shard_rows = 0
+        self.shard_bytes = 0
+
+    def _flush_pending(self):
+        if self.pending:
+            self.stream.write(b"".join(self.pending))
+            self.pending = []
+            self.pending_bytes = 0
+
+    def _close_shard(self):
+        self._flush_pending()
+        if self.stream is not self.checksum:
+            self.stream.close()
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.file.close()
+        os.replace(self.tmp_path, os.path.join(self.directory, self.shard_name))
+        self.shards.append({
+            "path": self.shard_name,
+            "rows": self.shard_rows,
+            "bytes": self.shard_bytes,
+            "compressed_bytes": self.checksum.size,
+            "sha256": self.checksum.sha256.hexdigest(),
+        })
+        self.file = None
+
+    def write(self, row):
+        line = (json.dumps(row, ensure_ascii=False, default=str) + "\n").encode("utf-8")
+        if self.file is None:
+            self._open_shard()
+        elif self.shard_bytes and self.shard_bytes + len(line) > self.max_bytes:
+            self._close_shard()
+            self._open_shard()
+        self.pending.append(line)
+        self.pending_bytes += len(line)
+        self.shard_bytes += len(line)
+        self.shard_rows += 1
+        self.rows += 1
+        if self.pending_bytes >= FLUSH_BYTES:
+            self._flush_pending()
+
+    def close(self):
+        # Publish: đóng shard cuối, ghi manifest (tmp + rename), rồi mới dọn các lần xuất cũ
+        if self.file is not None:
+            self._close_shard()
+        manifest = {
+            "prefix": self.prefix,
+            "generation": self.generation,
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "compression": self.compression,
+            "rows": self.rows,
+            "bytes": sum(s["bytes"] for s in self.shards),
+            "compressed_bytes": sum(s["compressed_bytes"] for s in self.shards),
+            "shards": self.shards,
+        }
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        remove_old_generations(self.directory, self.prefix, self.keep)
+        return manifest
+
+    def abort(self):
+        # Lỗi giữa chừng: bỏ file tạm, manifest cũ vẫn nguyên
+        if self.file is not None:
+            self.file.close()
+            os.remove(self.tmp_path)
+            self.file = None
+        for shard in self.shards:
+            os.remove(os.path.join(self.directory, shard["path"]))
+        self.shards = []
+
+
+def remove_old_generations(directory, prefix, keep=KEEP_GENERATIONS):
+    generations = {}
+    for path in glob.glob(os.path.join(glob.escape(directory), glob.escape(prefix) + ".*.*.ndjson*")):
+        name = os.path.basename(path)
+        if name.endswith(".tmp"):
+            continue
+        generations.setdefault(name[len(prefix) + 1:].split(".", 1)[0], []).append(path)
+    for generation in sorted(generations)[:-max(keep, 1)]:
+        for path in generations[generation]:
+            os.remove(path)
+
+
+# --- ĐỌC LẠI ---
+
+def read_manifest(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def shard_paths(manifest_path):
+    directory = os.path.dirname(manifest_path)
+    return [os.path.join(directory, shard["path"]) for shard in read_manifest(manifest_path)["shards"]]
+
+
+def iter_shard(path, compression="gzip"):
+    with open(path, "rb") as f:
+        stream = _decompressor(compression, f)
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+
+
+def iter_rows(manifest_path):
+    manifest = read_manifest(manifest_path)
+    for path in shard_paths(manifest_path):
+        yield from iter_shard(path, manifest["compression"])
+
+
+def verify(manifest_path):
+    # Trả về danh sách shard lỗi (thiếu file / sai sha256 / sai số dòng)
+    manifest = read_manifest(manifest_path)
+    directory = os.path.dirname(manifest_path)
+    errors = []
+    for shard in manifest["shards"]:
+        path = os.path.join(directory, shard["path"])
+        if not os.path.exists(path):
+            errors.append(f"{shard['path']}: không tồn tại")
+            continue
+        sha256 = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                sha256.update(block)
+        if sha256.hexdigest() != shard["sha256"]:
+            errors.append(f"{shard['path']}: sai sha256")
+            continue
+        rows = sum(1 for _ in iter_shard(path, manifest["compression"]))
+        if rows != shard["rows"]:
+            errors.append(f"{shard['path']}: {rows} dòng, manifest ghi {shard['rows']}")
+    return errors
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Kiểm tra bản xuất NDJSON theo shard (checksum + số dòng)")
+    parser.add_argument("manifest", help="vd: exports/jobs.manifest.json")
+    args = parser.parse_args()
+
+    manifest = read_manifest(args.manifest)
+    print(f"➤ {manifest['prefix']} @ {manifest['generation']}: {manifest['rows']} dòng, {len(manifest['shards'])} shard "
+          f"({manifest['bytes'] / (1 << 20):.1f} MB -> {manifest['compressed_bytes'] / (1 << 20):.1f} MB {manifest['compression']})")
+    problems = verify(args.manifest)
+    for problem in problems:
+        print(f"  ❌ {problem}")
+    if not problems:
+        print("✅ Mọi shard khớp manifest")
+    raise SystemExit(1 if problems else 0)
@@ -1,22 +1,36 @@
 import scrapy
 import sqlite3
-import random
+
+from mycrawler.dedup import get_url_index
+from mycrawler.distributed import backend_url
+from mycrawler.extract import Document
+from mycrawler.recheck import select_rechecks
+from mycrawler import storage
+
+RESUME_KEY = "careerlink/pagination/resume_page"
 
 class CareerlinkSpider(scrapy.Spider):
     name = "careerlink"
     allowed_domains = ["careerlink.vn"]
     start_urls = ["https://www.careerlink.vn/vieclam/list"]
-    max_page = 5 
+    # Phân trang theo frontier: đi tiếp trang sau chỉ khi trang vẫn còn job chưa biết, dừng khi
+    # stop_after trang liên tiếp toàn job đã có (lượt yên tĩnh chỉ tốn vài trang, lượt nhiều tin tự đi sâu).
+    # max_page: trần số trang mỗi lượt. Chạm trần mà vẫn còn job mới -> lưu trang kế (crawl_state trong
+    # data1.db), lượt sau chạy thêm 1 chuỗi "catchup" từ trang đó song song với chuỗi từ trang 1.
+    # Backfill toàn bộ: scrapy crawl careerlink -a max_page=500 -a stop_after=0
+    max_page = None     # None -> PAGINATION_MAX_PAGES
+    stop_after = None   # None -> PAGINATION_STOP_AFTER, 0 = không dừng sớm
 
     custom_settings = {
-        # ... (Các cấu hình Anti-ban giữ nguyên) ...
-        "CONCURRENT_REQUESTS": 2,
+        # Anti-ban: bắt đầu chậm (delay 3s), AdaptiveConcurrencyMiddleware tự tăng / giảm trong khoảng
+        # ADAPTIVE_* bên dưới (thay cho AutoThrottle: 2 bộ cùng chỉnh delay sẽ giành nhau)
         "DOWNLOAD_DELAY": 3,
         "RANDOMIZE_DOWNLOAD_DELAY": True,
+        "ADAPTIVE_MAX_CONCURRENCY": 4,
+        "ADAPTIVE_MIN_DELAY": 1.0,
         "DEFAULT_REQUEST_HEADERS": {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
         },
-        "AUTOTHROTTLE_ENABLED": True,
         
         # 🔴 QUAN TRỌNG: TRỎ VÀO PIPELINE MỚI
         "ITEM_PIPELINES": {
@@ -26,48 +40,155 @@ class CareerlinkSpider(scrapy.Spider):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        # Kết nối DB chung data.db
-        self.con = sqlite3.connect('data1.db')
-        self.cur = self.con.cursor()
         self.BATCH_SIZE = 15 
+        self.seen_links = set()   # link đã gặp trong lượt này (tin mới đẩy danh sách xuống -> trang sau lặp lại link)
+        # Mỗi chuỗi trang: trang đầu, trần, số trang liên tiếp không có job mới, trang cuối đã tới, lý do dừng
+        self.chains = {}
 
     def start_requests(self):
-        print(f"--> [START] Bắt đầu quét {self.max_page} trang danh sách...")
-        yield scrapy.Request(self.start_urls[0], callback=self.parse_list, priority=100)
-        for page in range(2, self.max_page + 1):
-            next_url = f"https://www.careerlink.vn/vieclam/list?page={page}"
-            yield scrapy.Request(next_url, callback=self.parse_list, priority=90)
-
-        # CHECK JOB CŨ (Lấy từ bảng 'jobs' thay vì 'news')
-        if random.random() < 0.3:
-            try:
-                self.cur.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='jobs';")
-                if self.cur.fetchone():
-                    self.cur.execute(f"SELECT url FROM jobs ORDER BY last_checked ASC LIMIT {self.BATCH_SIZE}")
-                    old_links = self.cur.fetchall()
-                    if old_links:
-                        print(f"--> [BATCH] Kiểm tra lại {len(old_links)} job cũ.")
-                        for row in old_links:
-                            yield scrapy.Request(row[0], callback=self.parse_job, priority=10, dont_filter=True)
-            except Exception:
-                pass
+        # Nạp index url 1 lần (dùng chung với CareerlinkPipeline), không query DB cho từng link
+        self.url_index = get_url_index(storage.db_path('jobs', self.settings), 'jobs', self.settings)
+
+        self.init_pagination()
+        resume = storage.get_state('jobs', RESUME_KEY, self.settings)
+        if resume:
+            self.chains["catchup"] = {"first": resume, "last": resume + self.max_page - 1, "stale": 0, "reached": 0, "stop": None}
+
+        until = f"tới khi {self.stop_after} trang liền không có job mới" if self.stop_after else "không dừng sớm"
+        print(f"--> [START] Quét danh sách {until} (tối đa {self.max_page} trang)"
+              + (f", đi tiếp từ trang {resume}" if resume else "") + "...")
+        for name, chain in self.chains.items():
+            yield self.list_request(chain["first"], name)
+
+        # CHECK JOB CŨ: chọn theo xác suất đã thay đổi (recheck.py) thay vì tung đồng xu + lấy job cũ nhất
+        # Kết nối dùng chung với pipeline (storage.py), bảng + index đã được tạo khi mở
+        old_links = []
+        cur = storage.connect('jobs', self.settings).cursor()
+        try:
+            old_links = select_rechecks(cur, 'jobs', self.recheck_budget(), self.recheck_min_probability())
+        except sqlite3.Error as e:
+            print(f"⚠️ Không chọn được jobs cần kiểm tra lại: {e}")
+        finally:
+            cur.close()
+
+        if old_links:
+            print(f"--> [BATCH] Kiểm tra lại {len(old_links)} job cũ.")
+            for p, url, etag, last_modified in old_links:
+                # Gửi kèm ETag / Last-Modified đã lưu -> server trả 304 nếu trang không đổi
+                meta = {"recheck": True, "cache_etag": etag, "cache_last_modified": last_modified}
+                # Url càng có khả năng đã đổi thì priority càng cao (10..20)
+                yield scrapy.Request(url, callback=self.parse_job, priority=10 + int(p * 10), dont_filter=True, meta=meta)
+
+    def init_pagination(self):
+        # Gọi lại được nhiều lần; spider tạo ngoài crawler (benchmarks gọi thẳng parse_list) dùng giá trị mặc định
+        if self.chains:
+            return
+        settings = getattr(self, "settings", None)
+        default_max = settings.getint("PAGINATION_MAX_PAGES", 50) if settings else 50
+        default_stop = settings.getint("PAGINATION_STOP_AFTER", 2) if settings else 2
+        self.max_page = int(self.max_page or default_max)
+        self.stop_after = int(default_stop if self.stop_after is None else self.stop_after)
+        self.chains["head"] = {"first": 1, "last": self.max_page, "stale": 0, "reached": 0, "stop": None}
+
+    def list_request(self, page, chain="head", stale=0):
+        # Trần + số trang liền không có job mới đi theo request: ở chế độ phân tán (distributed.py)
+        # trang kế có thể do worker khác xử lý
+        url = self.start_urls[0] if page == 1 else f"{self.start_urls[0]}?page={page}"
+        meta = {"page": page, "chain": chain, "stale": stale, "last": self.chains[chain]["last"]}
+        return scrapy.Request(url, callback=self.parse_list, errback=self.list_failed,
+                              priority=100 if page == 1 else 90, meta=meta)
+
+    def chain_for(self, meta):
+        self.init_pagination()
+        name = meta.get("chain", "head")
+        if name not in self.chains:
+            # Chuỗi do worker khác mở (vd catchup theo mốc trong DB của máy khác)
+            page = meta.get("page", 1)
+            self.chains[name] = {"first": page, "last": meta.get("last", page + self.max_page - 1),
+                                 "stale": 0, "reached": 0, "stop": None}
+        return name, self.chains[name]
 
     def parse_list(self, response):
-        jobslinks = response.css("a.job-link.clickable-outside::attr(href)").getall()
-        print(f"--> [LIST] Trang {response.url} - {len(jobslinks)} job.")
+        page = response.meta.get("page", 1)
+        name, chain = self.chain_for(response.meta)
+        jobslinks = Document(response).getall("a.job-link.clickable-outside::attr(href)")
+        new_links = 0
         for link in jobslinks:
             url = response.urljoin(link)
+            if url in self.seen_links:
+                continue
+            self.seen_links.add(url)
             if self.is_new_link(url):
+                new_links += 1
                 yield scrapy.Request(url, callback=self.parse_job, priority=50)
+        print(f"--> [LIST] Trang {page} - {len(jobslinks)} job, {new_links} mới.")
+
+        chain["stale"] = 0 if new_links else response.meta.get("stale", 0) + 1
+        chain["reached"] = page
+        self.record_page(page, new_links)
+        if not jobslinks:
+            self.stop_pagination(name, "empty")
+        elif self.stop_after and chain["stale"] >= self.stop_after:
+            self.stop_pagination(name, "no_new")
+        elif page >= chain["last"]:
+            self.stop_pagination(name, "ceiling")
+        else:
+            yield self.list_request(page + 1, name, chain["stale"])
+
+    def list_failed(self, failure):
+        # Trang danh sách lỗi sau khi đã retry: dừng chuỗi này, lượt sau đi lại
+        meta = failure.request.meta
+        print(f"⚠️ Trang danh sách {meta.get('page')} lỗi: {failure.getErrorMessage()}")
+        self.stop_pagination(self.chain_for(meta)[0], "error")
+
+    def record_page(self, page, new_links):
+        # Độ sâu mỗi lượt ghi vào crawl_runs (metrics.py) qua stats
+        stats = self.stats()
+        if stats is None:
+            return
+        stats.inc_value("metrics/pagination/pages")
+        stats.inc_value("metrics/pagination/new_links", new_links)
+        stats.max_value("metrics/pagination/depth", page)
+
+    def stop_pagination(self, name, reason):
+        chain = self.chains[name]
+        chain["stop"] = reason
+        if self.stats() is not None:
+            self.stats().set_value(f"metrics/pagination/stop/{name}", reason)
+        print(f"--> [LIST] Chuỗi {name}: dừng ở trang {chain['reached']} ({reason}).")
+
+    def stats(self):
+        crawler = getattr(self, "crawler", None)
+        return crawler.stats if crawler else None
+
+    def closed(self, reason):
+        # Chuỗi nào chạm trần -> lượt sau đi tiếp từ trang kế; chuỗi catchup chưa xong -> giữ mốc cũ
+        if not self.chains:
+            return
+        if backend_url(self.settings):
+            # Chế độ phân tán: chỉ worker đã thấy chuỗi dừng mới ghi mốc (worker khác không biết chuỗi đi tới đâu)
+            if not any(chain["stop"] for chain in self.chains.values()):
+                return
+        ceilings = [chain["reached"] + 1 for chain in self.chains.values() if chain["stop"] == "ceiling"]
+        catchup = self.chains.get("catchup")
+        if ceilings:
+            resume = max(ceilings)
+        elif catchup and catchup["stop"] in (None, "error"):
+            resume = catchup["first"]
+        else:
+            resume = None
+        storage.set_state('jobs', RESUME_KEY, resume, self.settings)
 
     def parse_job(self, response):
-        title = response.css("h1.job-title::text").get(default="").strip()
+        # Parse 1 lần, XPath đã biên dịch sẵn (extract.py)
+        doc = Document(response)
+        title = doc.get("h1.job-title::text").strip()
         if not title: return
 
-        company = response.css("p.org-name a span::text").get(default="").strip()
-        location = response.css("div#job-location span a::text").get(default="").strip()
-        salary = response.css("div#job-salary span.text-primary::text").get(default="").strip()
-        experience = response.css("div.d-flex.align-items-center.mb-2 i.cli-suitcase-simple + span::text").get(default="").strip()
+        company = doc.get("p.org-name a span::text").strip()
+        location = doc.get("div#job-location span a::text").strip()
+        salary = doc.get("div#job-salary span.text-primary::text").strip()
+        experience = doc.get("div.d-flex.align-items-center.mb-2 i.cli-suitcase-simple + span::text").strip()
 
         # Dữ liệu sạch sẽ, đúng chuẩn
         yield {
@@ -79,13 +200,13 @@ class CareerlinkSpider(scrapy.Spider):
             "url": response.url
         }
 
-    def is_new_link(self, url):
-        # Kiểm tra trong bảng jobs
-        try:
-            self.cur.execute("SELECT 1 FROM jobs WHERE url = ?", (url,))
-            return self.cur.fetchone() is None
-        except Exception:
-            return True
+    def recheck_budget(self):
+        # Số url cũ tối đa được kiểm tra lại mỗi lượt
+        return self.settings.getint("RECHECK_BUDGET", self.BATCH_SIZE)
 
-    def closed(self, reason):
-        self.con.close()
\ No newline at end of file
+    def recheck_min_probability(self):
+        return self.settings.getfloat("RECHECK_MIN_PROBABILITY", 0.05)
+
+    def is_new_link(self, url):
+        # Kiểm tra trong index url của bảng jobs (nạp sẵn trong RAM)
+        return url not in self.url_index
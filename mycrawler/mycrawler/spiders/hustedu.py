@@ -2,6 +2,41 @@ import scrapy
 import sqlite3
 from urllib.parse import urlparse
 
+from mycrawler.dedup import get_url_index
+from mycrawler.extract import Document, SelectorMemory, generic
+from mycrawler.frontier import Frontier, canonicalize
+from mycrawler.recheck import select_rechecks
+from mycrawler import storage
+
+
+def _first_paragraph(doc):
+    first_p = doc.get('div.news-body p::text').strip()
+    return first_p if len(first_p) > 20 else ""
+
+
+# Các cách lấy từng trường theo thứ tự ưu tiên; SelectorMemory thử trước cách đã thành công
+# gần nhất cho cùng site + dạng url (trừ cách generic: khớp với mọi trang nên không được nhớ)
+TITLE_STRATEGIES = (
+    lambda doc: doc.get('h1.title-page::text').strip(),
+    lambda doc: doc.get('div.news-detail h1::text').strip(),
+    lambda doc: doc.get('div.main-content h1::text').strip(),
+    generic(lambda doc: doc.get('//title/text()').strip()),
+)
+SUMMARY_STRATEGIES = (
+    generic(lambda doc: doc.get('//meta[@name="description"]/@content').strip()),
+    lambda doc: " ".join(doc.getall('div.news-summary *::text')).strip(),
+    lambda doc: " ".join(doc.getall('div.news-body strong:first-child *::text')).strip(),
+    _first_paragraph,
+)
+LIST_LINK_STRATEGIES = (
+    lambda doc: doc.getall("div.cat-item h3.cat-title a::attr(href)"),
+    lambda doc: doc.getall("h3.title-news a::attr(href)"),
+)
+NEXT_PAGE_STRATEGIES = (
+    lambda doc: doc.get("ul.pagination li a[rel='next']::attr(href)", None),
+    lambda doc: doc.get("a.next::attr(href)", None),
+)
+
 class HusteduSpider(scrapy.Spider):
     name = "hustedu"
     allowed_domains = ["hust.edu.vn"]
@@ -12,7 +47,8 @@ class HusteduSpider(scrapy.Spider):
     custom_settings = {
         "DOWNLOAD_DELAY": 3,
         "RANDOMIZE_DOWNLOAD_DELAY": True,
-        "CONCURRENT_REQUESTS": 8,
+        # Concurrency / delay theo domain do AdaptiveConcurrencyMiddleware chỉnh (tối đa 8 như trước)
+        "ADAPTIVE_MAX_CONCURRENCY": 8,
         "ITEM_PIPELINES": {
            "mycrawler.pipelines.MycrawlerPipeline": 300,
         },
@@ -21,90 +57,94 @@ class HusteduSpider(scrapy.Spider):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.con = sqlite3.connect('data.db')
-        self.cur = self.con.cursor()
         self.BATCH_SIZE = 50 
+        self.selector_memory = SelectorMemory()
+        self.list_keys = set()  # trang danh sách / phân trang đã xếp hàng trong lượt này
 
     def start_requests(self):
-       
+        # Nạp index url 1 lần (dùng chung với MycrawlerPipeline)
+        self.url_index = get_url_index(storage.db_path('news', self.settings), 'news', self.settings)
+        self.selector_memory.stats = self.crawler.stats
+        # Frontier trên đĩa (frontier.py): url đã gặp ở mọi dạng không tải lại, url còn dở của lượt trước chạy tiếp
+        self.frontier = Frontier(storage.connect('news', self.settings), self.name,
+                                 max_attempts=self.settings.getint("FRONTIER_MAX_ATTEMPTS", 3),
+                                 stats=self.crawler.stats)
+        resume = self.frontier.load()
+
         for url in self.start_urls:
             yield scrapy.Request(url, callback=self.parse_rss, priority=100)
 
+        if resume:
+            print(f"--> [FRONTIER] Chạy tiếp {len(resume)} url còn dở từ lượt trước.")
+            for key, url, callback, priority, depth in resume:
+                yield self.frontier_request(key, url, getattr(self, callback or "parse_universal"), priority, depth)
+
+        # Chọn bài cũ cần kiểm tra lại theo xác suất đã thay đổi (recheck.py)
+        # Kết nối dùng chung với pipeline (storage.py), bảng + index đã được tạo khi mở
+        old_links = []
+        cur = storage.connect('news', self.settings).cursor()
         try:
-            self.cur.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='news';")
-            if self.cur.fetchone():
-                self.cur.execute(f"SELECT url FROM news ORDER BY last_checked ASC LIMIT {self.BATCH_SIZE}")
-                old_links = self.cur.fetchall()
-                if old_links:
-                    print(f"--> [BATCH] Re-crawl {len(old_links)} bài cũ.")
-                    for row in old_links:
-                        
-                        yield scrapy.Request(row[0], callback=self.parse_universal, priority=10, dont_filter=True)
-        except Exception:
-            pass
+            old_links = select_rechecks(cur, 'news', self.recheck_budget(), self.recheck_min_probability())
+        except sqlite3.Error as e:
+            print(f"⚠️ Không chọn được news cần kiểm tra lại: {e}")
+        finally:
+            cur.close()
+
+        if old_links:
+            print(f"--> [BATCH] Re-crawl {len(old_links)} bài cũ.")
+            for p, url, etag, last_modified in old_links:
+                # Gửi kèm ETag / Last-Modified đã lưu -> server trả 304 nếu trang không đổi
+                meta = {"recheck": True, "cache_etag": etag, "cache_last_modified": last_modified}
+                # Url càng có khả năng đã đổi thì priority càng cao (10..20)
+                yield scrapy.Request(url, callback=self.parse_universal, priority=10 + int(p * 10), dont_filter=True, meta=meta)
 
     def parse_rss(self, response):
-        links = response.xpath("//item/link/text()").getall()
+        links = Document(response).getall("//item/link/text()")
         print(f"--> [RSS] Tìm thấy {len(links)} link mới từ RSS.")
         
         for link in links:
             url = link.strip()
             # Từ RSS nhảy vào trang bài viết (HTML) -> gọi parse_universal
-            yield scrapy.Request(url, callback=self.parse_universal, priority=50)
+            request = self.follow(response, url, self.parse_universal, 50)
+            if request:
+                yield request
 
     def parse_universal(self, response):
-    
-        title = response.css('h1.title-page::text').get(default="").strip()
-        if not title: title = response.css('div.news-detail h1::text').get(default="").strip()
-        if not title: title = response.css('div.main-content h1::text').get(default="").strip()
-        if not title: title = response.xpath('//title/text()').get(default="").strip()
-
-
-        short = ""
-        
-        short = response.xpath('//meta[@name="description"]/@content').get(default="").strip()
-        
-        if not short:
-            summary_parts = response.css('div.news-summary *::text').getall()
-            short = " ".join(summary_parts).strip()
-            
-        if not short:
-            sapo_parts = response.css('div.news-body strong:first-child *::text').getall()
-            short = " ".join(sapo_parts).strip()
-
-        if not short:
-            first_p = response.css('div.news-body p::text').get(default="").strip()
-            if len(first_p) > 20:
-                short = first_p
+        self.visited(response)
+        doc = Document(response)
+        memory = self.selector_memory
 
-        short = " ".join(short.split())
+        title = memory.first(doc, "title", TITLE_STRATEGIES)
+        short = " ".join(memory.first(doc, "short", SUMMARY_STRATEGIES).split())
 
         if title:
             yield {
                 "title": title,
                 "short": short,
-                "url": response.url
+                # Bài mới lưu theo url chuẩn hóa; bài kiểm tra lại giữ url đã lưu (dòng cũ có thể là url gốc)
+                "url": response.url if response.meta.get("recheck") else canonicalize(response.url)
             }
         else:
             if "/news/" in response.url: 
                 print(f"⚠️ BỎ QUA (Không title): {response.url}")
 
 
-        list_links = response.css("div.cat-item h3.cat-title a::attr(href)").getall()
-        if not list_links: list_links = response.css("h3.title-news a::attr(href)").getall()
+        list_links = memory.first(doc, "list_links", LIST_LINK_STRATEGIES, [])
 
         if list_links:
+            self.visited_list(response)
             for link in list_links:
-                url = response.urljoin(link)
-                if self.is_new_link(url):
-                    yield scrapy.Request(url, callback=self.parse_universal, priority=50)
+                request = self.follow(response, response.urljoin(link), self.parse_universal, 50)
+                if request:
+                    yield request
             
-            next_page = response.css("ul.pagination li a[rel='next']::attr(href)").get()
-            if not next_page: next_page = response.css("a.next::attr(href)").get()
+            next_page = memory.first(doc, "next_page", NEXT_PAGE_STRATEGIES, None)
             if next_page:
-                yield response.follow(next_page, callback=self.parse_universal, priority=60)
+                request = self.follow(response, response.urljoin(next_page), self.parse_universal, 60, listing=True)
+                if request:
+                    yield request
 
-        body_links = response.css('div.news-body a::attr(href), div#news-bodyhtml a::attr(href), div.main-content a::attr(href)').getall()
+        body_links = doc.getall('div.news-body a::attr(href), div#news-bodyhtml a::attr(href), div.main-content a::attr(href)')
         
         for link in body_links:
             full_url = response.urljoin(link)
@@ -113,12 +153,63 @@ class HusteduSpider(scrapy.Spider):
             if ("hust.edu.vn" in parsed.netloc and "/news/" in parsed.path and ".html" in full_url and 
                 not any(ext in full_url.lower() for ext in ['.pdf', '.jpg', '.png', 'mailto'])):
                 
-                if self.is_new_link(full_url):
-                    yield scrapy.Request(url=full_url, callback=self.parse_universal, priority=40)
-
-    def is_new_link(self, url):
-        self.cur.execute("SELECT 1 FROM news WHERE url = ?", (url,))
-        return self.cur.fetchone() is None
+                request = self.follow(response, full_url, self.parse_universal, 40)
+                if request:
+                    yield request
+
+    def follow(self, response, url, callback, priority, listing=False):
+        # Url mới (chưa có trong bảng news, chưa gặp ở dạng nào trong frontier) -> ghi vào frontier rồi mới tải.
+        # Trang danh sách / phân trang: tải lại mỗi lượt, chỉ chống trùng trong lượt
+        depth = response.meta.get("depth", 0) + 1
+        if depth > self.settings.getint("DEPTH_LIMIT", 0) > 0:
+            return None
+        key = canonicalize(url)
+        if listing or key in self.frontier.lists:
+            if key in self.list_keys:
+                return None
+            self.list_keys.add(key)
+            return self.frontier_request(key, url, callback, priority)
+        if not self.is_new_link(url):
+            return None
+        key = self.frontier.add(url, callback.__name__, priority, depth)
+        if key is None:
+            return None
+        return self.frontier_request(key, url, callback, priority)
+
+    def frontier_request(self, key, url, callback, priority, depth=None):
+        meta = {"frontier_key": key}
+        if depth is not None:
+            meta["depth"] = depth  # url nạp lại từ lượt trước: giữ độ sâu cho DEPTH_LIMIT
+        return scrapy.Request(url, callback=callback, errback=self.frontier_failed, priority=priority, meta=meta)
+
+    def visited(self, response):
+        key = response.meta.get("frontier_key")
+        if key:
+            self.frontier.mark(key, "done", response.url)
+            self.frontier.seen(response.url)  # đích redirect
+
+    def visited_list(self, response):
+        # Trang vừa tải là trang danh sách: lượt sau vẫn được tải lại
+        key = response.meta.get("frontier_key") or canonicalize(response.url)
+        self.list_keys.add(key)
+        self.frontier.mark(key, "list", response.url)
+
+    def frontier_failed(self, failure):
+        key = failure.request.meta.get("frontier_key")
+        if key:
+            self.frontier.mark(key, "failed", failure.request.url)
 
     def closed(self, reason):
-        self.con.close()
\ No newline at end of file
+        if getattr(self, "frontier", None) is not None:
+            self.frontier.flush()
+
+    def recheck_budget(self):
+        # Số url cũ tối đa được kiểm tra lại mỗi lượt
+        return self.settings.getint("RECHECK_BUDGET", self.BATCH_SIZE)
+
+    def recheck_min_probability(self):
+        return self.settings.getfloat("RECHECK_MIN_PROBABILITY", 0.05)
+
+    def is_new_link(self, url):
+        # Bảng news có url gốc (dòng cũ) và url đã chuẩn hóa (từ khi có frontier)
+        return url not in self.url_index and canonicalize(url) not in self.url_index
@@ -0,0 +1,24 @@
+import re
+import unicodedata
+from functools import lru_cache
+
+# --- BỎ DẤU + TÁCH ÂM TIẾT TIẾNG VIỆT ---
+# Dùng chung cho neardup (shingle), gazetteer (dò địa điểm) và offline_search (chỉ mục):
+#   - NFC + chữ thường, tách theo chuỗi chữ/số (mỗi âm tiết là 1 token)
+#   - "_" cũng là dấu phân cách ("TẦNG 7_QUẬN THANH XUÂN"; offline_search dùng "_" để ghép bigram)
+#   - bỏ dấu ("kế toán" -> "ke toan", "đ" -> "d") để có dấu hay không dấu đều khớp
+# Đổi cách tách ở đây => chữ ký trong neardup.db và chỉ mục offline đã dựng cần dựng lại.
+WORD_RE = re.compile(r"[^\W_]+")
+
+
+@lru_cache(maxsize=100000)
+def fold(word):
+    decomposed = unicodedata.normalize("NFD", word)
+    stripped = "".join(c for c in decomposed if unicodedata.category(c) != "Mn")
+    return stripped.replace("đ", "d").replace("Đ", "D")
+
+
+def words(text):
+    if not text:
+        return []
+    return [fold(w) for w in WORD_RE.findall(unicodedata.normalize("NFC", str(text)).lower())]
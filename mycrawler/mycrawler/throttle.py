@@ -0,0 +1,325 @@
+import sqlite3
+import time
+from datetime import datetime
+
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+
+from mycrawler import storage
+
+# --- TỰ CHỈNH CONCURRENCY / DELAY THEO TỪNG DOMAIN (AIMD) ---
+# Thay cho việc chỉnh tay CONCURRENT_REQUESTS / DOWNLOAD_DELAY / AutoThrottle cho từng spider.
+# Mỗi domain (download slot của Scrapy) có (concurrency, delay) riêng, chỉnh theo cửa sổ ADAPTIVE_WINDOW response
+# (hoặc ADAPTIVE_WINDOW_SECONDS giây nếu domain đang chậm, để hồi phục được sau Retry-After dài):
+#   - tăng cộng (additive increase): độ trễ TB <= ADAPTIVE_TARGET_LATENCY và tỉ lệ lỗi <= ADAPTIVE_MAX_ERROR_RATE
+#       -> tốc độ 1/delay tăng thêm ADAPTIVE_RATE_STEP req/s đến khi delay = ADAPTIVE_MIN_DELAY,
+#          rồi mới tăng concurrency +1 đến ADAPTIVE_MAX_CONCURRENCY
+#   - giảm nhân (multiplicative decrease): vượt ngưỡng, hoặc ngay khi gặp 429 / 503 / 403 / trang chặn (captcha)
+#       -> concurrency // 2, đã ở mức tối thiểu thì delay x2 (ít nhất = độ trễ TB, tôn trọng Retry-After);
+#          sau mỗi lần giảm chờ ADAPTIVE_COOLDOWN giây mới giảm tiếp (1 đợt lỗi chỉ tính 1 lần)
+# Lỗi = 429, 5xx, 403, trang chặn (body nhỏ chứa ADAPTIVE_BAN_MARKERS), lỗi tải (timeout, mất kết nối).
+# Giới hạn đã học được lưu vào ADAPTIVE_DB (bảng domain_limits) khi spider đóng và nạp lại ở lượt sau.
+# CONCURRENT_REQUESTS vẫn là trần chung của cả crawler.
+HARD_ERROR_STATUSES = {403, 429, 503}
+
+
+class DomainLimits:
+    def __init__(self, concurrency, delay, latency=None):
+        self.concurrency = concurrency
+        self.delay = delay
+        self.latency = latency  # độ trễ TB của cửa sổ gần nhất (lưu lại để xem)
+        self.last_decrease = 0.0
+        self.reset_window()
+
+    def reset_window(self):
+        self.window_started = 0.0
+        self.responses = 0
+        self.errors = 0
+        self.latency_sum = 0.0
+        self.latency_count = 0
+
+
+class AimdPolicy:
+    def __init__(self, min_concurrency=1, max_concurrency=8, min_delay=0.0, max_delay=60.0, rate_step=0.5,
+                 target_latency=3.0, max_error_rate=0.05, window=10, window_seconds=10.0, cooldown=10.0):
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max(min_concurrency, max_concurrency)
+        self.min_delay = min_delay
+        self.max_delay = max(min_delay, max_delay)
+        self.rate_step = rate_step
+        self.target_latency = target_latency
+        self.max_error_rate = max_error_rate
+        self.window = window
+        self.window_seconds = window_seconds
+        self.cooldown = cooldown
+
+    def clamp(self, limits):
+        limits.concurrency = min(max(limits.concurrency, self.min_concurrency), self.max_concurrency)
+        limits.delay = min(max(limits.delay, self.min_delay), self.max_delay)
+        return limits
+
+    def record(self, limits, latency, error=False, hard=False, retry_after=None, now=None):
+        # Trả về "increase" / "decrease" nếu giới hạn vừa đổi, None nếu chưa
+        now = time.monotonic() if now is None else now
+        cooling = now - limits.last_decrease < self.cooldown
+        if error and cooling:
+            # Response của các request đã gửi trước lần giảm vừa rồi: đợt lỗi này đã bị phạt,
+            # chỉ nâng delay nếu server yêu cầu chờ lâu hơn (Retry-After)
+            if retry_after and retry_after > limits.delay:
+                limits.delay = min(self.max_delay, retry_after)
+                return "decrease"
+            error = hard = False
+        if limits.responses == 0:
+            limits.window_started = now
+        limits.responses += 1
+        if error:
+            limits.errors += 1
+        if latency is not None:
+            limits.latency_sum += latency
+            limits.latency_count += 1
+
+        if hard:
+            # 429 / 503 / bị chặn: lùi ngay, không chờ hết cửa sổ
+            return self.decrease(limits, now, retry_after)
+        if limits.responses < self.window and now - limits.window_started < self.window_seconds:
+            return None
+
+        error_rate = limits.errors / limits.responses
+        if limits.latency_count:
+            limits.latency = limits.latency_sum / limits.latency_count
+        too_slow = limits.latency is not None and limits.latency > self.target_latency
+        if error_rate > self.max_error_rate or too_slow:
+            return self.decrease(limits, now)
+        limits.reset_window()
+        if cooling:
+            return None  # Chưa hết cooldown: chưa tăng lại
+        return self.increase(limits)
+
+    def increase(self, limits):
+        if limits.delay > self.min_delay:
+            # Tăng đều theo req/s (không theo giây delay: 0.25s -> 0s là nhảy từ 4 req/s lên không giới hạn)
+            rate = 1 / limits.delay + self.rate_step
+            if limits.latency and rate * limits.latency >= limits.concurrency:
+                # Delay không còn là giới hạn (concurrency / latency đã thấp hơn) -> về min, lần sau tăng concurrency
+                rate = float("inf")
+            limits.delay = max(self.min_delay, 1 / rate)
+        elif limits.concurrency < self.max_concurrency:
+            limits.concurrency += 1
+        else:
+            return None
+        return "increase"
+
+    def decrease(self, limits, now, retry_after=None):
+        if now - limits.last_decrease < self.cooldown:
+            return None
+        limits.last_decrease = now
+        limits.reset_window()
+        if limits.concurrency > self.min_concurrency:
+            limits.concurrency = max(self.min_concurrency, limits.concurrency // 2)
+        else:
+            # delay = 0 với 1 request song song ~ 1 request mỗi latency -> lùi về ít nhất latency
+            floor = limits.latency or 1 / self.rate_step
+            limits.delay = min(self.max_delay, max(limits.delay * 2, floor, self.min_delay))
+        if retry_after:
+            limits.delay = min(self.max_delay, max(limits.delay, retry_after))
+        return "decrease"
+
+
+def retry_after_seconds(response):
+    value = response.headers.get(b"Retry-After")
+    if not value:
+        return None
+    try:
+        return float(value.decode("latin-1").strip())
+    except ValueError:
+        return None  # Dạng ngày HTTP: bỏ qua, đã x2 delay
+
+
+class AdaptiveConcurrencyMiddleware:
+    # Downloader middleware (cần process_exception để thấy timeout) + nghe spider_opened / spider_closed.
+    # Đặt số thứ tự lớn (sát downloader) để thấy response 429 / 5xx trước RetryMiddleware.
+    def __init__(self, crawler, policy, db_path, ban_markers=(), ban_max_bytes=65536, debug=False):
+        self.crawler = crawler
+        self.stats = crawler.stats
+        self.policy = policy
+        self.db_path = db_path
+        self.ban_markers = [m.lower().encode("utf-8") for m in ban_markers]
+        self.ban_max_bytes = ban_max_bytes
+        self.debug = debug  # In cả các lần tăng (mặc định chỉ in lần giảm)
+        self.domains = {}  # slot key -> DomainLimits
+        self.applied = set()  # slot key đã được đặt giới hạn trong lượt này
+        self.start = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool("ADAPTIVE_ENABLED", True):
+            raise NotConfigured
+        policy = AimdPolicy(
+            min_concurrency=settings.getint("ADAPTIVE_MIN_CONCURRENCY", 1),
+            max_concurrency=settings.getint("ADAPTIVE_MAX_CONCURRENCY", 8),
+            min_delay=settings.getfloat("ADAPTIVE_MIN_DELAY", 0.0),
+            max_delay=settings.getfloat("ADAPTIVE_MAX_DELAY", 60.0),
+            rate_step=settings.getfloat("ADAPTIVE_RATE_STEP", 0.5),
+            target_latency=settings.getfloat("ADAPTIVE_TARGET_LATENCY", 3.0),
+            max_error_rate=settings.getfloat("ADAPTIVE_MAX_ERROR_RATE", 0.05),
+            window=settings.getint("ADAPTIVE_WINDOW", 10),
+            window_seconds=settings.getfloat("ADAPTIVE_WINDOW_SECONDS", 10.0),
+            cooldown=settings.getfloat("ADAPTIVE_COOLDOWN", 10.0),
+        )
+        mw = cls(
+            crawler, policy,
+            storage.setting_db_path(settings, "ADAPTIVE_DB", settings.get("METRICS_DB") or "metrics.db"),
+            settings.getlist("ADAPTIVE_BAN_MARKERS"),
+            settings.getint("ADAPTIVE_BAN_MAX_BYTES", 65536),
+            settings.getbool("ADAPTIVE_DEBUG", False),
+        )
+        crawler.signals.connect(mw.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(mw.spider_closed, signal=signals.spider_closed)
+        return mw
+
+    def spider_opened(self, spider):
+        # Giá trị khởi đầu của domain chưa học: CONCURRENT_REQUESTS_PER_DOMAIN / DOWNLOAD_DELAY của spider
+        settings = self.crawler.settings
+        self.start = (settings.getint("CONCURRENT_REQUESTS_PER_DOMAIN", 1),
+                      getattr(spider, "download_delay", settings.getfloat("DOWNLOAD_DELAY", 0.0)))
+        for key, (concurrency, delay, latency) in load_limits(self.db_path).items():
+            self.domains[key] = self.policy.clamp(DomainLimits(concurrency, delay, latency))
+
+    def spider_closed(self, spider):
+        # Chỉ lưu domain dùng trong lượt này (domain khác giữ giá trị đã học bởi spider khác)
+        used = {key: self.domains[key] for key in self.applied}
+        if used:
+            save_limits(self.db_path, used)
+
+    def limits_for(self, key):
+        limits = self.domains.get(key)
+        if limits is None:
+            limits = self.domains[key] = self.policy.clamp(DomainLimits(*self.start))
+        return limits
+
+    def slot_key(self, request):
+        return self.crawler.engine.downloader.get_slot_key(request)
+
+    def apply(self, key, limits):
+        downloader = self.crawler.engine.downloader
+        self.applied.add(key)
+        # Slot chưa tạo: Scrapy tạo slot mới theo DOWNLOAD_SLOTS (per_slot_settings)
+        downloader.per_slot_settings.setdefault(key, {}).update(concurrency=limits.concurrency, delay=limits.delay)
+        slot = downloader.slots.get(key)
+        if slot is not None:
+            slot.concurrency = limits.concurrency
+            slot.delay = limits.delay
+        if self.stats is not None:
+            self.stats.set_value(f"metrics/adaptive/{key}/concurrency", limits.concurrency)
+            self.stats.set_value(f"metrics/adaptive/{key}/delay", limits.delay)
+
+    def process_request(self, request, spider):
+        if self.start is None:
+            return None
+        key = self.slot_key(request)
+        if key not in self.applied:
+            self.apply(key, self.limits_for(key))
+        return None
+
+    def process_response(self, request, response, spider):
+        if self.start is None:
+            return response
+        hard = response.status in HARD_ERROR_STATUSES or self.is_ban_page(response)
+        error = hard or response.status >= 500
+        retry_after = retry_after_seconds(response) if response.status in (429, 503) else None
+        reason = f"HTTP {response.status}" if response.status >= 400 else ("trang chặn" if hard else "")
+        self.record(request, request.meta.get("download_latency"), error, hard, retry_after, reason)
+        return response
+
+    def process_exception(self, request, exception, spider):
+        if self.start is not None:
+            self.record(request, None, True, False, None, type(exception).__name__)
+        return None
+
+    def record(self, request, latency, error, hard, retry_after, reason):
+        key = self.slot_key(request)
+        limits = self.limits_for(key)
+        change = self.policy.record(limits, latency, error, hard, retry_after)
+        if change is None:
+            return
+        self.apply(key, limits)
+        if self.stats is not None:
+            self.stats.inc_value(f"metrics/adaptive/{change}")
+        if change == "decrease":
+            print(f"--> [THROTTLE] 🐢 {key}: concurrency={limits.concurrency}, delay={limits.delay:.2f}s"
+                  f" ({reason or f'độ trễ {limits.latency or 0:.1f}s / lỗi'})")
+        elif self.debug:
+            print(f"--> [THROTTLE] 🐇 {key}: concurrency={limits.concurrency}, delay={limits.delay:.2f}s")
+
+    def is_ban_page(self, response):
+        # Trang chặn / captcha thường nhỏ và trả 200; trang thật lớn hơn nhiều -> chỉ dò trang nhỏ
+        if not self.ban_markers or response.status != 200 or len(response.body) > self.ban_max_bytes:
+            return False
+        body = response.body.lower()
+        return any(marker in body for marker in self.ban_markers)
+
+
+# --- LƯU GIỚI HẠN ĐÃ HỌC (SQLite) ---
+
+def create_limits_table(con):
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS domain_limits (
+            domain TEXT PRIMARY KEY,
+            concurrency INTEGER,
+            delay REAL,
+            latency REAL,
+            updated_at TIMESTAMP
+        )
+    """)
+
+
+def load_limits(db_path):
+    con = sqlite3.connect(db_path)
+    try:
+        create_limits_table(con)
+        rows = con.execute("SELECT domain, concurrency, delay, latency FROM domain_limits").fetchall()
+    finally:
+        con.close()
+    return {domain: (concurrency, delay, latency) for domain, concurrency, delay, latency in rows}
+
+
+def save_limits(db_path, domains):
+    con = sqlite3.connect(db_path)
+    try:
+        with con:
+            create_limits_table(con)
+            now = datetime.now()
+            con.executemany("""
+                INSERT INTO domain_limits (domain, concurrency, delay, latency, updated_at) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(domain) DO UPDATE SET concurrency=excluded.concurrency, delay=excluded.delay,
+                    latency=excluded.latency, updated_at=excluded.updated_at
+            """, [(key, limits.concurrency, limits.delay, limits.latency, now) for key, limits in domains.items()])
+    finally:
+        con.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Xem / xóa giới hạn concurrency / delay đã học theo domain")
+    parser.add_argument("--db", default=storage.setting_db_path(None, "METRICS_DB", "metrics.db"))
+    parser.add_argument("--reset", nargs="*", metavar="DOMAIN", help="Xóa giới hạn đã học (không kèm domain = xóa hết)")
+    args = parser.parse_args()
+
+    con = sqlite3.connect(args.db)
+    try:
+        create_limits_table(con)
+        if args.reset is not None:
+            with con:
+                if args.reset:
+                    con.executemany("DELETE FROM domain_limits WHERE domain = ?", [(d,) for d in args.reset])
+                else:
+                    con.execute("DELETE FROM domain_limits")
+            print("✅ Đã xóa giới hạn đã học")
+        for domain, concurrency, delay, latency, updated_at in con.execute(
+                "SELECT domain, concurrency, delay, latency, updated_at FROM domain_limits ORDER BY domain"):
+            latency_text = f"{latency:.2f}s" if latency is not None else "-"
+            print(f"  {domain:<30} concurrency={concurrency} delay={delay:.2f}s latency={latency_text} ({updated_at})")
+    finally:
+        con.close()
@@ -0,0 +1,239 @@
+import argparse
+import os
+import sqlite3
+import sys
+import unicodedata
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "mycrawler"))
+from mycrawler.profiling import profile_main  # noqa: E402
+
+# Chuẩn hóa "Mức lương" / "Kinh nghiệm" (CSV sạch) và salary / experience (bảng jobs của CareerLink)
+# thành cột số, chạy sau filter_jobs.py / job_pipeline.py:
+#   salary_min, salary_max     (số tiền theo salary_currency, vd 10 - 15 triệu -> 10000000, 15000000)
+#   salary_currency            VND / USD
+#   salary_unit                month / hour / day / year (kỳ trả lương)
+#   salary_negotiable          1 nếu "Thỏa thuận", "Thương lượng", ...
+#   exp_min, exp_max           số năm kinh nghiệm ("Không yêu cầu" -> 0, 0)
+# Parse theo lô bằng pandas .str (regex chạy trên cả Series), chỉ parse các chuỗi CHƯA gặp:
+# kết quả được cache theo chuỗi gốc nên "7 - 10 triệu" xuất hiện 3000 lần chỉ parse 1 lần.
+
+DEFAULT_CSV_IN = os.path.join("data", "jobs_clean.csv")
+DEFAULT_CSV_OUT = os.path.join("data", "jobs_normalized.csv")
+CHUNK_SIZE = 50000
+
+SALARY_COLUMNS = ["salary_min", "salary_max", "salary_currency", "salary_unit", "salary_negotiable"]
+EXPERIENCE_COLUMNS = ["exp_min", "exp_max"]
+
+_NUM = r"\d+(?:[.,]\d+)?"
+_MONEY_UNIT = r"triệu|tr|nghìn|ngàn|k|usd|\$|vnđ|vnd|đ"
+SALARY_RE = (
+    rf"(?P<prefix>trên|hơn|từ|dưới|đến|tới|up to|upto|lên đến)?\s*\$?\s*(?P<low>{_NUM})\s*(?P<unit_low>{_MONEY_UNIT})?"
+    rf"(?:\s*(?:-|–|~|đến|to)\s*\$?\s*(?P<high>{_NUM})\s*(?P<unit_high>{_MONEY_UNIT})?)?"
+)
+EXPERIENCE_RE = (
+    rf"(?P<prefix>hơn|trên|từ|dưới|ít hơn|tối thiểu)?\s*(?P<low>{_NUM})"
+    rf"(?:\s*(?:-|–|~|đến|to)\s*(?P<high>{_NUM}))?\s*(?P<unit>năm|tháng|year|month)?"
+)
+MONEY_MULTIPLIER = {"triệu": 1e6, "tr": 1e6, "nghìn": 1e3, "ngàn": 1e3, "k": 1e3,
+                    "usd": 1.0, "$": 1.0, "vnđ": 1.0, "vnd": 1.0, "đ": 1.0}
+MIN_ONLY_PREFIXES = ["trên", "hơn", "từ", "tối thiểu"]
+MAX_ONLY_PREFIXES = ["dưới", "đến", "tới", "up to", "upto", "lên đến", "ít hơn"]
+NEGOTIABLE_RE = r"thỏa thuận|thoả thuận|thương lượng|cạnh tranh|negotiable"
+NO_EXPERIENCE_RE = r"không yêu cầu|chưa có kinh nghiệm|không cần kinh nghiệm|no experience"
+
+
+def prepare_text(values):
+    # NFC + chữ thường + bỏ dấu phân cách hàng nghìn (12.500.000 -> 12500000, 1,000 -> 1000)
+    text = values.fillna("").astype(str).map(lambda s: unicodedata.normalize("NFC", s))
+    text = text.str.lower().str.strip()
+    return text.str.replace(r"(?<=\d)[.,](?=\d{3}(?!\d))", "", regex=True)
+
+
+def to_number(values):
+    return pd.to_numeric(values.str.replace(",", ".", regex=False), errors="coerce")
+
+
+def parse_salary(values):
+    text = prepare_text(values)
+    parts = text.str.extract(SALARY_RE)
+    low = to_number(parts["low"])
+    high = to_number(parts["high"])
+
+    # Đơn vị của số đầu thiếu thì dùng đơn vị của số sau ("7 - 10 triệu")
+    unit_low = parts["unit_low"].fillna(parts["unit_high"])
+    unit_high = parts["unit_high"].fillna(parts["unit_low"])
+    # Không có đơn vị nào: số nhỏ coi như triệu, số lớn coi như đồng
+    mult_low = unit_low.map(MONEY_MULTIPLIER).to_numpy(dtype=float)
+    mult_low = np.where(np.isnan(mult_low), np.where(low < 1000, 1e6, 1.0), mult_low)
+    mult_high = unit_high.map(MONEY_MULTIPLIER).to_numpy(dtype=float)
+    mult_high = np.where(np.isnan(mult_high), mult_low, mult_high)
+
+    low = low.to_numpy(dtype=float) * mult_low
+    high = high.to_numpy(dtype=float) * mult_high
+    prefix = parts["prefix"]
+    min_only = prefix.isin(MIN_ONLY_PREFIXES).to_numpy()
+    max_only = prefix.isin(MAX_ONLY_PREFIXES).to_numpy()
+    single = np.isnan(high)
+
+    salary_min = np.where(max_only & single, np.nan, low)
+    salary_max = np.where(single, np.where(min_only, np.nan, low), high)
+
+    has_number = ~np.isnan(low)
+    is_usd = (unit_low.isin(["usd", "$"]) | text.str.contains(r"usd|\$", regex=True)).to_numpy()
+    currency = np.where(has_number, np.where(is_usd, "USD", "VND"), None)
+    unit = np.select(
+        [text.str.contains(r"giờ|/h\b|hour", regex=True).to_numpy(),
+         text.str.contains(r"ngày|/day\b", regex=True).to_numpy(),
+         text.str.contains(r"/năm|năm|/year|year", regex=True).to_numpy()],
+        ["hour", "day", "year"], default="month")
+    unit = np.where(has_number, unit, None)
+    negotiable = text.str.contains(NEGOTIABLE_RE, regex=True).to_numpy().astype(int)
+
+    return pd.DataFrame({
+        "salary_min": salary_min,
+        "salary_max": salary_max,
+        "salary_currency": currency,
+        "salary_unit": unit,
+        "salary_negotiable": negotiable,
+    }, index=values.index)
+
+
+def parse_experience(values):
+    text = prepare_text(values)
+    parts = text.str.extract(EXPERIENCE_RE)
+    low = to_number(parts["low"]).to_numpy(dtype=float)
+    high = to_number(parts["high"]).to_numpy(dtype=float)
+    # "6 tháng" -> 0.5 năm
+    scale = np.where(parts["unit"].isin(["tháng", "month"]).to_numpy(), 1 / 12, 1.0)
+    low, high = low * scale, high * scale
+
+    prefix = parts["prefix"]
+    min_only = prefix.isin(MIN_ONLY_PREFIXES).to_numpy()
+    max_only = prefix.isin(MAX_ONLY_PREFIXES).to_numpy()
+    single = np.isnan(high)
+    exp_min = np.where(max_only & single, 0.0, low)
+    exp_max = np.where(single, np.where(min_only, np.nan, low), high)
+
+    none_required = text.str.contains(NO_EXPERIENCE_RE, regex=True).to_numpy()
+    exp_min = np.where(none_required, 0.0, exp_min)
+    exp_max = np.where(none_required, 0.0, exp_max)
+    return pd.DataFrame({"exp_min": exp_min, "exp_max": exp_max}, index=values.index)
+
+
+class CachedParser:
+    # Cache kết quả theo chuỗi gốc; mỗi lô chỉ parse các chuỗi chưa có trong cache
+    def __init__(self, parse_fn, max_size=200000):
+        self.parse_fn = parse_fn
+        self.max_size = max_size
+        self.table = None
+
+    def __call__(self, values):
+        keys = values.fillna("").astype(str)
+        uniques = pd.Index(keys.unique())
+        if self.table is not None and len(self.table) > self.max_size:
+            self.table = None
+        missing = uniques if self.table is None else uniques.difference(self.table.index)
+        if len(missing):
+            parsed = self.parse_fn(pd.Series(missing, index=missing))
+            self.table = parsed if self.table is None else pd.concat([self.table, parsed])
+        return self.table.reindex(keys.to_numpy()).set_axis(values.index)
+
+
+salary_parser = CachedParser(parse_salary)
+experience_parser = CachedParser(parse_experience)
+
+
+def normalize_frame(df, salary_col, experience_col):
+    return pd.concat([df, salary_parser(df[salary_col]), experience_parser(df[experience_col])], axis=1)
+
+
+# --- CSV SẠCH -> CSV CÓ CỘT SỐ ---
+
+def normalize_csv(input_file, output_file, chunk_size=CHUNK_SIZE):
+    count = 0
+    first = True
+    reader = pd.read_csv(input_file, encoding="utf-8-sig", dtype=str, keep_default_na=False, chunksize=chunk_size)
+    for chunk in reader:
+        chunk.columns = [c.strip() for c in chunk.columns]
+        out = normalize_frame(chunk, "Mức lương", "Kinh nghiệm")
+        out.to_csv(output_file, mode="w" if first else "a", header=first, index=False,
+                   encoding="utf-8-sig" if first else "utf-8")
+        first = False
+        count += len(out)
+    return count
+
+
+# --- BẢNG jobs (CareerLink) -> thêm cột số ngay trong DB ---
+DB_COLUMNS = {
+    "salary_min": "REAL",
+    "salary_max": "REAL",
+    "salary_currency": "TEXT",
+    "salary_unit": "TEXT",
+    "salary_negotiable": "INTEGER",
+    "exp_min": "REAL",
+    "exp_max": "REAL",
+    "normalized_at": "TIMESTAMP",
+}
+
+
+def normalize_db(db_path, table="jobs", chunk_size=5000):
+    # Chỉ xử lý dòng mới hoặc có last_updated sau lần chuẩn hóa trước
+    con = sqlite3.connect(db_path)
+    try:
+        cur = con.cursor()
+        cur.execute(f"PRAGMA table_info({table})")
+        existing = {row[1] for row in cur.fetchall()}
+        if not existing:
+            return 0
+        for col, col_type in DB_COLUMNS.items():
+            if col not in existing:
+                cur.execute(f"ALTER TABLE {table} ADD COLUMN {col} {col_type}")
+        con.commit()
+
+        count = 0
+        now = str(datetime.now())
+        while True:
+            df = pd.read_sql_query(
+                f"""SELECT url, salary, experience FROM {table}
+                    WHERE normalized_at IS NULL OR normalized_at < last_updated LIMIT ?""",
+                con, params=(chunk_size,))
+            if df.empty:
+                break
+            out = normalize_frame(df, "salary", "experience")
+            out = out.astype(object).where(out.notna(), None)
+            rows = out[SALARY_COLUMNS + EXPERIENCE_COLUMNS + ["url"]].itertuples(index=False, name=None)
+            with con:
+                con.executemany(f"""
+                    UPDATE {table}
+                    SET salary_min = ?, salary_max = ?, salary_currency = ?, salary_unit = ?, salary_negotiable = ?,
+                        exp_min = ?, exp_max = ?, normalized_at = COALESCE(last_updated, ?)
+                    WHERE url = ?
+                """, [r[:-1] + (now, r[-1]) for r in rows])
+            count += len(df)
+        return count
+    finally:
+        con.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Chuẩn hóa lương / kinh nghiệm thành cột số")
+    parser.add_argument("--csv-in", default=DEFAULT_CSV_IN)
+    parser.add_argument("--csv-out", default=DEFAULT_CSV_OUT)
+    parser.add_argument("--db", help="DB crawler CareerLink (vd: mycrawler/data1.db), cập nhật bảng jobs")
+    parser.add_argument("--skip-csv", action="store_true")
+    args = parser.parse_args(argv)
+
+    if not args.skip_csv:
+        count = normalize_csv(args.csv_in, args.csv_out)
+        print(f"✅ Đã chuẩn hóa {count} dòng -> {args.csv_out}")
+    if args.db:
+        count = normalize_db(args.db)
+        print(f"✅ Đã chuẩn hóa {count} job trong {args.db}")
+
+
+if __name__ == "__main__":
+    profile_main("normalize_jobs", main)
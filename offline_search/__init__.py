@@ -0,0 +1,19 @@
+from .index import IndexWriter, SearchIndex, open_index
+from .sources import CRAWLER_FIELDS, LEGACY_FIELDS
+from .text import fold, terms, tokenize
+
+# Tìm kiếm offline (không cần Elasticsearch) trên dữ liệu job:
+#   python -m offline_search build --csv data/jobs_clean.csv --out data/search/legacy
+#   python -m offline_search search data/search/legacy "kế toán hà nội"
+#   python -m offline_search serve --legacy data/search/legacy --port 3001
+
+__all__ = [
+    "CRAWLER_FIELDS",
+    "LEGACY_FIELDS",
+    "IndexWriter",
+    "SearchIndex",
+    "fold",
+    "open_index",
+    "terms",
+    "tokenize",
+]
@@ -0,0 +1,244 @@
+import argparse
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from .index import IndexWriter, SearchIndex
+from .sources import CRAWLER_FIELDS, LEGACY_FIELDS, iter_csv_docs, iter_table_docs
+
+DEFAULT_LEGACY = os.path.join("data", "search", "legacy")
+DEFAULT_CRAWLER = os.path.join("data", "search", "crawler")
+
+
+def build(args):
+    # Chạy lại nhiều lần được: chỉ doc mới / đổi nội dung được ghi, doc không còn trong nguồn bị xóa
+    if args.db:
+        out = args.out or DEFAULT_CRAWLER
+        writer = IndexWriter(out, CRAWLER_FIELDS)
+        docs = iter_table_docs(args.db, args.table)
+    else:
+        out = args.out or DEFAULT_LEGACY
+        writer = IndexWriter(out, LEGACY_FIELDS)
+        docs = iter_csv_docs(args.csv)
+    start = time.perf_counter()
+    changed, removed = writer.sync(docs)
+    writer.commit()
+    if args.merge:
+        writer.merge()
+    elapsed = time.perf_counter() - start
+    print(f"✅ {out}: {len(writer.live)} doc ({changed} thêm/cập nhật, {removed} xóa) "
+          f"trong {elapsed:.1f}s, {len(writer.meta['segments'])} segment")
+
+
+def search(args):
+    with SearchIndex(args.index) as index:
+        start = time.perf_counter()
+        result = index.search(args.query, size=args.size, offset=(args.page - 1) * args.size)
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"🔎 {result['total']} kết quả trong {elapsed:.1f}ms")
+        for hit in result["hits"]:
+            source = hit["source"]
+            title = source.get("Tiêu đề tin") or source.get("title") or ""
+            print(f"  {hit['score']:7.3f}  [{hit['id']}] {title}")
+
+
+# --- HTTP (cùng dạng response với backend Express cho các route tìm kiếm chính) ---
+
+class Indexes:
+    # Mở chỉ mục 1 lần, tự mở lại khi có commit mới (meta.json đổi).
+    # Bản cũ chỉ được đóng (giải phóng mmap / file) khi request cuối cùng đang đọc nó trả lại.
+    def __init__(self, paths):
+        self.paths = {name: path for name, path in paths.items() if path and os.path.exists(path)}
+        self.lock = threading.Lock()
+        self.open = {}
+        self.users = {}  # SearchIndex -> số request đang dùng
+
+    @contextmanager
+    def use(self, name):
+        index = self.acquire(name)
+        try:
+            yield index
+        finally:
+            if index is not None:
+                self.release(index)
+
+    def acquire(self, name):
+        if name not in self.paths:
+            return None
+        with self.lock:
+            index = self.open.get(name)
+            if index is None or index.is_stale():
+                old = index
+                try:
+                    index = self.open[name] = self.reopen(self.paths[name])
+                except (OSError, ValueError) as e:
+                    if old is None:
+                        raise
+                    # Không mở được bản mới: phục vụ tiếp bản đang có, request sau thử lại
+                    print(f"⚠️ Không mở lại được chỉ mục {name}: {e}")
+                    index = old
+                if old is not None and old is not index and not self.users.get(old):
+                    self.users.pop(old, None)
+                    old.close()
+            self.users[index] = self.users.get(index, 0) + 1
+            return index
+
+    @staticmethod
+    def reopen(path, attempts=3):
+        # Writer có thể vừa commit / gộp segment giữa lúc đọc meta.json và mở segment -> đọc lại meta, thử lại
+        for attempt in range(attempts):
+            try:
+                return SearchIndex(path)
+            except (OSError, ValueError):
+                if attempt == attempts - 1:
+                    raise
+                time.sleep(0.05 * (attempt + 1))
+
+    def release(self, index):
+        with self.lock:
+            self.users[index] -= 1
+            if self.users[index] or index in self.open.values():
+                return
+            del self.users[index]
+            index.close()
+
+    def close(self):
+        with self.lock:
+            for index in self.open.values():
+                index.close()
+            self.open.clear()
+            self.users.clear()
+
+
+def page_args(params):
+    page = max(1, int(params.get("page") or 1))
+    size = min(50, max(1, int(params.get("size") or 10)))
+    return page, size
+
+
+class Handler(BaseHTTPRequestHandler):
+    def send_json(self, status, payload):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.end_headers()
+        self.wfile.write(data)
+
+    def search(self, name, params):
+        page, size = page_args(params)
+        try:
+            with self.server.indexes.use(name) as index:
+                if index is None:
+                    return {"total": 0, "hits": [], "error": f"chưa có chỉ mục {name}"}, page, size
+                return index.search(params.get("q") or "", size=size, offset=(page - 1) * size), page, size
+        except (OSError, ValueError) as e:
+            return {"total": 0, "hits": [], "error": f"không mở được chỉ mục {name}: {e}"}, page, size
+
+    def es_hits(self, result):
+        return [{"_id": h["id"], "_score": h["score"], "_source": h["source"]} for h in result["hits"]]
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        params = {k: v[0] for k, v in parse_qs(parts.query).items()}
+        segments = parts.path.strip("/").split("/")
+        if parts.path == "/api/search":
+            if not params.get("q"):
+                return self.send_json(400, {"error": "Missing query"})
+            result, _, _ = self.search("legacy", params)
+            return self.send_json(200, {"total": result["total"], "hits": [
+                {"id": h["id"], "score": h["score"], "source": h["source"]} for h in result["hits"]]})
+        if len(segments) == 4 and segments[0] == "api" and segments[2] == "job":
+            start = time.monotonic()
+            try:
+                with self.server.indexes.use(segments[1]) as index:
+                    source = index.get(unquote(segments[3])) if index else None
+            except (OSError, ValueError) as e:
+                return self.send_json(503, {"error": f"không mở được chỉ mục {segments[1]}: {e}"})
+            if source is None:
+                return self.send_json(404, {"error": "Not found"})
+            return self.send_json(200, {"method": "offline", "time": f"{(time.monotonic() - start) * 1000:.0f}ms",
+                                        "data": source})
+        if parts.path == "/api/health":
+            return self.send_json(200, {"status": "ok", "engine": "offline",
+                                        "indexes": sorted(self.server.indexes.paths)})
+        self.send_json(404, {"error": "Not found"})
+
+    def do_POST(self):
+        start = time.monotonic()
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)) or 0)
+        try:
+            params = json.loads(body) if body else {}
+        except ValueError:
+            return self.send_json(400, {"error": "Invalid JSON"})
+        path = urlsplit(self.path).path
+        elapsed = lambda: f"{(time.monotonic() - start) * 1000:.0f}ms"
+
+        if path in ("/api/legacy/search", "/api/crawler/search"):
+            result, page, size = self.search(path.split("/")[2], params)
+            return self.send_json(200, {"time": elapsed(), "page": page, "size": size,
+                                        "total": result["total"], "hits": self.es_hits(result)})
+        if path == "/api/search/all":
+            if not params.get("q"):
+                return self.send_json(400, {"error": "Missing query"})
+            payload = {}
+            for name in ("legacy", "crawler"):
+                result, page, size = self.search(name, params)
+                payload[name] = {"index": name, "total": result["total"], "hits": self.es_hits(result),
+                                 "error": result.get("error")}
+            return self.send_json(200, {"time": elapsed(), "page": page, "size": size, **payload})
+        self.send_json(404, {"error": "Not found"})
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(args):
+    server = ThreadingHTTPServer((args.host, args.port), Handler)
+    server.indexes = Indexes({"legacy": args.legacy, "crawler": args.crawler})
+    print(f"✅ Tìm kiếm offline tại http://{args.host}:{args.port} ({', '.join(sorted(server.indexes.paths)) or 'chưa có chỉ mục'})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.indexes.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m offline_search", description="Tìm kiếm job offline (không cần Elasticsearch)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("build", help="Tạo / cập nhật chỉ mục")
+    p.add_argument("--csv", default=os.path.join("data", "jobs_clean.csv"))
+    p.add_argument("--db", help="DB crawler (vd: mycrawler/data1.db) thay cho --csv")
+    p.add_argument("--table", default="jobs")
+    p.add_argument("--out", help=f"Thư mục chỉ mục (mặc định {DEFAULT_LEGACY} / {DEFAULT_CRAWLER})")
+    p.add_argument("--merge", action="store_true", help="Gộp mọi segment thành 1 sau khi cập nhật")
+    p.set_defaults(func=build)
+
+    p = sub.add_parser("search", help="Tìm thử trên terminal")
+    p.add_argument("index")
+    p.add_argument("query")
+    p.add_argument("--size", type=int, default=10)
+    p.add_argument("--page", type=int, default=1)
+    p.set_defaults(func=search)
+
+    p = sub.add_parser("serve", help="HTTP API dự phòng khi Elasticsearch không chạy")
+    p.add_argument("--legacy", default=DEFAULT_LEGACY)
+    p.add_argument("--crawler", default=DEFAULT_CRAWLER)
+    p.add_argument("--host", default="0.0.0.0")
+    p.add_argument("--port", type=int, default=3001)
+    p.set_defaults(func=serve)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
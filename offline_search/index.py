@@ -0,0 +1,449 @@
+import hashlib
+import heapq
+import json
+import math
+import mmap
+import os
+import shutil
+import time
+from array import array
+from collections import Counter, defaultdict
+from itertools import accumulate
+
+from .text import terms
+
+# Chỉ mục ngược lưu trên đĩa, chia segment (giống Lucene, bản thu nhỏ):
+#
+#   <index>/meta.json           trường + boost, danh sách segment, doc đã xóa -> điểm commit (ghi atomic)
+#   <index>/seg_000001/
+#       segment.json            số doc, key ("Id tin" / url) + hash nội dung của từng doc, thống kê độ dài trường
+#       lexicon.json            {trường: {term: [offset, số doc, kiểu delta, kiểu tf]}}
+#       postings.bin            mỗi term: doc id dạng delta + tf, mỗi mảng dùng kiểu số nhỏ nhất đủ chứa
+#                               (B / H / I / Q: phần lớn delta và tf chỉ tốn 1 byte) -> mở bằng mmap
+#       lengths.bin             độ dài (số term) từng trường của từng doc, uint32
+#       store.bin, store.idx    document gốc (JSON) + offsets, để trả kết quả
+#
+# Thêm / cập nhật: doc mới ghi thành segment mới, bản cũ cùng key bị đánh dấu xóa trong meta.json.
+# Quá MAX_SEGMENTS segment thì gộp lại thành 1 (bỏ hẳn doc đã xóa). Segment cũ sau khi gộp được ghi vào
+# meta.json ("retired") và chỉ bị xóa ở lần commit / mở writer sau RETIRED_GRACE giây: SearchIndex vừa đọc
+# meta.json cũ và đang mở segment, hoặc server còn phục vụ thế hệ cũ, không gặp FileNotFoundError.
+#
+# Chấm điểm: BM25 (k1=1.2, b=0.75 như Elasticsearch), multi_match kiểu best_fields:
+# điểm của doc = max theo trường của (boost * tổng BM25 các term trong trường đó).
+K1 = 1.2
+B = 0.75
+MAX_SEGMENTS = 8
+RETIRED_GRACE = 600  # giây
+META = "meta.json"
+KEY_FIELDS = ("Id tin", "url")
+
+
+def _read_json(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _write_json(path, data):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def _narrow(values):
+    # Mảng số với kiểu nhỏ nhất chứa được giá trị lớn nhất
+    top = max(values, default=0)
+    for code in ("B", "H", "I"):
+        if top < 1 << (8 * array(code).itemsize):
+            return array(code, values)
+    return array("Q", values)
+
+
+def doc_key(doc, key_fields=KEY_FIELDS):
+    for field in key_fields:
+        value = doc.get(field)
+        if value:
+            return str(value).strip()
+    return None
+
+
+def doc_hash(doc):
+    data = json.dumps(doc, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.md5(data.encode("utf-8")).hexdigest()
+
+
+# --- GHI SEGMENT ---
+
+def write_segment(directory, name, entries, fields):
+    # entries: iterable (key, hash, doc); ghi vào thư mục tạm rồi rename
+    tmp_dir = os.path.join(directory, name + ".tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    postings = {field: defaultdict(list) for field in fields}
+    lengths = {field: array("I") for field in fields}
+    keys = []
+    hashes = []
+    offsets = array("Q", [0])
+    with open(os.path.join(tmp_dir, "store.bin"), "wb") as store:
+        for local, (key, h, doc) in enumerate(entries):
+            keys.append(key)
+            hashes.append(h)
+            data = json.dumps(doc, ensure_ascii=False, default=str).encode("utf-8")
+            store.write(data)
+            offsets.append(offsets[-1] + len(data))
+            for field in fields:
+                field_terms = terms(doc.get(field))
+                lengths[field].append(len(field_terms))
+                field_postings = postings[field]
+                for term, tf in Counter(field_terms).items():
+                    field_postings[term].append((local, tf))
+    with open(os.path.join(tmp_dir, "store.idx"), "wb") as f:
+        offsets.tofile(f)
+
+    lexicon = {}
+    with open(os.path.join(tmp_dir, "postings.bin"), "wb") as out:
+        for field in fields:
+            field_lexicon = lexicon[field] = {}
+            for term, plist in postings[field].items():
+                docs = [d for d, _ in plist]
+                deltas = _narrow([docs[0]] + [b - a for a, b in zip(docs, docs[1:])])
+                tfs = _narrow([tf for _, tf in plist])
+                field_lexicon[term] = [out.tell(), len(docs), deltas.typecode, tfs.typecode]
+                deltas.tofile(out)
+                tfs.tofile(out)
+    _write_json(os.path.join(tmp_dir, "lexicon.json"), lexicon)
+
+    length_offsets = {}
+    with open(os.path.join(tmp_dir, "lengths.bin"), "wb") as f:
+        for field in fields:
+            length_offsets[field] = f.tell()
+            lengths[field].tofile(f)
+
+    _write_json(os.path.join(tmp_dir, "segment.json"), {
+        "docs": len(keys),
+        "keys": keys,
+        "hashes": hashes,
+        "field_docs": {field: sum(1 for n in lengths[field] if n) for field in fields},
+        "field_length_sum": {field: sum(lengths[field]) for field in fields},
+        "lengths": length_offsets,
+    })
+    final_dir = os.path.join(directory, name)
+    shutil.rmtree(final_dir, ignore_errors=True)
+    os.replace(tmp_dir, final_dir)
+    return len(keys)
+
+
+# --- ĐỌC SEGMENT (mmap) ---
+
+class Segment:
+    def __init__(self, directory, name, deleted=()):
+        self.name = name
+        self.path = os.path.join(directory, name)
+        info = _read_json(os.path.join(self.path, "segment.json"))
+        self.docs = info["docs"]
+        self.keys = info["keys"]
+        self.hashes = info["hashes"]
+        self.field_docs = info["field_docs"]
+        self.field_length_sum = info["field_length_sum"]
+        self.lexicon = _read_json(os.path.join(self.path, "lexicon.json"))
+        self.deleted = set(deleted)
+        self.files = []
+        self.postings = self._map("postings.bin")
+        self.store = self._map("store.bin")
+        self.store_offsets = array("Q")
+        with open(os.path.join(self.path, "store.idx"), "rb") as f:
+            self.store_offsets.frombytes(f.read())
+        lengths_data = self._map("lengths.bin")
+        self.lengths = {}
+        for field, offset in info["lengths"].items():
+            values = array("I")
+            values.frombytes(lengths_data[offset:offset + values.itemsize * self.docs])
+            self.lengths[field] = values
+
+    def _map(self, filename):
+        f = open(os.path.join(self.path, filename), "rb")
+        self.files.append(f)
+        if os.fstat(f.fileno()).st_size == 0:
+            return b""
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def df(self, field, term):
+        entry = self.lexicon.get(field, {}).get(term)
+        return entry[1] if entry else 0
+
+    def postings_for(self, field, term):
+        # (doc id, tf) của term trong trường; giải nén delta bằng accumulate
+        entry = self.lexicon.get(field, {}).get(term)
+        if entry is None:
+            return ()
+        offset, count, doc_code, tf_code = entry
+        deltas = array(doc_code)
+        end = offset + deltas.itemsize * count
+        deltas.frombytes(self.postings[offset:end])
+        tfs = array(tf_code)
+        tfs.frombytes(self.postings[end:end + tfs.itemsize * count])
+        return zip(accumulate(deltas), tfs)
+
+    def source(self, local):
+        start, end = self.store_offsets[local], self.store_offsets[local + 1]
+        return json.loads(self.store[start:end].decode("utf-8"))
+
+    def close(self):
+        for data in (self.postings, self.store):
+            if isinstance(data, mmap.mmap):
+                data.close()
+        for f in self.files:
+            f.close()
+
+
+# --- TRUY VẤN ---
+
+class SearchIndex:
+    def __init__(self, path):
+        self.path = path
+        self.meta_path = os.path.join(path, META)
+        self.mtime = os.path.getmtime(self.meta_path)
+        meta = _read_json(self.meta_path)
+        self.fields = meta["fields"]
+        deleted = meta.get("deleted", {})
+        self.segments = []
+        try:
+            for name in meta["segments"]:
+                self.segments.append(Segment(path, name, deleted.get(name, ())))
+        except BaseException:
+            self.close()
+            raise
+        # Thống kê toàn index (tính cả doc đã xóa chưa gộp, giống Lucene)
+        self.field_docs = {f: sum(s.field_docs.get(f, 0) for s in self.segments) for f in self.fields}
+        self.avg_length = {f: sum(s.field_length_sum.get(f, 0) for s in self.segments) / max(self.field_docs[f], 1)
+                           for f in self.fields}
+        self.norms = {}
+        self.key_map = None
+
+    def __len__(self):
+        return sum(s.docs - len(s.deleted) for s in self.segments)
+
+    def is_stale(self):
+        # meta.json đổi -> có commit mới, cần mở lại
+        try:
+            return os.path.getmtime(self.meta_path) != self.mtime
+        except OSError:
+            return False
+
+    def norm(self, i, field):
+        # k1 * (1 - b + b * len / avg_len) cho từng doc, tính 1 lần rồi giữ lại
+        key = (i, field)
+        values = self.norms.get(key)
+        if values is None:
+            avg = self.avg_length[field] or 1.0
+            values = self.norms[key] = [K1 * (1 - B + B * n / avg) for n in self.segments[i].lengths[field]]
+        return values
+
+    def idf(self, field, term):
+        df = sum(s.df(field, term) for s in self.segments)
+        if not df:
+            return 0.0
+        n = self.field_docs[field]
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def search(self, q, size=10, offset=0):
+        query_terms = list(dict.fromkeys(terms(q)))
+        if not query_terms:
+            return self.match_all(size, offset)
+
+        best = {}
+        for field, boost in self.fields.items():
+            weights = [(term, boost * idf) for term in query_terms if (idf := self.idf(field, term)) > 0]
+            if not weights:
+                continue
+            for i, segment in enumerate(self.segments):
+                norms = self.norm(i, field)
+                scores = defaultdict(float)
+                for term, weight in weights:
+                    for doc, tf in segment.postings_for(field, term):
+                        scores[doc] += weight * tf / (tf + norms[doc])
+                deleted = segment.deleted
+                for doc, score in scores.items():
+                    if doc in deleted:
+                        continue
+                    key = (i, doc)
+                    if score > best.get(key, 0.0):
+                        best[key] = score
+
+        top = heapq.nlargest(offset + size, best.items(), key=lambda kv: kv[1])[offset:]
+        hits = [self.hit(i, doc, score) for (i, doc), score in top]
+        return {"total": len(best), "hits": hits}
+
+    def match_all(self, size, offset):
+        hits = []
+        skip = offset
+        for i, segment in enumerate(self.segments):
+            for doc in range(segment.docs):
+                if doc in segment.deleted:
+                    continue
+                if skip:
+                    skip -= 1
+                    continue
+                if len(hits) == size:
+                    break
+                hits.append(self.hit(i, doc, 1.0))
+        return {"total": len(self), "hits": hits}
+
+    def hit(self, i, doc, score):
+        segment = self.segments[i]
+        return {"id": segment.keys[doc], "score": score, "source": segment.source(doc)}
+
+    def get(self, key):
+        if self.key_map is None:
+            self.key_map = {}
+            for i, segment in enumerate(self.segments):
+                for doc, k in enumerate(segment.keys):
+                    if doc not in segment.deleted:
+                        self.key_map[k] = (i, doc)
+        location = self.key_map.get(str(key))
+        if location is None:
+            return None
+        return self.segments[location[0]].source(location[1])
+
+    def close(self):
+        for segment in self.segments:
+            segment.close()
+        self.segments = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# --- THÊM / CẬP NHẬT ---
+
+class IndexWriter:
+    def __init__(self, path, fields=None, key_fields=KEY_FIELDS):
+        self.path = path
+        self.meta_path = os.path.join(path, META)
+        os.makedirs(path, exist_ok=True)
+        if os.path.exists(self.meta_path):
+            self.meta = _read_json(self.meta_path)
+        else:
+            if fields is None:
+                raise ValueError(f"{path} chưa có chỉ mục, cần truyền fields")
+            self.meta = {"version": 1, "fields": dict(fields), "key_fields": list(key_fields),
+                         "segments": [], "next_segment": 1, "deleted": {}}
+        self.fields = self.meta["fields"]
+        self.key_fields = self.meta["key_fields"]
+        self.deleted = {name: set(self.meta["deleted"].get(name, ())) for name in self.meta["segments"]}
+        self.pending = {}     # key -> (hash, doc) chờ commit
+        self.dirty = False
+        self.remove_orphans()
+        self.load_live()
+
+    def remove_orphans(self):
+        # Thư mục segment không có trong meta (commit bị ngắt giữa chừng, segment đã gộp quá RETIRED_GRACE giây)
+        retired = self.meta.setdefault("retired", {})
+        now = time.time()
+        for entry in os.listdir(self.path):
+            if entry.startswith("seg_") and entry not in self.meta["segments"]:
+                if now - retired.get(entry, 0) < RETIRED_GRACE:
+                    continue
+                shutil.rmtree(os.path.join(self.path, entry), ignore_errors=True)
+        for name in [name for name, at in retired.items() if now - at >= RETIRED_GRACE]:
+            del retired[name]
+            self.dirty = True
+
+    def load_live(self):
+        self.live = {}        # key -> (segment, doc id, hash)
+        for name in self.meta["segments"]:
+            info = _read_json(os.path.join(self.path, name, "segment.json"))
+            deleted = self.deleted[name]
+            for local, (key, h) in enumerate(zip(info["keys"], info["hashes"])):
+                if local not in deleted:
+                    self.live[key] = (name, local, h)
+
+    def add(self, doc):
+        # Bỏ qua doc không có key hoặc không đổi nội dung; trả về True nếu sẽ ghi
+        key = doc_key(doc, self.key_fields)
+        if key is None:
+            return False
+        h = doc_hash(doc)
+        current = self.live.get(key)
+        if key not in self.pending and current is not None and current[2] == h:
+            return False
+        self.pending[key] = (h, doc)
+        return True
+
+    def delete(self, key):
+        self.pending.pop(key, None)
+        current = self.live.pop(key, None)
+        if current is not None:
+            self.deleted[current[0]].add(current[1])
+            self.dirty = True
+
+    def sync(self, docs):
+        # Đồng bộ với toàn bộ nguồn: thêm / cập nhật doc đổi, xóa doc không còn trong nguồn
+        seen = set()
+        changed = 0
+        for doc in docs:
+            key = doc_key(doc, self.key_fields)
+            if key is None:
+                continue
+            seen.add(key)
+            changed += self.add(doc)
+        removed = [key for key in self.live if key not in seen]
+        for key in removed:
+            self.delete(key)
+        return changed, len(removed)
+
+    def commit(self):
+        self.remove_orphans()
+        if self.pending:
+            name = f"seg_{self.meta['next_segment']:06d}"
+            self.meta["next_segment"] += 1
+            for key in self.pending:
+                current = self.live.get(key)
+                if current is not None:
+                    self.deleted[current[0]].add(current[1])
+            entries = [(key, h, doc) for key, (h, doc) in self.pending.items()]
+            write_segment(self.path, name, entries, self.fields)
+            self.meta["segments"].append(name)
+            self.deleted[name] = set()
+            for local, (key, h, _) in enumerate(entries):
+                self.live[key] = (name, local, h)
+            self.pending = {}
+            self.dirty = True
+        if self.dirty:
+            self.save_meta()
+        if len(self.meta["segments"]) > MAX_SEGMENTS:
+            self.merge()
+
+    def save_meta(self):
+        self.meta["deleted"] = {name: sorted(docs) for name, docs in self.deleted.items() if docs}
+        _write_json(self.meta_path, self.meta)
+        self.dirty = False
+
+    def merge(self):
+        # Gộp mọi segment thành 1, bỏ doc đã xóa
+        old = list(self.meta["segments"])
+        if len(old) <= 1 and not any(self.deleted.values()):
+            return
+        readers = [Segment(self.path, name, self.deleted[name]) for name in old]
+        name = f"seg_{self.meta['next_segment']:06d}"
+        self.meta["next_segment"] += 1
+        try:
+            entries = ((s.keys[doc], s.hashes[doc], s.source(doc))
+                       for s in readers for doc in range(s.docs) if doc not in s.deleted)
+            write_segment(self.path, name, entries, self.fields)
+        finally:
+            for reader in readers:
+                reader.close()
+        self.meta["segments"] = [name]
+        self.meta.setdefault("retired", {}).update({old_name: time.time() for old_name in old})
+        self.deleted = {name: set()}
+        self.save_meta()
+        self.load_live()
+
+
+def open_index(path):
+    return SearchIndex(path)
@@ -0,0 +1,31 @@
+from bulk_index import iter_db_rows
+from job_pipeline import iter_clean_rows
+
+# Trường + boost giống multi_match của backend (backend/routes/combined.js)
+LEGACY_FIELDS = {
+    "Tiêu đề tin": 3.0,
+    "Địa điểm tuyển dụng": 1.0,
+    "Tỉnh thành tuyển dụng": 1.0,
+    "Chức vụ": 1.0,
+    "Ngành nghề": 1.0,
+    "Lĩnh vực": 1.0,
+}
+CRAWLER_FIELDS = {
+    "title": 3.0,
+    "company": 2.0,
+    "location": 1.0,
+    "description": 1.0,
+    "requirements": 1.0,
+    "skills": 1.0,
+}
+
+
+def iter_csv_docs(path):
+    # data/jobs_clean.csv (đầu ra filter_jobs.py / job_pipeline.py)
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        yield from iter_clean_rows(f)
+
+
+def iter_table_docs(db_path, table="jobs"):
+    # Bảng jobs của crawler (mycrawler/data1.db), key = url
+    yield from iter_db_rows(db_path, table)
@@ -0,0 +1,16 @@
+import os
+import sys
+
+# Tách từ tiếng Việt cho chỉ mục offline:
+#   - âm tiết bỏ dấu lấy từ mycrawler/mycrawler/textfold.py (cùng cách tách với neardup / gazetteer,
+#     nên "kế toán" ở crawler và ở ô tìm kiếm luôn ra cùng token "ke toan")
+#   - thêm bigram của 2 âm tiết liền nhau ("ke_toan") vì từ tiếng Việt thường gồm 2 âm tiết:
+#     "kế toán" xếp trên tài liệu chỉ có "kế" và "toán" ở hai chỗ khác nhau
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "mycrawler"))
+from mycrawler.textfold import fold, words as tokenize  # noqa: E402,F401
+
+
+def terms(text):
+    # Âm tiết + bigram liền kề
+    tokens = tokenize(text)
+    return tokens + [f"{a}_{b}" for a, b in zip(tokens, tokens[1:])]